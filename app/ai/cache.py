@@ -0,0 +1,124 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class FlashcardCache:
+    """SQLite-backed cache of generated flashcards with TTL and LRU eviction.
+
+    Entries expire `ttl` seconds after they are written. Once the cache
+    holds more than `max_entries`, the least recently read entries are
+    evicted. The database is opened on first use and shared by all threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the cache database and create its table if needed."""
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS flashcard_cache ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_flashcard_cache_accessed_at "
+                "ON flashcard_cache (accessed_at)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """Return the cached flashcards for a key, or None on a miss."""
+        now = self.clock()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, created_at FROM flashcard_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    connection.execute(
+                        "DELETE FROM flashcard_cache WHERE key = ?", (key,)
+                    )
+                self.misses += 1
+                return None
+
+            connection.execute(
+                "UPDATE flashcard_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, flashcards: List[Dict[str, str]]) -> None:
+        """Store flashcards under a key, evicting old entries if over capacity."""
+        now = self.clock()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO flashcard_cache "
+                "(key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(flashcards), now, now),
+            )
+
+            # Drop expired entries first, then the least recently used ones
+            connection.execute(
+                "DELETE FROM flashcard_cache WHERE created_at < ?", (now - self.ttl,)
+            )
+            (count,) = connection.execute(
+                "SELECT COUNT(*) FROM flashcard_cache"
+            ).fetchone()
+            if count > self.max_entries:
+                connection.execute(
+                    "DELETE FROM flashcard_cache WHERE key IN ("
+                    "SELECT key FROM flashcard_cache ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self.evictions += count - self.max_entries
+
+    def clear(self) -> None:
+        """Remove every entry and reset the metrics."""
+        with self._lock:
+            self._connect().execute("DELETE FROM flashcard_cache")
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss metrics and the current number of entries."""
+        with self._lock:
+            (entries,) = (
+                self._connect()
+                .execute("SELECT COUNT(*) FROM flashcard_cache")
+                .fetchone()
+            )
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,369 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.orm import selectinload
+
+from .. import models
+from ..config import (
+    GENERATION_JOB_LEASE_SECONDS,
+    GENERATION_JOB_WORKERS,
+    GENERATION_JOBS_PER_USER,
+)
+from ..database import AsyncSessionLocal
+from ..document.store import document_store
+from ..document.utils import iter_chunks
+from .utils import generate_flashcards_from_chunks
+
+logger = logging.getLogger(__name__)
+
+# Estimated tokens of document text per generation request, and how many of
+# them repeat the end of the previous chunk for context
+GENERATION_CHUNK_TOKENS = 2000
+GENERATION_CHUNK_OVERLAP = 200
+
+# Seconds an idle worker waits before checking the queue again
+POLL_INTERVAL = 5.0
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def document_storage_key(db, user_id: int, document_id: str) -> str:
+    """Return the storage key of a user's document, by filename.
+
+    Files uploaded before the document store are added to it first, so
+    their text is extracted in the worker pool and cached like any other
+    document's. Raises FileNotFoundError if the document does not exist.
+    """
+    document = await db.scalar(models.Document.lookup(user_id, document_id))
+    if document is not None:
+        return document.storage_key
+
+    file_path = document_store.legacy_path(document_id)
+    if file_path is None:
+        raise FileNotFoundError(f"Document not found: {document_id}")
+    stored = await document_store.add_file(file_path)
+    return stored.storage_key
+
+
+async def iter_document_chunks(storage_key: str) -> Iterator[str]:
+    """Return an iterator over a document's generation chunks, read lazily."""
+    segments = await document_store.iter_segments(storage_key)
+    return iter_chunks(
+        (segment.text for segment in segments),
+        GENERATION_CHUNK_TOKENS,
+        GENERATION_CHUNK_OVERLAP,
+    )
+
+
+async def create_flashcard_set_from_document(
+    db,
+    user_id: int,
+    document_id: str,
+    num_cards: int,
+    title: Optional[str] = None,
+    description: Optional[str] = None,
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+) -> models.FlashcardSet:
+    """Generate flashcards from an uploaded document and save them as a set.
+
+    Returns the new set with its cards loaded. Raises FileNotFoundError if
+    the document does not exist.
+    """
+    storage_key = await document_storage_key(db, user_id, document_id)
+
+    # Count the chunks first, so cards can be shared out between them, then
+    # read the document again as chunks are generated rather than holding
+    # all of it. Both passes run off the event loop.
+    chunks = await iter_document_chunks(storage_key)
+    num_chunks = await asyncio.to_thread(sum, (1 for _ in chunks))
+    chunks = await iter_document_chunks(storage_key)
+
+    # Generate flashcards from each chunk in parallel
+    flashcards = await generate_flashcards_from_chunks(
+        chunks, num_cards, on_progress, num_chunks
+    )
+
+    # Create the set and its cards in one transaction
+    flashcard_set = models.FlashcardSet(
+        title=title or f"Flashcards from {document_id}",
+        description=description or f"Generated from {document_id}",
+        user_id=user_id,
+        source_document=document_id,
+        flashcards=[
+            models.Flashcard(question=card["question"], answer=card["answer"])
+            for card in flashcards
+        ],
+    )
+
+    db.add(flashcard_set)
+    await db.commit()
+
+    # Reload server defaults and cards up front, since async sessions
+    # can't lazy load during serialization
+    return await db.scalar(
+        select(models.FlashcardSet)
+        .options(selectinload(models.FlashcardSet.flashcards))
+        .filter(models.FlashcardSet.id == flashcard_set.id)
+        .execution_options(populate_existing=True)
+    )
+
+
+class GenerationJobRunner:
+    """Runs queued generation jobs on worker tasks inside the app process.
+
+    Jobs live in the generation_jobs table, so queued jobs survive restarts.
+    A running job holds a lease that its runner renews every quarter of
+    `lease_seconds`; jobs whose lease lapses, because their process died,
+    are re-queued by whichever runner notices, so several app processes can
+    share a database. Each user has at most `max_jobs_per_user` jobs running
+    at a time; their other jobs wait while other users' jobs proceed.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        workers: int = GENERATION_JOB_WORKERS,
+        max_jobs_per_user: int = GENERATION_JOBS_PER_USER,
+        lease_seconds: float = GENERATION_JOB_LEASE_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_jobs_per_user = max_jobs_per_user
+        self.lease_seconds = lease_seconds
+        self._tasks: List[asyncio.Task] = []
+        # When each job this runner is working on was claimed
+        self._running: Dict[int, datetime] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._claim_lock: Optional[asyncio.Lock] = None
+
+    async def start(self):
+        """Re-queue jobs whose lease lapsed and start the worker tasks."""
+        self._wakeup = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+        await self._requeue_expired()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers, re-queueing the jobs they were running."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        job = models.GenerationJob
+        for job_id, claimed_at in self._running.items():
+            await self._requeue(and_(job.id == job_id, job.started_at == claimed_at))
+        self._running.clear()
+
+    def notify(self):
+        """Wake idle workers after a job is submitted."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _work(self):
+        """Worker loop: claim and run jobs, then sleep until notified."""
+        while True:
+            try:
+                job_id = await self._claim()
+                if job_id is not None:
+                    await self._run(job_id)
+                    continue
+
+                await self._requeue_expired()
+            except Exception:
+                # Keep the worker alive through database errors
+                logger.exception("Generation worker failed")
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _requeue(self, condition) -> int:
+        """Put running jobs matching condition back in the queue."""
+        job = models.GenerationJob
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(job)
+                .where(job.status == "running", condition)
+                .values(
+                    status="queued", started_at=None, heartbeat_at=None, progress=0.0
+                )
+            )
+            await db.commit()
+        return result.rowcount
+
+    async def _requeue_expired(self):
+        """Re-queue running jobs whose runner stopped renewing their lease."""
+        job = models.GenerationJob
+        expired = _utc_now() - timedelta(seconds=self.lease_seconds)
+        count = await self._requeue(
+            or_(job.heartbeat_at.is_(None), job.heartbeat_at < expired)
+        )
+        if count:
+            logger.info(f"Re-queued {count} interrupted generation jobs")
+
+    async def _claim(self) -> Optional[int]:
+        """Mark the oldest runnable queued job as running and return its id.
+
+        Jobs of users already at their running limit are skipped, as are
+        jobs another process claims first. The limit is checked in the same
+        UPDATE that claims the job, so processes can't overshoot it.
+        """
+        job = models.GenerationJob
+        busy_users = (
+            select(job.user_id)
+            .where(job.status == "running")
+            .group_by(job.user_id)
+            .having(func.count() >= self.max_jobs_per_user)
+        )
+
+        async with self._claim_lock, self.session_factory() as db:
+            while True:
+                candidate = (
+                    await db.execute(
+                        select(job.id, job.user_id)
+                        .where(job.status == "queued", job.user_id.not_in(busy_users))
+                        .order_by(job.created_at, job.id)
+                        .limit(1)
+                    )
+                ).first()
+                if candidate is None:
+                    return None
+                job_id, user_id = candidate
+
+                # Lock the user's row, so processes claiming for the same user
+                # take turns and each sees the others' claims
+                await db.execute(
+                    select(models.User.id)
+                    .where(models.User.id == user_id)
+                    .with_for_update()
+                )
+
+                # Check the limit again in the claim itself
+                now = _utc_now()
+                result = await db.execute(
+                    update(job)
+                    .where(
+                        job.id == job_id,
+                        job.status == "queued",
+                        job.user_id.not_in(busy_users),
+                    )
+                    .values(status="running", started_at=now, heartbeat_at=now)
+                )
+                await db.commit()
+                if result.rowcount == 1:
+                    self._running[job_id] = now
+                    return job_id
+
+    async def _heartbeat(self, job_id: int):
+        """Renew a running job's lease until cancelled."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 4)
+            try:
+                if not await self._update_claimed(job_id, heartbeat_at=_utc_now()):
+                    return
+            except Exception as e:
+                logger.warning(f"Could not renew lease of job {job_id}: {str(e)}")
+
+    async def _update(self, job_id: int, **values):
+        """Update a job row in its own short transaction."""
+        async with self.session_factory() as db:
+            await db.execute(
+                update(models.GenerationJob)
+                .where(models.GenerationJob.id == job_id)
+                .values(**values)
+            )
+            await db.commit()
+
+    async def _update_claimed(self, job_id: int, **values) -> bool:
+        """Update a job this runner holds, returning whether it still does.
+
+        A job whose lease lapsed may have been re-queued and claimed again;
+        updates from the earlier run then change nothing.
+        """
+        job = models.GenerationJob
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(job)
+                .where(
+                    job.id == job_id,
+                    job.status == "running",
+                    job.started_at == self._running[job_id],
+                )
+                .values(**values)
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def _run(self, job_id: int):
+        """Run one claimed job, renewing its lease, and record its outcome."""
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            await self._run_claimed(job_id)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+        self._running.pop(job_id, None)
+
+    async def _run_claimed(self, job_id: int):
+        async with self.session_factory() as db:
+            job = await db.get(models.GenerationJob, job_id)
+
+        async def on_progress(done, total):
+            await self._update_claimed(job_id, progress=done / total)
+
+        try:
+            async with self.session_factory() as db:
+                flashcard_set = await create_flashcard_set_from_document(
+                    db,
+                    job.user_id,
+                    job.document_id,
+                    job.num_cards,
+                    job.title,
+                    job.description,
+                    on_progress,
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Generation job {job_id} failed: {str(e)}")
+            await self._update_claimed(
+                job_id, status="failed", error=str(e), finished_at=_utc_now()
+            )
+            return
+
+        recorded = await self._update_claimed(
+            job_id,
+            status="succeeded",
+            progress=1.0,
+            flashcard_set_id=flashcard_set.id,
+            finished_at=_utc_now(),
+        )
+        if not recorded:
+            # Another run of the job owns it now and makes its own set
+            logger.warning(f"Generation job {job_id} was taken over; discarding set")
+            async with self.session_factory() as db:
+                await db.execute(
+                    delete(models.Flashcard).where(
+                        models.Flashcard.set_id == flashcard_set.id
+                    )
+                )
+                await db.execute(
+                    delete(models.FlashcardSet).where(
+                        models.FlashcardSet.id == flashcard_set.id
+                    )
+                )
+                await db.commit()
+
+
+# Shared runner, started with the app
+job_runner = GenerationJobRunner()
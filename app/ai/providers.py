@@ -0,0 +1,384 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..config import (
+    AI_BREAKER_RESET_SECONDS,
+    AI_BREAKER_THRESHOLD,
+    AI_MAX_RETRIES,
+    AI_MODELS,
+    AI_RETRY_BASE_DELAY,
+    AI_RETRY_MAX_DELAY,
+    AI_ROUTE_BULK,
+    AI_ROUTE_INTERACTIVE,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_RATE_BURST,
+    GEMINI_RATE_LIMIT,
+    OPENAI_API_BASE,
+    OPENAI_API_KEY,
+    OPENAI_MAX_CONCURRENCY,
+    OPENAI_RATE_BURST,
+    OPENAI_RATE_LIMIT,
+)
+from .resilience import CircuitBreaker, RetryScheduler, TokenBucket
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+try:
+    import google.generativeai as genai
+    from ..config import GEMINI_API_KEY, GEMINI_API_ENDPOINT
+
+    # Initialize Gemini client if API key is available
+    if GEMINI_API_KEY and GEMINI_API_ENDPOINT:
+        # Custom endpoints (such as a local mock server) are plain REST
+        genai.configure(
+            api_key=GEMINI_API_KEY,
+            transport="rest",
+            client_options={"api_endpoint": GEMINI_API_ENDPOINT},
+        )
+    elif GEMINI_API_KEY:
+        genai.configure(api_key=GEMINI_API_KEY)
+    else:
+        # Create a mock client for testing
+        class MockGeminiResponse:
+            def __init__(self, text):
+                self.text = '[{"question": "What is the capital of France?", "answer": "Paris"}, {"question": "What is the largest planet in our solar system?", "answer": "Jupiter"}]'
+
+        class MockGenerativeModel:
+            def __init__(self, model_name):
+                self.model_name = model_name
+
+            def generate_content(self, prompt, stream=False, **kwargs):
+                response = MockGeminiResponse("mock response")
+                return [response] if stream else response
+
+        # Create a mock genai module
+        class MockGenAI:
+            def __init__(self):
+                pass
+
+            def configure(self, api_key):
+                pass
+
+            def GenerativeModel(self, model_name):
+                return MockGenerativeModel(model_name)
+
+        genai = MockGenAI()
+except ImportError:
+    # Create a mock client for testing
+    class MockGeminiResponse:
+        def __init__(self, text):
+            self.text = '[{"question": "What is the capital of France?", "answer": "Paris"}, {"question": "What is the largest planet in our solar system?", "answer": "Jupiter"}]'
+
+    class MockGenerativeModel:
+        def __init__(self, model_name):
+            self.model_name = model_name
+
+        def generate_content(self, prompt, stream=False, **kwargs):
+            response = MockGeminiResponse("mock response")
+            return [response] if stream else response
+
+    # Create a mock genai module
+    class MockGenAI:
+        def __init__(self):
+            pass
+
+        def configure(self, api_key):
+            pass
+
+        def GenerativeModel(self, model_name):
+            return MockGenerativeModel(model_name)
+
+    genai = MockGenAI()
+
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "max_output_tokens": 1000,
+}
+
+# Default cost (USD per 1M output tokens) and typical latency (seconds for a
+# full set of flashcards) of known models, used for routing
+MODEL_PROFILES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.0-flash": (0.40, 3.0),
+    "gemini-2.0-flash-lite": (0.30, 2.0),
+    "gemini-1.5-flash": (0.30, 3.0),
+    "gemini-1.5-pro": (5.00, 8.0),
+    "gpt-4o-mini": (0.60, 4.0),
+    "gpt-4o": (10.00, 6.0),
+}
+DEFAULT_PROFILE = (1.00, 5.0)
+
+# Weight of each new measurement in a model's running latency estimate
+LATENCY_SMOOTHING = 0.2
+
+MOCK_FLASHCARDS = [
+    {"question": "What is the capital of France?", "answer": "Paris"},
+    {
+        "question": "What is the largest planet in our solar system?",
+        "answer": "Jupiter",
+    },
+]
+
+
+def create_scheduler(rate: float, burst: int) -> RetryScheduler:
+    """Create a rate limiter, retry policy and circuit breaker for one model."""
+    return RetryScheduler(
+        TokenBucket(rate, burst),
+        CircuitBreaker(AI_BREAKER_THRESHOLD, AI_BREAKER_RESET_SECONDS),
+        AI_MAX_RETRIES,
+        AI_RETRY_BASE_DELAY,
+        AI_RETRY_MAX_DELAY,
+    )
+
+
+class Provider:
+    """A model behind a long-lived client, shared by every request.
+
+    Subclasses implement the blocking generate() and stream() calls, which
+    run on the provider's own thread pool; its size caps concurrent requests
+    to the model. Each provider has its own rate limiter and circuit
+    breaker, and keeps a running estimate of its latency for routing.
+    """
+
+    backend = ""
+
+    def __init__(
+        self,
+        model: str,
+        cost: float,
+        latency: float,
+        max_concurrency: int,
+        scheduler: RetryScheduler,
+        generation_config: Optional[Dict[str, Any]] = None,
+    ):
+        self.model = model
+        self.cost = cost
+        self.latency = latency
+        self.scheduler = scheduler
+        self.generation_config = generation_config or GENERATION_CONFIG
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix=self.backend
+        )
+
+    @property
+    def name(self) -> str:
+        return f"{self.backend}:{self.model}"
+
+    @property
+    def available(self) -> bool:
+        """Whether the model is taking calls, i.e. its circuit isn't open."""
+        return self.scheduler.breaker.state != "open"
+
+    def generate(self, prompt: str) -> str:
+        """Return the model's response text. Blocks."""
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Yield the model's response text as it arrives. Blocks."""
+        raise NotImplementedError
+
+    def record_latency(self, seconds: float):
+        """Fold a measured response time into the latency estimate."""
+        self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class GeminiProvider(Provider):
+    """Gemini models through google-generativeai."""
+
+    backend = "gemini"
+
+    def __init__(self, model: str, *args, **kwargs):
+        super().__init__(model, *args, **kwargs)
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        """Create the GenerativeModel on first use and keep it."""
+        with self._lock:
+            if self._model is None:
+                self._model = genai.GenerativeModel(self.model)
+            return self._model
+
+    def generate(self, prompt: str) -> str:
+        response = self._get_model().generate_content(
+            prompt, generation_config=self.generation_config
+        )
+        return response.text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        response = self._get_model().generate_content(
+            prompt, stream=True, generation_config=self.generation_config
+        )
+        for chunk in response:
+            yield chunk.text
+
+
+class OpenAIProvider(Provider):
+    """OpenAI chat models. Requires the openai package."""
+
+    backend = "openai"
+
+    def __init__(self, model: str, *args, client=None, **kwargs):
+        super().__init__(model, *args, **kwargs)
+        self._client = client
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        """Create the client, and with it its connection pool, on first use."""
+        with self._lock:
+            if self._client is None:
+                if openai is None:
+                    raise RuntimeError("OpenAI models require the openai package")
+                # Retries are handled by the scheduler
+                self._client = openai.OpenAI(
+                    api_key=OPENAI_API_KEY, base_url=OPENAI_API_BASE, max_retries=0
+                )
+            return self._client
+
+    def _create(self, prompt: str, **kwargs):
+        """Start a chat completion, raising connection failures as ConnectionError."""
+        client = self._get_client()
+        try:
+            return client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.generation_config["temperature"],
+                max_tokens=self.generation_config["max_output_tokens"],
+                **kwargs,
+            )
+        except Exception as e:
+            # Connection errors and timeouts have no status code, so mark
+            # them as retryable
+            if openai is not None and isinstance(e, openai.APIConnectionError):
+                raise ConnectionError(str(e)) from e
+            raise
+
+    def generate(self, prompt: str) -> str:
+        response = self._create(prompt)
+        return response.choices[0].message.content or ""
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self._create(prompt, stream=True):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class MockProvider(Provider):
+    """Offline model that answers with fixed flashcards after `delay` seconds."""
+
+    backend = "mock"
+
+    def __init__(self, model: str, *args, delay: float = 0.0, **kwargs):
+        super().__init__(model, *args, **kwargs)
+        self.delay = delay
+
+    def generate(self, prompt: str) -> str:
+        time.sleep(self.delay)
+        return json.dumps(MOCK_FLASHCARDS)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        text = json.dumps(MOCK_FLASHCARDS)
+        for i in range(0, len(text), 20):
+            time.sleep(self.delay * 20 / len(text))
+            yield text[i : i + 20]
+
+
+BACKENDS = {
+    "gemini": (
+        GeminiProvider,
+        GEMINI_MAX_CONCURRENCY,
+        GEMINI_RATE_LIMIT,
+        GEMINI_RATE_BURST,
+    ),
+    "openai": (
+        OpenAIProvider,
+        OPENAI_MAX_CONCURRENCY,
+        OPENAI_RATE_LIMIT,
+        OPENAI_RATE_BURST,
+    ),
+    "mock": (MockProvider, 8, 1000.0, 1000),
+}
+
+
+def parse_models(spec: str) -> List[Provider]:
+    """Create providers from an AI_MODELS setting.
+
+    Entries are backend:model, optionally followed by :cost:latency.
+    """
+    providers = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        parts = entry.split(":")
+        if len(parts) not in (2, 4) or parts[0] not in BACKENDS:
+            raise ValueError(f"Invalid AI model entry: {entry}")
+
+        backend, model = parts[:2]
+        if len(parts) == 4:
+            cost, latency = float(parts[2]), float(parts[3])
+        elif backend == "mock":
+            cost, latency = 0.0, 0.0
+        else:
+            cost, latency = MODEL_PROFILES.get(model, DEFAULT_PROFILE)
+
+        provider_class, max_concurrency, rate, burst = BACKENDS[backend]
+        providers.append(
+            provider_class(
+                model, cost, latency, max_concurrency, create_scheduler(rate, burst)
+            )
+        )
+
+    if not providers:
+        raise ValueError("AI_MODELS must list at least one model")
+    return providers
+
+
+class ProviderRouter:
+    """Picks the provider for each kind of request.
+
+    `routes` maps a purpose, such as "interactive" or "bulk", to a policy:
+    "cheapest", "fastest", or the name of a provider ("backend:model" or
+    just the model). Policies skip providers whose circuit is open unless
+    all of them are. Unknown purposes use the "interactive" route.
+    """
+
+    def __init__(self, providers: List[Provider], routes: Dict[str, str]):
+        self.providers = providers
+        self.routes = routes
+
+    def select(self, purpose: str = "interactive") -> Provider:
+        policy = self.routes.get(purpose) or self.routes.get("interactive")
+
+        if policy in ("cheapest", "fastest"):
+            candidates = [p for p in self.providers if p.available] or self.providers
+            if policy == "cheapest":
+                return min(candidates, key=lambda p: (p.cost, p.latency))
+            return min(candidates, key=lambda p: (p.latency, p.cost))
+
+        for provider in self.providers:
+            if policy in (provider.name, provider.model):
+                return provider
+        raise ValueError(f"No AI model matches route {purpose!r}: {policy}")
+
+    def close(self):
+        for provider in self.providers:
+            provider.close()
+
+
+def create_provider_router() -> ProviderRouter:
+    """Create the router for the configured models and routes."""
+    return ProviderRouter(
+        parse_models(AI_MODELS),
+        {"interactive": AI_ROUTE_INTERACTIVE, "bulk": AI_ROUTE_BULK},
+    )
@@ -0,0 +1,273 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# HTTP status codes worth retrying: rate limited, or the provider is
+# temporarily failing
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RATE_LIMITED_STATUS_CODE = 429
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """Get the HTTP status of a provider error, if it has one.
+
+    Google API errors carry it as `code`, OpenAI errors as `status_code`.
+    """
+    for attribute in ("code", "status_code"):
+        value = getattr(error, attribute, None)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether a failed provider call is worth retrying."""
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    return error_status(error) in RETRYABLE_STATUS_CODES
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Check whether the provider rejected a call for exceeding its rate limit."""
+    return error_status(error) == RATE_LIMITED_STATUS_CODE
+
+
+def backoff_delay(
+    attempt: int,
+    base: float,
+    cap: float,
+    rng: Callable[[float, float], float] = random.uniform,
+) -> float:
+    """Seconds to wait before retry number `attempt` (from 0).
+
+    Uses "full jitter": a random delay up to an exponentially growing,
+    capped bound, so clients that failed together don't retry together.
+    """
+    return rng(0, min(cap, base * 2**attempt))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider that is failing."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"AI provider unavailable, retry in {retry_after:.0f} seconds")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket rate limiter that adapts to provider rate limits.
+
+    Allows bursts of up to `capacity` calls, refilled at `rate` calls per
+    second. acquire() reserves a token and waits until it is due, so callers
+    are served in order. Each rate limit from the provider halves the rate,
+    down to `min_rate`; each success raises it by a tenth of its configured
+    value until it is back to normal.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        min_rate: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.max_rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> Tuple[bool, float]:
+        """Try to take a token, returning whether it was taken and the wait.
+
+        The bucket can go into debt, which later callers wait out, but never
+        by more than `capacity` tokens. Past that nothing is taken, and the
+        wait is until there is room for the token.
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            shortfall = -self.capacity - (self._tokens - 1)
+            if shortfall > 0:
+                return False, shortfall / self.rate
+            self._tokens -= 1
+            return True, max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self):
+        """Wait until a call is allowed."""
+        while True:
+            taken, delay = self.reserve()
+            if delay > 0:
+                await self.sleep(delay)
+            if taken:
+                return
+
+    def slow_down(self):
+        """Halve the rate after the provider rate limited a call."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self):
+        """Recover the rate after a successful call."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class CircuitBreaker:
+    """Stops calling a provider after repeated failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast with CircuitOpenError. Once `reset_timeout` seconds have
+    passed, one trial call is let through: success closes the circuit,
+    failure opens it again. A trial that ends without an outcome, e.g.
+    because it was cancelled, is released for the next call; one that never
+    reports back is replaced after another `reset_timeout`.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open."""
+        if self._opened_at is None:
+            return "closed"
+        if self.clock() - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            now = self.clock()
+            if state == "half_open" and (
+                self._trial_started is None
+                or now - self._trial_started >= self.reset_timeout
+            ):
+                self._trial_started = now
+                return
+            retry_after = max(0.0, self._opened_at + self.reset_timeout - now)
+            raise CircuitOpenError(retry_after)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_started = None
+
+    def release_trial(self):
+        """Let another call try after a call ended without an outcome."""
+        with self._lock:
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (
+                self._trial_started is not None
+                or self.failures >= self.failure_threshold
+            ):
+                self._opened_at = self.clock()
+            self._trial_started = None
+
+
+class RetryScheduler:
+    """Calls a provider through a rate limiter, retries and a circuit breaker.
+
+    Retryable failures (rate limits, server errors, timeouts) are retried up
+    to `max_retries` times with jittered exponential backoff, and count
+    towards opening the circuit. Other errors, such as bad requests, are
+    raised immediately.
+    """
+
+    def __init__(
+        self,
+        limiter: TokenBucket,
+        breaker: CircuitBreaker,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        rng: Callable[[float, float], float] = random.uniform,
+    ):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng
+
+    async def before_call(self):
+        """Wait for the rate limiter, failing fast if the circuit is open."""
+        self.breaker.before_call()
+        await self.limiter.acquire()
+
+    def record_success(self):
+        self.breaker.record_success()
+        self.limiter.speed_up()
+
+    def record_abandoned(self):
+        """Record a call that was cancelled before it succeeded or failed."""
+        self.breaker.release_trial()
+
+    def record_failure(self, error: Exception):
+        """Record a failed call; only retryable errors count against the provider."""
+        if not is_retryable(error):
+            # The provider answered, so it is up
+            self.breaker.record_success()
+            return
+        self.breaker.record_failure()
+        if is_rate_limited(error):
+            self.limiter.slow_down()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await fn(), retrying retryable failures."""
+        attempt = 0
+        while True:
+            await self.before_call()
+            try:
+                result = await fn()
+            except Exception as e:
+                self.record_failure(e)
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                await self.sleep(
+                    backoff_delay(attempt, self.base_delay, self.max_delay, self.rng)
+                )
+                attempt += 1
+                continue
+            except BaseException:
+                self.record_abandoned()
+                raise
+
+            self.record_success()
+            return result
@@ -1,16 +1,38 @@
+import asyncio
+import math
 from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_async_db, get_db
 from ..auth.utils import get_current_active_user
-from .utils import generate_flashcards_from_text
-from ..document.utils import extract_text_from_document
+from ..document.store import document_store
+from .jobs import create_flashcard_set_from_document, job_runner
+from .resilience import CircuitOpenError
+from .utils import (
+    format_sse,
+    logger,
+    stream_flashcards_from_text,
+    flashcard_cache_stats,
+    generate_flashcards_from_text,
+)
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
 
+def provider_unavailable(error: CircuitOpenError) -> HTTPException:
+    """Build the 503 response for generation refused while the model is down."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(error),
+        headers={"Retry-After": str(math.ceil(error.retry_after))},
+    )
+
+
 @router.post("/generate-flashcards", response_model=List[schemas.FlashcardCreate])
 async def generate_flashcards(
     text_input: schemas.TextInput,
@@ -18,6 +40,10 @@ async def generate_flashcards(
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Generate flashcards from text."""
+    # Release the connection held since the user lookup, so waiting on
+    # the model doesn't tie up the connection pool
+    db.close()
+
     try:
         # Call OpenAI to generate flashcards
         flashcards = await generate_flashcards_from_text(
@@ -32,6 +58,8 @@ async def generate_flashcards(
 
         # Return generated flashcards
         return result
+    except CircuitOpenError as e:
+        raise provider_unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -39,64 +67,166 @@ async def generate_flashcards(
         )
 
 
-@router.post("/generate-from-document", response_model=schemas.FlashcardSetWithCards)
-async def generate_flashcards_from_document(
-    document_input: schemas.DocumentInput,
+@router.post("/generate-flashcards/stream")
+async def stream_generated_flashcards(
+    text_input: schemas.TextInput,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
-    """Generate flashcards from an uploaded document."""
-    try:
-        # Get document text
-        import os
-        from ..config import UPLOAD_DIRECTORY
-
-        file_path = os.path.join(UPLOAD_DIRECTORY, document_input.document_id)
-        if not os.path.exists(file_path):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
+    """Generate flashcards from text, streamed as server-sent events.
+
+    Each card is sent as a `flashcard` event as soon as the model finishes
+    it, followed by a `done` event with the total count. Failures are
+    reported as an `error` event.
+    """
+    # The response outlives the request handler, so release the connection
+    # held since the user lookup now
+    db.close()
+
+    async def events():
+        count = 0
+        try:
+            async for card in stream_flashcards_from_text(
+                text_input.text, text_input.num_cards
+            ):
+                flashcard = schemas.FlashcardCreate(**card)
+                yield format_sse("flashcard", flashcard.model_dump())
+                count += 1
+        except Exception as e:
+            logger.error(f"Error streaming flashcards: {str(e)}")
+            yield format_sse(
+                "error", {"detail": f"Error generating flashcards: {str(e)}"}
             )
+            return
+        yield format_sse("done", {"count": count})
 
-        text = extract_text_from_document(file_path)
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        # Generate flashcards from text
-        flashcards = await generate_flashcards_from_text(text, document_input.num_cards)
 
-        # Create flashcard set with generated cards
-        title = document_input.title or f"Flashcards from {document_input.document_id}"
-        description = (
-            document_input.description or f"Generated from {document_input.document_id}"
-        )
+@router.post("/generate-from-document", response_model=schemas.FlashcardSetWithCards)
+async def generate_flashcards_from_document(
+    document_input: schemas.DocumentInput,
+    db: AsyncSession = Depends(get_async_db),
+    auth_db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Generate flashcards from an uploaded document.
 
-        flashcard_set = models.FlashcardSet(
-            title=title,
-            description=description,
-            user_id=current_user.id,
-            source_document=document_input.document_id,
+    Holds the request open until the set is created; long documents should
+    use a generation job instead.
+    """
+    # Release the connection held since the user lookup, so waiting on
+    # the model doesn't tie up the connection pool
+    user_id = current_user.id
+    auth_db.close()
+
+    try:
+        return await create_flashcard_set_from_document(
+            db,
+            user_id,
+            document_input.document_id,
+            document_input.num_cards,
+            document_input.title,
+            document_input.description,
+        )
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
+        )
+    except CircuitOpenError as e:
+        raise provider_unavailable(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating flashcards from document: {str(e)}",
         )
 
-        db.add(flashcard_set)
-        db.commit()
-        db.refresh(flashcard_set)
 
-        # Add flashcards to the set
-        for card in flashcards:
-            flashcard = models.Flashcard(
-                question=card["question"],
-                answer=card["answer"],
-                set_id=flashcard_set.id,
-            )
-            db.add(flashcard)
+@router.post(
+    "/generate-from-document/jobs",
+    response_model=schemas.GenerationJob,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_generation_job(
+    document_input: schemas.DocumentInput,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Queue flashcard generation from an uploaded document.
+
+    Returns the job immediately; poll it for status and progress.
+    """
+    document = await db.scalar(
+        models.Document.lookup(current_user.id, document_input.document_id)
+    )
+    if document is None and not document_store.legacy_path(document_input.document_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
+        )
 
-        db.commit()
-        db.refresh(flashcard_set)
+    job = models.GenerationJob(
+        user_id=current_user.id,
+        document_id=document_input.document_id,
+        num_cards=document_input.num_cards,
+        title=document_input.title,
+        description=document_input.description,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    job_runner.notify()
+    return job
+
+
+@router.get("/jobs", response_model=List[schemas.GenerationJob])
+async def get_generation_jobs(
+    skip: int = 0,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Get the current user's generation jobs, newest first."""
+    result = await db.scalars(
+        select(models.GenerationJob)
+        .filter(models.GenerationJob.user_id == current_user.id)
+        .order_by(models.GenerationJob.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.all()
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.GenerationJob)
+async def get_generation_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Get the status and progress of a generation job."""
+    job = await db.scalar(
+        select(models.GenerationJob).filter(
+            models.GenerationJob.id == job_id,
+            models.GenerationJob.user_id == current_user.id,
+        )
+    )
 
-        # Return created set with cards
-        return flashcard_set
-    except HTTPException:
-        raise
-    except Exception as e:
+    if job is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error generating flashcards from document: {str(e)}",
+            status_code=status.HTTP_404_NOT_FOUND, detail="Generation job not found"
         )
+
+    return job
+
+
+@router.get("/cache/stats", response_model=schemas.GenerationCacheStats)
+async def get_generation_cache_stats(
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Get hit/miss metrics for the generated flashcard cache."""
+    return await asyncio.to_thread(flashcard_cache_stats)
@@ -0,0 +1,45 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller for a key starts the call as a task; callers that
+    arrive while it is running await the same task and share its result or
+    exception. The task is shielded from its callers, so a caller that
+    gives up (e.g. a client disconnecting) doesn't cancel the work the
+    others are waiting on.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[Tuple[Any, Hashable], asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        """Number of calls in flight."""
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await fn(), or the in-flight call already running for key."""
+        loop = asyncio.get_running_loop()
+        # Tasks belong to one event loop, so calls aren't shared across loops
+        call_key = (loop, key)
+
+        task = self._calls.get(call_key)
+        if task is None:
+            task = loop.create_task(fn())
+            self._calls[call_key] = task
+            task.add_done_callback(lambda task: self._finish(call_key, task))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _finish(self, call_key, task: asyncio.Task):
+        self._calls.pop(call_key, None)
+        # Mark the exception retrieved in case every caller gave up
+        if not task.cancelled():
+            task.exception()
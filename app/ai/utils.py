@@ -1,68 +1,30 @@
 import os
 import re
 import json
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Any
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
 from datetime import datetime
 
-try:
-    import google.generativeai as genai
-    from ..config import GEMINI_API_KEY
-
-    # Initialize Gemini client if API key is available
-    if GEMINI_API_KEY:
-        genai.configure(api_key=GEMINI_API_KEY)
-    else:
-        # Create a mock client for testing
-        class MockGeminiResponse:
-            def __init__(self, text):
-                self.text = '[{"question": "What is the capital of France?", "answer": "Paris"}, {"question": "What is the largest planet in our solar system?", "answer": "Jupiter"}]'
-
-        class MockGenerativeModel:
-            def __init__(self, model_name):
-                self.model_name = model_name
-
-            def generate_content(self, prompt, **kwargs):
-                return MockGeminiResponse("mock response")
-
-        # Create a mock genai module
-        class MockGenAI:
-            def __init__(self):
-                pass
-
-            def configure(self, api_key):
-                pass
-
-            def GenerativeModel(self, model_name):
-                return MockGenerativeModel(model_name)
-
-        genai = MockGenAI()
-except ImportError:
-    # Create a mock client for testing
-    class MockGeminiResponse:
-        def __init__(self, text):
-            self.text = '[{"question": "What is the capital of France?", "answer": "Paris"}, {"question": "What is the largest planet in our solar system?", "answer": "Jupiter"}]'
-
-    class MockGenerativeModel:
-        def __init__(self, model_name):
-            self.model_name = model_name
-
-        def generate_content(self, prompt, **kwargs):
-            return MockGeminiResponse("mock response")
-
-    # Create a mock genai module
-    class MockGenAI:
-        def __init__(self):
-            pass
-
-        def configure(self, api_key):
-            pass
-
-        def GenerativeModel(self, model_name):
-            return MockGenerativeModel(model_name)
-
-    genai = MockGenAI()
-
+from ..config import (
+    AI_CACHE_MAX_ENTRIES,
+    AI_CACHE_PATH,
+    AI_CACHE_TTL_SECONDS,
+)
+from .cache import FlashcardCache
+from .providers import GENERATION_CONFIG, Provider, create_provider_router, genai
+from .singleflight import SingleFlight
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -86,17 +48,98 @@ class Flashcard(BaseModel):
     answer: str
 
 
+# Document chunks read ahead of generation; enough to keep every model
+# request slot busy
+MAX_CHUNKS_IN_FLIGHT = 16
+
+# Cache of generated flashcards, keyed by flashcard_cache_key
+flashcard_cache = FlashcardCache(
+    AI_CACHE_PATH, AI_CACHE_TTL_SECONDS, AI_CACHE_MAX_ENTRIES
+)
+
+
+def prompt_version() -> str:
+    """Fingerprint the prompt template and generation settings.
+
+    Any edit to create_flashcard_prompt or GENERATION_CONFIG changes the
+    fingerprint, so cached flashcards from an older prompt stop matching.
+    """
+    template = create_flashcard_prompt("", 0)
+    settings = json.dumps(GENERATION_CONFIG, sort_keys=True)
+    return hashlib.sha256(f"{template}\0{settings}".encode()).hexdigest()[:16]
+
+
+def flashcard_cache_key(text: str, num_cards: int, model_name: str) -> str:
+    """Build the cache key for a generation request.
+
+    Texts that differ only in whitespace share a key.
+    """
+    normalized = " ".join(text.split())
+    text_hash = hashlib.sha256(normalized.encode()).hexdigest()
+    parts = [prompt_version(), model_name, str(num_cards), text_hash]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+# Concurrent generations of the same text share one model call
+generation_flight = SingleFlight()
+
+
+def flashcard_cache_stats() -> Dict[str, Any]:
+    """Get hit/miss metrics for the flashcard cache and coalesced requests."""
+    return {**flashcard_cache.stats(), "coalesced": generation_flight.coalesced}
+
+
+# Long-lived clients for the configured models, shared by all requests in
+# this worker
+provider_router = create_provider_router()
+
+
+async def generate_content(provider: Provider, prompt: str) -> str:
+    """Call provider.generate without blocking the event loop.
+
+    The call runs on the provider's thread pool, which caps concurrent
+    requests to the model; further requests wait for a free thread.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(provider.executor, provider.generate, prompt)
+
+
 async def generate_flashcards_from_text(
-    text: str, num_cards: int = 10
+    text: str, num_cards: int = 10, purpose: str = "interactive"
+) -> List[Dict[str, str]]:
+    """Generate flashcards from text with the model routed for `purpose`.
+
+    Results are cached, so repeating a request skips the API call, and
+    identical requests made while one is in flight wait for it rather than
+    calling the model again.
+    """
+    provider = provider_router.select(purpose)
+
+    # Serve repeated requests from the cache
+    cache_key = flashcard_cache_key(text, num_cards, provider.name)
+    cached = await asyncio.to_thread(flashcard_cache.get, cache_key)
+    if cached is not None:
+        logger.info(f"Flashcard cache hit for {len(text)} characters of text")
+        return cached
+
+    flashcards = await generation_flight.do(
+        cache_key, lambda: _generate_flashcards(provider, text, num_cards, cache_key)
+    )
+    # Callers share the result, so give each its own cards
+    return [dict(card) for card in flashcards]
+
+
+async def _generate_flashcards(
+    provider: Provider, text: str, num_cards: int, cache_key: str
 ) -> List[Dict[str, str]]:
-    """Generate flashcards from text using Gemini API."""
-    # Create prompt for Gemini
+    """Call the model for flashcards and cache them."""
+    # Create prompt for the model
     prompt = create_flashcard_prompt(text, num_cards)
 
     # Log the request
     request_id = datetime.now().strftime("%Y%m%d%H%M%S")
-    logger.info(f"Gemini API Request {request_id}:")
-    logger.info(f"Model: gemini-2.0-flash")
+    logger.info(f"AI API Request {request_id}:")
+    logger.info(f"Model: {provider.name}")
     logger.info(f"Number of cards requested: {num_cards}")
     logger.info(f"Text length: {len(text)} characters")
     logger.info(
@@ -104,22 +147,17 @@ async def generate_flashcards_from_text(
     )
 
     try:
-        # Call Gemini API with structured output
+        # Call the model with structured output
         start_time = datetime.now()
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0.7,
-                "max_output_tokens": 1000,
-            },
+        response_text = await provider.scheduler.call(
+            lambda: generate_content(provider, prompt)
         )
         end_time = datetime.now()
 
         # Log the response
         response_time = (end_time - start_time).total_seconds()
-        response_text = response.text
-        logger.info(f"Gemini API Response {request_id}:")
+        provider.record_latency(response_time)
+        logger.info(f"AI API Response {request_id}:")
         logger.info(f"Response time: {response_time:.2f} seconds")
         logger.info(f"Response length: {len(response_text)} characters")
 
@@ -129,47 +167,306 @@ async def generate_flashcards_from_text(
         else:
             logger.info(f"Response: {response_text}")
 
-        # Parse JSON response
-        try:
-            # Clean up the response text to handle markdown code blocks
-            cleaned_text = response_text
-
-            # Remove markdown code block markers if present
-            if "```json" in cleaned_text:
-                cleaned_text = cleaned_text.split("```json")[1]
-                if "```" in cleaned_text:
-                    cleaned_text = cleaned_text.split("```")[0]
-            elif "```" in cleaned_text:
-                # Handle case where it's just a code block without language specification
-                cleaned_text = cleaned_text.split("```")[1]
-                if "```" in cleaned_text:
-                    cleaned_text = cleaned_text.split("```")[0]
-
-            # Trim whitespace
-            cleaned_text = cleaned_text.strip()
-
-            # Parse the JSON
-            flashcards_json = json.loads(cleaned_text)
-            flashcards = [
-                {"question": card["question"], "answer": card["answer"]}
-                for card in flashcards_json
-            ]
-            logger.info(f"Extracted {len(flashcards)} flashcards from JSON response")
-        except (json.JSONDecodeError, IndexError, KeyError) as e:
-            # Fallback to regex parsing if JSON parsing fails
-            logger.warning(
-                f"Failed to parse JSON response: {str(e)}. Falling back to regex parsing"
-            )
-            flashcards = parse_flashcards_from_response(response_text)
-            logger.info(f"Extracted {len(flashcards)} flashcards using regex parsing")
+        # Parse the flashcards, salvaging what we can from malformed output
+        flashcards = parse_flashcards_from_response(response_text)
+        logger.info(f"Extracted {len(flashcards)} flashcards from response")
+
+        # Cache non-empty results for repeat requests
+        if flashcards:
+            await asyncio.to_thread(flashcard_cache.set, cache_key, flashcards)
 
         # Return formatted flashcards
         return flashcards
     except Exception as e:
-        logger.error(f"Gemini API Error {request_id}: {str(e)}")
+        logger.error(f"AI API Error {request_id}: {str(e)}")
         raise
 
 
+async def stream_content(provider: Provider, prompt: str) -> AsyncIterator[str]:
+    """Stream the text of provider.stream as it arrives.
+
+    The blocking response iterator runs on the provider's thread pool and
+    hands each piece back to the event loop. Closing the generator early
+    stops the worker at the next piece.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+    cancelled = threading.Event()
+
+    def produce():
+        try:
+            for piece in provider.stream(prompt):
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, piece)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+    loop.run_in_executor(provider.executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is finished:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+# Characters the flashcard scanner acts on; it jumps over everything else
+_SCAN_TOKENS = re.compile(r'[{}"\\]')
+
+
+class FlashcardStreamParser:
+    """Incrementally parse flashcards out of a streamed JSON array.
+
+    feed() takes text as it arrives and returns the flashcard objects that
+    completed in it. Text outside the objects, such as the array brackets or
+    markdown code fences, is skipped, as is an object cut off at the end.
+    Objects with trailing commas are repaired.
+    """
+
+    def __init__(self):
+        self._object: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> List[Dict[str, str]]:
+        """Consume more text and return the flashcards completed by it."""
+        flashcards = []
+        # Start of the current object's text within this piece
+        start = 0
+        # Position of a token escaped by a backslash, which must be skipped
+        skip = 0 if self._escaped else -1
+        self._escaped = False
+
+        # Jump between structural characters instead of visiting every one
+        for match in _SCAN_TOKENS.finditer(text):
+            position = match.start()
+            if position == skip:
+                continue
+            char = match.group()
+
+            if self._in_string:
+                if char == "\\":
+                    if position + 1 < len(text):
+                        skip = position + 1
+                    else:
+                        # The escaped character starts the next piece
+                        self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"' and self._depth:
+                self._in_string = True
+            elif char == "{":
+                if not self._depth:
+                    self._object = []
+                    start = position
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if not self._depth:
+                    self._object.append(text[start : position + 1])
+                    card = self._parse_object("".join(self._object))
+                    if card:
+                        flashcards.append(card)
+
+        if self._depth:
+            self._object.append(text[start:])
+        return flashcards
+
+    @staticmethod
+    def _parse_object(text: str):
+        """Parse a complete object, returning None unless it is a flashcard."""
+        try:
+            card = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                card = json.loads(_remove_trailing_commas(text))
+            except json.JSONDecodeError:
+                return None
+        return _as_flashcard(card)
+
+
+async def stream_flashcards_from_text(
+    text: str, num_cards: int = 10, purpose: str = "interactive"
+) -> AsyncIterator[Dict[str, str]]:
+    """Generate flashcards from text, yielding each one as soon as it is complete.
+
+    Uses routing and the cache like generate_flashcards_from_text.
+    """
+    provider = provider_router.select(purpose)
+    cache_key = flashcard_cache_key(text, num_cards, provider.name)
+    cached = await asyncio.to_thread(flashcard_cache.get, cache_key)
+    if cached is not None:
+        logger.info(f"Flashcard cache hit for {len(text)} characters of text")
+        for card in cached:
+            yield card
+        return
+
+    prompt = create_flashcard_prompt(text, num_cards)
+    request_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    logger.info(f"AI API Streaming Request {request_id}:")
+    logger.info(f"Model: {provider.name}")
+    logger.info(f"Number of cards requested: {num_cards}")
+    logger.info(f"Text length: {len(text)} characters")
+
+    start_time = datetime.now()
+    parser = FlashcardStreamParser()
+    flashcards = []
+
+    # Streams aren't retried, since cards may already have been sent
+    await provider.scheduler.before_call()
+    try:
+        async for piece in stream_content(provider, prompt):
+            for card in parser.feed(piece):
+                if not flashcards:
+                    first_card_time = (datetime.now() - start_time).total_seconds()
+                    logger.info(f"First flashcard after {first_card_time:.2f} seconds")
+                flashcards.append(card)
+                yield card
+    except Exception as e:
+        provider.scheduler.record_failure(e)
+        logger.error(f"AI API Error {request_id}: {str(e)}")
+        raise
+    except BaseException:
+        # Closed or cancelled mid-stream, e.g. the client disconnected
+        provider.scheduler.record_abandoned()
+        raise
+    provider.scheduler.record_success()
+
+    response_time = (datetime.now() - start_time).total_seconds()
+    provider.record_latency(response_time)
+    logger.info(f"AI API Streaming Response {request_id}:")
+    logger.info(f"Streamed {len(flashcards)} flashcards in {response_time:.2f} seconds")
+
+    if flashcards:
+        await asyncio.to_thread(flashcard_cache.set, cache_key, flashcards)
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def allocate_cards(num_cards: int, num_chunks: int) -> List[int]:
+    """Split num_cards across chunks as evenly as possible.
+
+    When there are more chunks than cards, the cards go to evenly spaced
+    chunks and the rest get zero.
+    """
+    return [
+        (i + 1) * num_cards // num_chunks - i * num_cards // num_chunks
+        for i in range(num_chunks)
+    ]
+
+
+def _question_key(question: str) -> str:
+    """Normalize a question for duplicate detection."""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.casefold()).split())
+
+
+def merge_flashcards(
+    batches: List[List[Dict[str, str]]], num_cards: int
+) -> List[Dict[str, str]]:
+    """Merge per-chunk flashcards in order, dropping duplicate questions."""
+    seen = set()
+    merged = []
+    for batch in batches:
+        for card in batch:
+            key = _question_key(card["question"])
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(card)
+            if len(merged) == num_cards:
+                return merged
+    return merged
+
+
+async def generate_flashcards_from_chunks(
+    chunks: Iterable[str],
+    num_cards: int = 10,
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    num_chunks: Optional[int] = None,
+) -> List[Dict[str, str]]:
+    """Generate flashcards from text chunks with concurrent requests.
+
+    Each chunk is asked for its share of num_cards. Requests run in
+    parallel, bounded by the generation thread pool, so latency tracks the
+    slowest chunk rather than the document length. Failed chunks are
+    skipped unless every chunk fails. `on_progress(done, total)` is awaited
+    as each chunk finishes; if chunks runs out before num_chunks, total is
+    corrected to the chunks actually generated.
+
+    Given num_chunks, chunks is read lazily, with at most
+    MAX_CHUNKS_IN_FLIGHT chunks held at a time. Chunks are read on a worker
+    thread, since cutting them from a document is blocking work.
+    """
+    if num_chunks is None:
+        chunks = list(chunks)
+        num_chunks = len(chunks)
+    counts = allocate_cards(num_cards, num_chunks)
+    total = sum(1 for count in counts if count > 0)
+    if not total:
+        return []
+
+    done = 0
+    window = asyncio.Semaphore(MAX_CHUNKS_IN_FLIGHT)
+
+    async def generate(chunk, count):
+        nonlocal done
+        try:
+            return await generate_flashcards_from_text(chunk, count, "bulk")
+        finally:
+            window.release()
+            done += 1
+            if on_progress:
+                await on_progress(min(done, total), total)
+
+    logger.info(f"Generating {num_cards} flashcards from {total} chunks")
+    tasks = []
+    chunks = iter(chunks)
+    try:
+        for count in counts:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            if count > 0:
+                await window.acquire()
+                tasks.append(asyncio.create_task(generate(chunk, count)))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    corrected = len(tasks) < total
+    if corrected:
+        logger.warning(f"Expected {total} chunks but got {len(tasks)}")
+        total = len(tasks)
+        if not total:
+            return []
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    if on_progress and corrected:
+        # Chunks that finished before the count was corrected reported less
+        await on_progress(done, total)
+
+    # Cancelled chunks come back as CancelledError, which isn't an Exception
+    batches = [result for result in results if not isinstance(result, BaseException)]
+    if not batches:
+        raise results[0]
+    if len(batches) < len(results):
+        logger.warning(f"{len(results) - len(batches)} of {len(results)} chunks failed")
+
+    return merge_flashcards(batches, num_cards)
+
+
 def create_flashcard_prompt(text: str, num_cards: int) -> str:
     """Create a prompt for Gemini to generate flashcards."""
     prompt = f"Generate {num_cards} high-quality flashcard question-answer pairs from the following text. "
@@ -194,37 +491,116 @@ def create_flashcard_prompt(text: str, num_cards: int) -> str:
     return prompt
 
 
-def parse_flashcards_from_response(response_text: str) -> List[Dict[str, str]]:
-    """Parse response text to extract question-answer pairs."""
-    flashcards = []
+# A comma directly before a closing bracket
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+# Whitespace and commas between array items
+_ITEM_SEPARATOR = re.compile(r"[\s,]*")
+_json_decoder = json.JSONDecoder()
+
+
+def _remove_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing bracket.
 
-    # Try to parse as JSON first
+    Only used on JSON that failed to parse. Strings aren't skipped, which
+    is much faster and only matters for text like ",}" inside a card.
+    """
+    return _TRAILING_COMMA.sub(r"\1", text)
+
+
+def _salvage_flashcards(text: str) -> List[Dict[str, str]]:
+    """Decode the flashcard objects at the start of an array, in order.
+
+    Stops at the first object that doesn't decode, such as one cut off by
+    the output token limit.
+    """
+    start = text.find("[")
+    position = start + 1 if start != -1 else text.find("{")
+    if position == -1:
+        return []
+
+    flashcards = []
+    while True:
+        position = _ITEM_SEPARATOR.match(text, position).end()
+        if not text.startswith("{", position):
+            return flashcards
+        try:
+            item, position = _json_decoder.raw_decode(text, position)
+        except ValueError:
+            return flashcards
+        card = _as_flashcard(item)
+        if card:
+            flashcards.append(card)
+
+
+def _as_flashcard(item: Any) -> Optional[Dict[str, str]]:
+    """Return the question and answer of a flashcard object, or None."""
+    if isinstance(item, dict) and "question" in item and "answer" in item:
+        return {"question": item["question"], "answer": item["answer"]}
+    return None
+
+
+def _flashcards_from_json(data: Any) -> List[Dict[str, str]]:
+    """Collect flashcards from parsed JSON.
+
+    Accepts an array of cards, a single card, or an object wrapping the
+    array, e.g. {"flashcards": [...]}.
+    """
+    if isinstance(data, dict):
+        card = _as_flashcard(data)
+        if card:
+            return [card]
+        data = next((value for value in data.values() if isinstance(value, list)), [])
+    if not isinstance(data, list):
+        return []
+    return [card for card in map(_as_flashcard, data) if card]
+
+
+def _parse_json(text: str) -> Any:
+    """Parse JSON, returning None if it is invalid."""
     try:
-        # Clean up the response text to make it valid JSON
-        json_text = response_text.strip()
-        if json_text.startswith("```json"):
-            json_text = json_text[7:]
-        if json_text.endswith("```"):
-            json_text = json_text[:-3]
-
-        # Parse JSON
-        data = json.loads(json_text)
-        if isinstance(data, list):
-            for item in data:
-                if isinstance(item, dict) and "question" in item and "answer" in item:
-                    flashcards.append(
-                        {"question": item["question"], "answer": item["answer"]}
-                    )
-            if flashcards:
-                return flashcards
-    except (json.JSONDecodeError, ValueError):
-        pass
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def parse_flashcards_from_response(response_text: str) -> List[Dict[str, str]]:
+    """Parse response text to extract question-answer pairs.
+
+    Tries, in order:
+    1. The JSON between the first opening and last closing bracket, which
+       covers clean output with or without code fences or surrounding prose.
+    2. The same with trailing commas removed.
+    3. Decoding the array's objects one at a time, which keeps the cards
+       before an object cut off by the output token limit.
+    4. Scanning for flashcard objects anywhere in the text.
+    5. "Q: ... A: ..." pairs.
+    The JSON steps only run if the text mentions a "question" key.
+    """
+    if '"question"' in response_text:
+        starts = [
+            i for i in (response_text.find("["), response_text.find("{")) if i >= 0
+        ]
+        end = max(response_text.rfind("]"), response_text.rfind("}"))
+        candidate = response_text[min(starts) : end + 1] if starts else ""
+
+        flashcards = _flashcards_from_json(_parse_json(candidate))
+        if flashcards:
+            return flashcards
+
+        repaired = _remove_trailing_commas(response_text)
+        flashcards = (
+            _flashcards_from_json(_parse_json(_remove_trailing_commas(candidate)))
+            or _salvage_flashcards(repaired)
+            or FlashcardStreamParser().feed(repaired)
+        )
+        if flashcards:
+            return flashcards
 
     # Try to parse Q/A format
     qa_pattern = r"Q:\s*(.+?)\s*\n\s*A:\s*(.+?)(?:\n\s*\n|$)"
     matches = re.findall(qa_pattern, response_text, re.DOTALL)
 
-    for question, answer in matches:
-        flashcards.append({"question": question.strip(), "answer": answer.strip()})
-
-    return flashcards
+    return [
+        {"question": question.strip(), "answer": answer.strip()}
+        for question, answer in matches
+    ]
@@ -54,10 +54,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
 ):
-    """Get the current user from a JWT token."""
+    """Get the current user from a JWT token.
+
+    Synchronous so FastAPI runs the user lookup in its threadpool rather
+    than on the event loop.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
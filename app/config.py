@@ -16,8 +16,77 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 # AI configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Override the Gemini API endpoint, e.g. http://localhost:8080 for a mock server
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+# Maximum number of Gemini requests in flight per worker
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+# Gemini requests per second and burst size; the rate is lowered
+# automatically while Gemini is rate limiting us
+GEMINI_RATE_LIMIT = float(os.getenv("GEMINI_RATE_LIMIT", "5"))
+GEMINI_RATE_BURST = int(os.getenv("GEMINI_RATE_BURST", "10"))
+# Override the OpenAI API base URL, e.g. for a compatible proxy
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_RATE_LIMIT = float(os.getenv("OPENAI_RATE_LIMIT", "5"))
+OPENAI_RATE_BURST = int(os.getenv("OPENAI_RATE_BURST", "10"))
+# Retries of rate limited or failed AI requests, with exponential backoff
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+AI_RETRY_BASE_DELAY = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))
+AI_RETRY_MAX_DELAY = float(os.getenv("AI_RETRY_MAX_DELAY", "8"))
+# Consecutive failures before calls to a model fail fast, and for how long
+AI_BREAKER_THRESHOLD = int(os.getenv("AI_BREAKER_THRESHOLD", "5"))
+AI_BREAKER_RESET_SECONDS = float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+
+# Models available for generation, as comma separated backend:model entries
+# (backends: gemini, openai, mock). Append :cost:latency to override the
+# built-in cost (USD per 1M output tokens) and typical latency (seconds).
+AI_MODELS = os.getenv("AI_MODELS", "gemini:gemini-2.0-flash")
+# Which model serves each kind of request: "cheapest", "fastest" or a model
+# from AI_MODELS. Interactive requests are users waiting on a response; bulk
+# requests are document generation and background jobs.
+AI_ROUTE_INTERACTIVE = os.getenv("AI_ROUTE_INTERACTIVE", "fastest")
+AI_ROUTE_BULK = os.getenv("AI_ROUTE_BULK", "cheapest")
+
+# Generated flashcard cache, stored next to the database on Fly.io
+AI_CACHE_PATH = os.getenv(
+    "AI_CACHE_PATH",
+    os.path.join(os.getenv("FLY_APP") and "/app/data" or ".", "ai_cache.db"),
+)
+AI_CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "10000"))
+
+# Background generation jobs: worker tasks per process, how many jobs one
+# user can have running at once, and seconds a running job's lease lasts
+# without renewal before the job is re-queued
+GENERATION_JOB_WORKERS = int(os.getenv("GENERATION_JOB_WORKERS", "2"))
+GENERATION_JOBS_PER_USER = int(os.getenv("GENERATION_JOBS_PER_USER", "1"))
+GENERATION_JOB_LEASE_SECONDS = float(os.getenv("GENERATION_JOB_LEASE_SECONDS", "60"))
 
 # File upload configuration
 UPLOAD_DIRECTORY = "uploads"
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10 MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes read and written at a time
 ALLOWED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+
+# Document text API: characters returned per request by default and at
+# most, and in the upload response's preview
+DOCUMENT_TEXT_LIMIT = 100_000
+DOCUMENT_TEXT_MAX_LIMIT = 1_000_000
+DOCUMENT_PREVIEW_CHARS = 1000
+
+# Stored files no document refers to are swept every interval, once they
+# have been idle for the grace period
+DOCUMENT_SWEEP_INTERVAL = float(os.getenv("DOCUMENT_SWEEP_INTERVAL", "3600"))
+DOCUMENT_SWEEP_GRACE_SECONDS = float(os.getenv("DOCUMENT_SWEEP_GRACE_SECONDS", "3600"))
+
+# PDF text extraction runs in worker processes, each reading a range of a
+# document's pages. A document taking longer than the timeout has its
+# workers killed, and each worker's memory is capped.
+PDF_EXTRACTION_WORKERS = int(
+    os.getenv("PDF_EXTRACTION_WORKERS", str(os.cpu_count() or 1))
+)
+PDF_EXTRACTION_MIN_PAGES_PER_TASK = int(
+    os.getenv("PDF_EXTRACTION_MIN_PAGES_PER_TASK", "20")
+)
+PDF_EXTRACTION_TIMEOUT = float(os.getenv("PDF_EXTRACTION_TIMEOUT", "120"))
+PDF_EXTRACTION_MEMORY_MB = int(os.getenv("PDF_EXTRACTION_MEMORY_MB", "1024"))
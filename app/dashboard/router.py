@@ -1,94 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime, timedelta
-from sqlalchemy import func, case, extract, cast, Float
+from typing import List, Optional
+from sqlalchemy import func, case, extract, cast, Float, select
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_async_db, get_db
 from ..auth.utils import get_current_active_user
+from ..db_functions import session_duration_seconds
+from .utils import (
+    GRANULARITIES,
+    activity_key,
+    decode_activity_cursor,
+    encode_activity_cursor,
+    get_study_time_series,
+    iter_query_batches,
+    merge_activity_streams,
+)
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
+# Upper bound on buckets per custom study time series
+MAX_SERIES_PERIODS = 366
+
 
 @router.get("/summary", response_model=schemas.DashboardSummary)
-def get_dashboard_summary(
-    db: Session = Depends(get_db),
+async def get_dashboard_summary(
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Get a summary of the user's dashboard."""
     # Get total number of flashcard sets
     total_sets = (
-        db.query(func.count(models.FlashcardSet.id))
-        .filter(models.FlashcardSet.user_id == current_user.id)
-        .scalar()
+        await db.scalar(
+            select(func.count(models.FlashcardSet.id)).filter(
+                models.FlashcardSet.user_id == current_user.id
+            )
+        )
         or 0
     )
 
     # Get total number of flashcards
     total_cards = (
-        db.query(func.count(models.Flashcard.id))
-        .join(models.FlashcardSet, models.Flashcard.set_id == models.FlashcardSet.id)
-        .filter(models.FlashcardSet.user_id == current_user.id)
-        .scalar()
+        await db.scalar(
+            select(func.count(models.Flashcard.id))
+            .join(
+                models.FlashcardSet, models.Flashcard.set_id == models.FlashcardSet.id
+            )
+            .filter(models.FlashcardSet.user_id == current_user.id)
+        )
         or 0
     )
 
     # Get total number of study sessions
     total_study_sessions = (
-        db.query(func.count(models.StudySession.id))
-        .filter(models.StudySession.user_id == current_user.id)
-        .scalar()
+        await db.scalar(
+            select(func.count(models.StudySession.id)).filter(
+                models.StudySession.user_id == current_user.id
+            )
+        )
         or 0
     )
 
     # Calculate total study time in minutes
     total_study_time = (
-        db.query(
-            func.sum(
-                func.julianday(
-                    func.coalesce(
-                        models.StudySession.end_time, func.current_timestamp()
+        await db.scalar(
+            select(
+                func.sum(
+                    session_duration_seconds(
+                        models.StudySession.start_time, models.StudySession.end_time
                     )
                 )
-                - func.julianday(models.StudySession.start_time)
-            )
-            * 24
-            * 60  # Convert to minutes
+                / 60  # Convert to minutes
+            ).filter(models.StudySession.user_id == current_user.id)
         )
-        .filter(models.StudySession.user_id == current_user.id)
-        .scalar()
         or 0
     )
 
-    # Get mastered and struggling cards counts
-    mastered_cards = 0
-    struggling_cards = 0
-
-    # Get all flashcards for the user
-    user_flashcards = (
-        db.query(models.Flashcard)
-        .join(models.FlashcardSet, models.Flashcard.set_id == models.FlashcardSet.id)
-        .filter(models.FlashcardSet.user_id == current_user.id)
-        .all()
+    # Get mastered and struggling cards counts with one grouped aggregate
+    mastery = await db.run_sync(
+        models.FlashcardProgress.get_mastery_counts, current_user.id
     )
-
-    for flashcard in user_flashcards:
-        # Get progress stats for this flashcard
-        stats = models.FlashcardProgress.get_stats_by_flashcard(
-            db, flashcard.id, current_user.id
-        )
-
-        if stats:
-            if (
-                stats.correct_count
-                and stats.correct_count > 2
-                and stats.average_difficulty
-                and stats.average_difficulty < 2
-            ):
-                mastered_cards += 1
-            elif stats.incorrect_count and stats.incorrect_count > stats.correct_count:
-                struggling_cards += 1
+    mastered_cards = mastery.mastered_cards
+    struggling_cards = mastery.struggling_cards
 
     # Calculate completion percentage
     completion_percentage = 0
@@ -106,33 +100,22 @@ def get_dashboard_summary(
     )
 
 
-@router.get("/activity", response_model=List[schemas.ActivityItem])
-def get_recent_activity(
-    limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user),
-):
-    """Get recent activity for the user."""
-    activities = []
-
-    # Get recent study sessions
-    recent_sessions = (
-        db.query(models.StudySession)
-        .filter(models.StudySession.user_id == current_user.id)
-        .order_by(models.StudySession.start_time.desc())
-        .limit(limit)
-        .all()
-    )
-
-    for session in recent_sessions:
-        # Get the set title
-        set_title = (
-            db.query(models.FlashcardSet.title)
-            .filter(models.FlashcardSet.id == session.set_id)
-            .scalar()
-            or "Unknown Set"
+def _session_activity_stream(db, user_id, before, batch_size):
+    """Stream study session activity, newest first, with set titles joined in."""
+    query = (
+        db.query(models.StudySession, models.FlashcardSet.title)
+        .outerjoin(
+            models.FlashcardSet, models.StudySession.set_id == models.FlashcardSet.id
         )
+        .filter(models.StudySession.user_id == user_id)
+    )
+    if before:
+        query = query.filter(models.StudySession.start_time <= before[0])
+    query = query.order_by(
+        models.StudySession.start_time.desc(), models.StudySession.id.desc()
+    )
 
+    for session, set_title in iter_query_batches(query, batch_size):
         # Calculate duration if session is completed
         duration = "In progress"
         if session.end_time:
@@ -141,98 +124,124 @@ def get_recent_activity(
             minutes = abs(time_diff.total_seconds()) / 60
             duration = f"{minutes:.1f} minutes"
 
-        activities.append(
-            schemas.ActivityItem(
-                id=session.id,
-                type="study_session",
-                timestamp=session.start_time,
-                details={
-                    "set_id": str(session.set_id),
-                    "set_title": set_title,
-                    "duration": duration,
-                    "status": "Completed" if session.end_time else "In progress",
-                },
-            )
+        yield schemas.ActivityItem(
+            id=session.id,
+            type="study_session",
+            timestamp=session.start_time,
+            details={
+                "set_id": str(session.set_id),
+                "set_title": set_title or "Unknown Set",
+                "duration": duration,
+                "status": "Completed" if session.end_time else "In progress",
+            },
         )
 
-    # Get recent flashcard set creations
-    recent_sets = (
-        db.query(models.FlashcardSet)
-        .filter(models.FlashcardSet.user_id == current_user.id)
-        .order_by(models.FlashcardSet.created_at.desc())
-        .limit(limit)
-        .all()
-    )
 
-    for flashcard_set in recent_sets:
-        # Count cards in the set
-        card_count = (
-            db.query(func.count(models.Flashcard.id))
-            .filter(models.Flashcard.set_id == flashcard_set.id)
-            .scalar()
-            or 0
+def _set_activity_stream(db, user_id, before, batch_size):
+    """Stream flashcard set creations, newest first, with card counts joined in."""
+    card_counts = (
+        db.query(
+            models.Flashcard.set_id.label("set_id"),
+            func.count(models.Flashcard.id).label("card_count"),
         )
+        .join(models.FlashcardSet, models.Flashcard.set_id == models.FlashcardSet.id)
+        .filter(models.FlashcardSet.user_id == user_id)
+        .group_by(models.Flashcard.set_id)
+        .subquery()
+    )
+    query = (
+        db.query(models.FlashcardSet, card_counts.c.card_count)
+        .outerjoin(card_counts, card_counts.c.set_id == models.FlashcardSet.id)
+        .filter(models.FlashcardSet.user_id == user_id)
+    )
+    if before:
+        query = query.filter(models.FlashcardSet.created_at <= before[0])
+    query = query.order_by(
+        models.FlashcardSet.created_at.desc(), models.FlashcardSet.id.desc()
+    )
 
-        activities.append(
-            schemas.ActivityItem(
-                id=flashcard_set.id,
-                type="flashcard_set_created",
-                timestamp=flashcard_set.created_at,
-                details={
-                    "set_id": str(flashcard_set.id),
-                    "title": flashcard_set.title,
-                    "card_count": str(card_count),
-                },
-            )
+    for flashcard_set, card_count in iter_query_batches(query, batch_size):
+        yield schemas.ActivityItem(
+            id=flashcard_set.id,
+            type="flashcard_set_created",
+            timestamp=flashcard_set.created_at,
+            details={
+                "set_id": str(flashcard_set.id),
+                "title": flashcard_set.title,
+                "card_count": str(card_count or 0),
+            },
         )
 
-    # Get recent flashcard progress
-    recent_progress = (
-        db.query(models.FlashcardProgress)
-        .filter(models.FlashcardProgress.user_id == current_user.id)
-        .order_by(models.FlashcardProgress.created_at.desc())
-        .limit(limit)
-        .all()
+
+def _progress_activity_stream(db, user_id, before, batch_size):
+    """Stream flashcard reviews, newest first, with questions and set titles joined in."""
+    query = (
+        db.query(
+            models.FlashcardProgress,
+            models.Flashcard.question,
+            models.FlashcardSet.title,
+        )
+        .join(
+            models.Flashcard,
+            models.FlashcardProgress.flashcard_id == models.Flashcard.id,
+        )
+        .outerjoin(
+            models.FlashcardSet, models.Flashcard.set_id == models.FlashcardSet.id
+        )
+        .filter(models.FlashcardProgress.user_id == user_id)
+    )
+    if before:
+        query = query.filter(models.FlashcardProgress.created_at <= before[0])
+    query = query.order_by(
+        models.FlashcardProgress.created_at.desc(), models.FlashcardProgress.id.desc()
     )
 
-    for progress in recent_progress:
-        # Get the flashcard question
-        flashcard = (
-            db.query(models.Flashcard)
-            .filter(models.Flashcard.id == progress.flashcard_id)
-            .first()
+    for progress, question, set_title in iter_query_batches(query, batch_size):
+        yield schemas.ActivityItem(
+            id=progress.id,
+            type="flashcard_progress",
+            timestamp=progress.created_at,
+            details={
+                "flashcard_id": str(progress.flashcard_id),
+                "question": question,
+                "set_title": set_title or "Unknown Set",
+                "result": "Correct" if progress.is_correct else "Incorrect",
+                "difficulty": progress.difficulty,
+            },
         )
 
-        if flashcard:
-            # Get the set title
-            set_title = (
-                db.query(models.FlashcardSet.title)
-                .join(
-                    models.Flashcard, models.FlashcardSet.id == models.Flashcard.set_id
-                )
-                .filter(models.Flashcard.id == progress.flashcard_id)
-                .scalar()
-                or "Unknown Set"
-            )
 
-            activities.append(
-                schemas.ActivityItem(
-                    id=progress.id,
-                    type="flashcard_progress",
-                    timestamp=progress.created_at,
-                    details={
-                        "flashcard_id": str(progress.flashcard_id),
-                        "question": flashcard.question,
-                        "set_title": set_title,
-                        "result": "Correct" if progress.is_correct else "Incorrect",
-                        "difficulty": progress.difficulty,
-                    },
-                )
-            )
+@router.get("/activity", response_model=List[schemas.ActivityItem])
+def get_recent_activity(
+    limit: int = Query(10, ge=1, le=100),
+    before: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Get recent activity for the user.
+
+    Pass the `cursor` of the last item as `before` to get the next page.
+    """
+    try:
+        before_key = decode_activity_cursor(before) if before else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    streams = [
+        stream(db, current_user.id, before_key, limit)
+        for stream in (
+            _session_activity_stream,
+            _set_activity_stream,
+            _progress_activity_stream,
+        )
+    ]
 
-    # Sort all activities by timestamp (newest first) and limit to requested number
-    activities.sort(key=lambda x: x.timestamp, reverse=True)
-    return activities[:limit]
+    # Merge the newest-first streams on timestamp
+    activities = merge_activity_streams(streams, limit, before_key)
+    for activity in activities:
+        activity.cursor = encode_activity_cursor(activity_key(activity))
+
+    return activities
 
 
 @router.get("/sets/stats", response_model=List[schemas.SetStatistics])
@@ -241,107 +250,68 @@ def get_set_statistics(
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Get statistics for all flashcard sets."""
-    # Get all flashcard sets for the user
+    # Get all flashcard sets for the user with their card counts
     user_sets = (
-        db.query(models.FlashcardSet)
+        db.query(
+            models.FlashcardSet.id,
+            models.FlashcardSet.title,
+            func.count(models.Flashcard.id).label("total_cards"),
+        )
+        .outerjoin(models.Flashcard, models.Flashcard.set_id == models.FlashcardSet.id)
         .filter(models.FlashcardSet.user_id == current_user.id)
+        .group_by(models.FlashcardSet.id, models.FlashcardSet.title)
         .all()
     )
 
-    set_stats = []
-
-    for flashcard_set in user_sets:
-        # Count total cards in the set
-        total_cards = (
-            db.query(func.count(models.Flashcard.id))
-            .filter(models.Flashcard.set_id == flashcard_set.id)
-            .scalar()
-            or 0
+    # Aggregate study sessions for every set at once
+    session_rows = (
+        db.query(
+            models.StudySession.set_id,
+            func.count(models.StudySession.id).label("study_count"),
+            func.max(models.StudySession.start_time).label("last_studied"),
+            func.avg(
+                session_duration_seconds(
+                    models.StudySession.start_time, models.StudySession.end_time
+                )
+            ).label("average_seconds"),
         )
+        .filter(models.StudySession.user_id == current_user.id)
+        .group_by(models.StudySession.set_id)
+        .all()
+    )
+    session_stats = {row.set_id: row for row in session_rows}
 
-        # Get the last study session for this set
-        last_session = (
-            db.query(models.StudySession)
-            .filter(
-                models.StudySession.set_id == flashcard_set.id,
-                models.StudySession.user_id == current_user.id,
-            )
-            .order_by(models.StudySession.start_time.desc())
-            .first()
-        )
+    # Count mastered cards for every set at once
+    mastery_stats = models.FlashcardProgress.get_mastery_counts_by_set(
+        db, current_user.id
+    )
 
-        last_studied = last_session.start_time if last_session else None
+    set_stats = []
 
-        # Count study sessions for this set
-        study_count = (
-            db.query(func.count(models.StudySession.id))
-            .filter(
-                models.StudySession.set_id == flashcard_set.id,
-                models.StudySession.user_id == current_user.id,
-            )
-            .scalar()
-            or 0
-        )
+    for flashcard_set in user_sets:
+        sessions = session_stats.get(flashcard_set.id)
+        mastery = mastery_stats.get(flashcard_set.id)
 
         # Calculate average session duration
         avg_duration = None
-        if study_count > 0:
-            avg_duration = (
-                db.query(
-                    func.avg(
-                        func.julianday(
-                            func.coalesce(
-                                models.StudySession.end_time, func.current_timestamp()
-                            )
-                        )
-                        - func.julianday(models.StudySession.start_time)
-                    )
-                    * 24
-                    * 60  # Convert to minutes
-                )
-                .filter(
-                    models.StudySession.set_id == flashcard_set.id,
-                    models.StudySession.user_id == current_user.id,
-                )
-                .scalar()
-            )
+        if sessions and sessions.average_seconds is not None:
+            avg_duration = sessions.average_seconds / 60  # Convert to minutes
 
         # Calculate mastery percentage
         mastery_percentage = 0
-        if total_cards > 0:
-            # Get all flashcards in the set
-            flashcards = (
-                db.query(models.Flashcard)
-                .filter(models.Flashcard.set_id == flashcard_set.id)
-                .all()
-            )
-
-            mastered_count = 0
-            for flashcard in flashcards:
-                # Get progress stats for this flashcard
-                stats = models.FlashcardProgress.get_stats_by_flashcard(
-                    db, flashcard.id, current_user.id
-                )
-
-                if (
-                    stats
-                    and stats.correct_count
-                    and stats.correct_count > 2
-                    and stats.average_difficulty
-                    and stats.average_difficulty < 2
-                ):
-                    mastered_count += 1
-
-            mastery_percentage = (mastered_count / total_cards) * 100
+        if flashcard_set.total_cards > 0 and mastery:
+            mastery_percentage = (
+                mastery.mastered_cards / flashcard_set.total_cards
+            ) * 100
 
         set_stats.append(
             schemas.SetStatistics(
                 set_id=flashcard_set.id,
                 title=flashcard_set.title,
-                total_cards=total_cards,
+                total_cards=flashcard_set.total_cards,
                 mastery_percentage=mastery_percentage,
-                last_studied=last_studied,
-                study_count=study_count,
+                last_studied=sessions.last_studied if sessions else None,
+                study_count=sessions.study_count if sessions else 0,
                 average_session_minutes=float(avg_duration) if avg_duration else None,
             )
         )
@@ -355,147 +325,38 @@ def get_study_time_distribution(
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Get study time distribution by day, week, and month."""
-    # Current date for reference
-    now = datetime.now()
-
-    # Daily distribution (last 7 days)
-    daily_data = []
-    for i in range(6, -1, -1):
-        date = now - timedelta(days=i)
-        date_str = date.strftime("%Y-%m-%d")
-
-        # Get study time for this day
-        day_start = datetime(date.year, date.month, date.day, 0, 0, 0)
-        day_end = datetime(date.year, date.month, date.day, 23, 59, 59)
-
-        daily_minutes = (
-            db.query(
-                func.sum(
-                    func.julianday(
-                        func.min(
-                            func.coalesce(
-                                models.StudySession.end_time, func.current_timestamp()
-                            ),
-                            day_end,
-                        )
-                    )
-                    - func.julianday(
-                        func.max(models.StudySession.start_time, day_start)
-                    )
-                )
-                * 24
-                * 60  # Convert to minutes
-            )
-            .filter(
-                models.StudySession.user_id == current_user.id,
-                models.StudySession.start_time <= day_end,
-                func.coalesce(models.StudySession.end_time, func.current_timestamp())
-                >= day_start,
-            )
-            .scalar()
-            or 0
-        )
-
-        daily_data.append(
-            schemas.TimePoint(date=date_str, minutes=float(daily_minutes))
-        )
-
-    # Weekly distribution (last 4 weeks)
-    weekly_data = []
-    for i in range(3, -1, -1):
-        week_start = now - timedelta(days=now.weekday() + 7 * i)
-        week_end = week_start + timedelta(days=6)
-        week_str = (
-            f"{week_start.strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}"
-        )
+    # Last 7 days, last 4 weeks and last 6 months from a single session query
+    daily, weekly, monthly = get_study_time_series(
+        db, current_user.id, [("day", 7), ("week", 4), ("month", 6)]
+    )
 
-        # Get study time for this week
-        week_start_dt = datetime(
-            week_start.year, week_start.month, week_start.day, 0, 0, 0
-        )
-        week_end_dt = datetime(week_end.year, week_end.month, week_end.day, 23, 59, 59)
+    return schemas.StudyTimeDistribution(
+        daily=[schemas.TimePoint(date=label, minutes=m) for label, m in daily],
+        weekly=[schemas.TimePoint(date=label, minutes=m) for label, m in weekly],
+        monthly=[schemas.TimePoint(date=label, minutes=m) for label, m in monthly],
+    )
 
-        weekly_minutes = (
-            db.query(
-                func.sum(
-                    func.julianday(
-                        func.min(
-                            func.coalesce(
-                                models.StudySession.end_time, func.current_timestamp()
-                            ),
-                            week_end_dt,
-                        )
-                    )
-                    - func.julianday(
-                        func.max(models.StudySession.start_time, week_start_dt)
-                    )
-                )
-                * 24
-                * 60  # Convert to minutes
-            )
-            .filter(
-                models.StudySession.user_id == current_user.id,
-                models.StudySession.start_time <= week_end_dt,
-                func.coalesce(models.StudySession.end_time, func.current_timestamp())
-                >= week_start_dt,
-            )
-            .scalar()
-            or 0
-        )
 
-        weekly_data.append(
-            schemas.TimePoint(date=week_str, minutes=float(weekly_minutes))
+@router.get("/study-time/series", response_model=List[schemas.TimePoint])
+def get_study_time_series_endpoint(
+    granularity: str = "day",
+    periods: int = 7,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Get study time for the last `periods` hours, days, weeks or months."""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid granularity. Supported values: {', '.join(GRANULARITIES)}",
         )
 
-    # Monthly distribution (last 6 months)
-    monthly_data = []
-    for i in range(5, -1, -1):
-        month_date = now - timedelta(days=30 * i)
-        month_str = month_date.strftime("%Y-%m")
-
-        # Get study time for this month
-        month_start = datetime(month_date.year, month_date.month, 1, 0, 0, 0)
-        if month_date.month == 12:
-            month_end = datetime(month_date.year + 1, 1, 1, 0, 0, 0) - timedelta(
-                seconds=1
-            )
-        else:
-            month_end = datetime(
-                month_date.year, month_date.month + 1, 1, 0, 0, 0
-            ) - timedelta(seconds=1)
-
-        monthly_minutes = (
-            db.query(
-                func.sum(
-                    func.julianday(
-                        func.min(
-                            func.coalesce(
-                                models.StudySession.end_time, func.current_timestamp()
-                            ),
-                            month_end,
-                        )
-                    )
-                    - func.julianday(
-                        func.max(models.StudySession.start_time, month_start)
-                    )
-                )
-                * 24
-                * 60  # Convert to minutes
-            )
-            .filter(
-                models.StudySession.user_id == current_user.id,
-                models.StudySession.start_time <= month_end,
-                func.coalesce(models.StudySession.end_time, func.current_timestamp())
-                >= month_start,
-            )
-            .scalar()
-            or 0
+    if periods < 1 or periods > MAX_SERIES_PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"periods must be between 1 and {MAX_SERIES_PERIODS}",
         )
 
-        monthly_data.append(
-            schemas.TimePoint(date=month_str, minutes=float(monthly_minutes))
-        )
+    (series,) = get_study_time_series(db, current_user.id, [(granularity, periods)])
 
-    return schemas.StudyTimeDistribution(
-        daily=daily_data, weekly=weekly_data, monthly=monthly_data
-    )
+    return [schemas.TimePoint(date=label, minutes=m) for label, m in series]
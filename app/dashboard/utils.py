@@ -0,0 +1,206 @@
+import base64
+import heapq
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+
+from .. import models
+from ..models import _utc_naive
+
+# A bucket is a (label, start, end) tuple covering the half-open range [start, end)
+Bucket = Tuple[str, datetime, datetime]
+Interval = Tuple[datetime, datetime]
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    """Return the first day of the month `months` away from `value`."""
+    month_index = value.year * 12 + (value.month - 1) + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def build_buckets(granularity: str, periods: int, now: datetime) -> List[Bucket]:
+    """Build the last `periods` calendar buckets up to and including `now`.
+
+    Buckets are returned oldest first. Weeks start on Monday.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+
+    buckets = []
+    if granularity == "hour":
+        current = now.replace(minute=0, second=0, microsecond=0)
+        for i in range(periods - 1, -1, -1):
+            start = current - timedelta(hours=i)
+            buckets.append(
+                (start.strftime("%Y-%m-%d %H:00"), start, start + timedelta(hours=1))
+            )
+    elif granularity == "day":
+        today = datetime(now.year, now.month, now.day)
+        for i in range(periods - 1, -1, -1):
+            start = today - timedelta(days=i)
+            buckets.append(
+                (start.strftime("%Y-%m-%d"), start, start + timedelta(days=1))
+            )
+    elif granularity == "week":
+        monday = datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+        for i in range(periods - 1, -1, -1):
+            start = monday - timedelta(weeks=i)
+            last_day = start + timedelta(days=6)
+            label = f"{start.strftime('%Y-%m-%d')} to {last_day.strftime('%Y-%m-%d')}"
+            buckets.append((label, start, start + timedelta(weeks=1)))
+    else:
+        for i in range(periods - 1, -1, -1):
+            start = _add_months(now, -i)
+            buckets.append((start.strftime("%Y-%m"), start, _add_months(start, 1)))
+
+    return buckets
+
+
+def fetch_session_intervals(
+    db, user_id: int, since: datetime, now: Optional[datetime] = None
+) -> List[Interval]:
+    """Fetch the user's study sessions overlapping [since, now] in one query.
+
+    Sessions that are still in progress are treated as ending at `now`.
+    """
+    now = now or datetime.now()
+    rows = (
+        db.query(models.StudySession.start_time, models.StudySession.end_time)
+        .filter(
+            models.StudySession.user_id == user_id,
+            models.StudySession.start_time <= now,
+            func.coalesce(models.StudySession.end_time, now) >= since,
+        )
+        .all()
+    )
+
+    intervals = []
+    for start_time, end_time in rows:
+        start = _utc_naive(start_time)
+        end = _utc_naive(end_time) or now
+        if end > start:
+            intervals.append((start, end))
+    return intervals
+
+
+def distribute_minutes(
+    intervals: Sequence[Interval], buckets: Sequence[Bucket]
+) -> List[float]:
+    """Clip each interval to the buckets it overlaps and sum minutes per bucket.
+
+    Buckets must be sorted and non-overlapping. Each interval only visits the
+    buckets it actually overlaps, located by binary search.
+    """
+    starts = [start for _, start, _ in buckets]
+    seconds = [0.0] * len(buckets)
+
+    for interval_start, interval_end in intervals:
+        index = max(bisect_right(starts, interval_start) - 1, 0)
+        while index < len(buckets):
+            _, bucket_start, bucket_end = buckets[index]
+            if bucket_start >= interval_end:
+                break
+            overlap_start = max(interval_start, bucket_start)
+            overlap_end = min(interval_end, bucket_end)
+            if overlap_end > overlap_start:
+                seconds[index] += (overlap_end - overlap_start).total_seconds()
+            index += 1
+
+    return [value / 60 for value in seconds]
+
+
+def get_study_time_series(
+    db, user_id: int, series: Sequence[Tuple[str, int]], now: Optional[datetime] = None
+) -> List[List[Tuple[str, float]]]:
+    """Compute study minutes for several bucket series with a single query.
+
+    `series` is a list of (granularity, periods) pairs. The sessions covering
+    the widest series are fetched once and distributed into every series.
+    """
+    now = now or datetime.now()
+    all_buckets = [
+        build_buckets(granularity, periods, now) for granularity, periods in series
+    ]
+
+    starts = [buckets[0][1] for buckets in all_buckets if buckets]
+    if not starts:
+        return [[] for _ in all_buckets]
+
+    intervals = fetch_session_intervals(db, user_id, min(starts), now)
+
+    return [
+        [
+            (label, minutes)
+            for (label, _, _), minutes in zip(
+                buckets, distribute_minutes(intervals, buckets)
+            )
+        ]
+        for buckets in all_buckets
+    ]
+
+
+# Activity types in tie-break order for items sharing a timestamp
+ACTIVITY_TYPES = ("study_session", "flashcard_set_created", "flashcard_progress")
+
+# An activity key orders the feed: (timestamp, type rank, id), newest first
+ActivityKey = Tuple[datetime, int, int]
+
+
+def activity_key(item) -> ActivityKey:
+    """Get the sort key of an activity item."""
+    return (_utc_naive(item.timestamp), ACTIVITY_TYPES.index(item.type), item.id)
+
+
+def encode_activity_cursor(key: ActivityKey) -> str:
+    """Encode an activity key as an opaque cursor string."""
+    timestamp, rank, item_id = key
+    raw = f"{timestamp.isoformat()}|{rank}|{item_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_activity_cursor(cursor: str) -> ActivityKey:
+    """Decode a cursor string produced by encode_activity_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, rank, item_id = raw.split("|")
+        return (_utc_naive(datetime.fromisoformat(timestamp)), int(rank), int(item_id))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def iter_query_batches(query, batch_size: int) -> Iterator:
+    """Lazily iterate over an ordered query, fetching `batch_size` rows at a time."""
+    offset = 0
+    while True:
+        rows = query.offset(offset).limit(batch_size).all()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        offset += batch_size
+
+
+def merge_activity_streams(
+    streams: Iterable[Iterable],
+    limit: int,
+    before: Optional[ActivityKey] = None,
+) -> List:
+    """K-way merge newest-first activity streams and return the first `limit` items.
+
+    Each stream must already be ordered newest first. Items at or after the
+    `before` key are skipped, so a cursor from the previous page resumes
+    exactly where it left off. Streams are consumed lazily, so only about
+    `limit` items are loaded from each.
+    """
+    if before is not None:
+        streams = [
+            (item for item in stream if activity_key(item) < before)
+            for stream in streams
+        ]
+
+    merged = heapq.merge(*streams, key=activity_key, reverse=True)
+    return list(islice(merged, limit))
@@ -1,20 +1,132 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 import os
 
 # Database URL
 # Use data directory for Fly.io persistent volume
 data_dir = os.environ.get("FLY_APP") and "/app/data" or "."
 os.makedirs(data_dir, exist_ok=True)
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{data_dir}/flashcard_app.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get(
+    "DATABASE_URL", f"sqlite:///{data_dir}/flashcard_app.db"
+)
+
+# Some hosts still hand out the scheme SQLAlchemy no longer accepts
+if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
+    SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace(
+        "postgres://", "postgresql://", 1
+    )
+
+# Connection pool settings for server databases such as PostgreSQL
+POOL_SETTINGS = {
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", "30")),
+    # Recycle before typical server and proxy idle timeouts drop connections
+    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+    # Check connections on checkout so restarts don't surface as request errors
+    "pool_pre_ping": True,
+}
+
+# SQLite tuning profiles, applied as PRAGMAs on every new connection
+SQLITE_PROFILES = {
+    # SQLite defaults: rollback journal, synchronous FULL, no busy timeout
+    "default": {},
+    # WAL lets readers run alongside the single writer, and NORMAL sync only
+    # fsyncs at checkpoints, which is still durable against app crashes
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,  # Milliseconds to wait for a write lock
+        "mmap_size": 268435456,  # 256 MB
+        "cache_size": -65536,  # 64 MB (negative values are KiB)
+        "temp_store": "MEMORY",
+    },
+}
 
-# Create engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+# Production tuning on Fly.io unless overridden
+SQLITE_PROFILE = os.environ.get(
+    "SQLITE_PROFILE", os.environ.get("FLY_APP") and "production" or "default"
 )
 
-# Create session factory
+
+def apply_sqlite_profile(engine, profile):
+    """Apply a SQLite tuning profile to every connection the engine opens."""
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(
+            f"Unknown SQLite profile: {profile}. "
+            f"Available profiles: {', '.join(SQLITE_PROFILES)}"
+        )
+
+    pragmas = SQLITE_PROFILES[profile]
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(url=SQLALCHEMY_DATABASE_URL, sqlite_profile=SQLITE_PROFILE):
+    """Create an engine for the given URL.
+
+    SQLite engines get the selected tuning profile; other databases get a
+    tuned connection pool.
+    """
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        apply_sqlite_profile(engine, sqlite_profile)
+        return engine
+
+    return create_engine(url, poolclass=QueuePool, **POOL_SETTINGS)
+
+
+# Async drivers for each database backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+psycopg",
+}
+
+
+def to_async_url(url):
+    """Convert a database URL to use the backend's async driver.
+
+    URLs that already name a driver are returned unchanged.
+    """
+    scheme, separator, rest = url.partition("://")
+    if scheme in ASYNC_DRIVERS:
+        return f"{ASYNC_DRIVERS[scheme]}{separator}{rest}"
+    return url
+
+
+def create_async_db_engine(url=SQLALCHEMY_DATABASE_URL, sqlite_profile=SQLITE_PROFILE):
+    """Create an async engine for the given URL.
+
+    Uses the same SQLite tuning profile or pool settings as create_db_engine.
+    """
+    url = to_async_url(url)
+    if url.startswith("sqlite"):
+        engine = create_async_engine(url)
+        apply_sqlite_profile(engine.sync_engine, sqlite_profile)
+        return engine
+
+    return create_async_engine(url, **POOL_SETTINGS)
+
+
+# Create engines
+engine = create_db_engine()
+async_engine = create_async_db_engine()
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Keep attributes loaded after commit, since async sessions can't lazy load
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
 
 # Create base class for models
 Base = declarative_base()
@@ -29,6 +141,12 @@ def get_db():
         db.close()
 
 
+# Dependency for async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # Database initialization function
 def init_db():
     Base.metadata.create_all(bind=engine)
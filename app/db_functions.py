@@ -0,0 +1,42 @@
+"""
+Dialect-neutral SQL expressions.
+
+SQLite and PostgreSQL disagree on date arithmetic, so these constructs compile
+to the right SQL for whichever database the engine is bound to.
+"""
+
+from sqlalchemy import func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import Float
+
+
+class duration_seconds(FunctionElement):
+    """Number of seconds from `start` to `end` as a float."""
+
+    type = Float()
+    name = "duration_seconds"
+    inherit_cache = True
+
+
+@compiles(duration_seconds)
+def _duration_seconds_default(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return "EXTRACT(EPOCH FROM (%s - %s))" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+@compiles(duration_seconds, "sqlite")
+def _duration_seconds_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return "((julianday(%s) - julianday(%s)) * 86400.0)" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+def session_duration_seconds(start, end):
+    """Duration of a session in seconds, counting open sessions up to now."""
+    return duration_seconds(start, func.coalesce(end, func.current_timestamp()))
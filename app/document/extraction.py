@@ -0,0 +1,209 @@
+import asyncio
+import multiprocessing
+from typing import AsyncIterator, List, Optional, Set, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from ..config import (
+    PDF_EXTRACTION_MEMORY_MB,
+    PDF_EXTRACTION_MIN_PAGES_PER_TASK,
+    PDF_EXTRACTION_TIMEOUT,
+    PDF_EXTRACTION_WORKERS,
+)
+from .utils import count_pages, extract_pdf_pages, extract_text_from_document
+
+# Tasks a worker process runs before it is replaced, returning memory that
+# parsing left fragmented
+MAX_TASKS_PER_WORKER = 100
+
+
+class DocumentExtractionError(Exception):
+    """Raised when a document's text can't be extracted."""
+
+
+class PdfExtractionError(DocumentExtractionError):
+    """Raised when a PDF's text can't be extracted."""
+
+
+def _limit_memory(memory_limit: Optional[int]):
+    """Cap a worker's address space, where the platform supports it."""
+    if resource is None or not memory_limit:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory_limit = min(memory_limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+
+def _settle(future: asyncio.Future, result=None, error=None):
+    """Resolve a future from any thread, unless it is done or its loop closed."""
+
+    def settle():
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    try:
+        future.get_loop().call_soon_threadsafe(settle)
+    except RuntimeError:  # The loop has closed
+        pass
+
+
+class PdfExtractor:
+    """Extracts PDF text in a pool of worker processes.
+
+    Keeps PyPDF2 off the event loop and splits a document's pages into one
+    range per worker, with at least min_pages_per_task pages each, since
+    every task parses the document structure again. Workers' address space
+    is capped at memory_limit bytes. A document that takes longer than
+    timeout seconds has the pool's workers killed and the pool replaced, so
+    a pathological PDF can't keep workers busy for everyone else;
+    extractions running alongside it fail too.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        min_pages_per_task: int,
+        timeout: float,
+        memory_limit: Optional[int] = None,
+    ):
+        self.workers = max(1, workers)
+        self.min_pages_per_task = max(1, min_pages_per_task)
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self._pool = None
+        self._pending: Set[asyncio.Future] = set()
+
+    def _get_pool(self):
+        # Spawn rather than fork, since the app process runs threads
+        if self._pool is None:
+            self._pool = multiprocessing.get_context("spawn").Pool(
+                self.workers,
+                initializer=_limit_memory,
+                initargs=(self.memory_limit,),
+                maxtasksperchild=MAX_TASKS_PER_WORKER,
+            )
+        return self._pool
+
+    def _submit(self, fn, *args) -> asyncio.Future:
+        """Run fn(*args) in a worker, returning a future for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        self._get_pool().apply_async(
+            fn,
+            args,
+            callback=lambda result: _settle(future, result=result),
+            error_callback=lambda error: _settle(future, error=error),
+        )
+        return future
+
+    def page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        """Split a document's pages into contiguous ranges, one per task."""
+        tasks = min(self.workers, -(-page_count // self.min_pages_per_task)) or 1
+        size, extra = divmod(page_count, tasks)
+        ranges, start = [], 0
+        for task in range(tasks):
+            stop = start + size + (1 if task < extra else 0)
+            ranges.append((start, stop))
+            start = stop
+        return ranges
+
+    async def count_pages(self, file_path: str) -> int:
+        """Count a PDF's pages in a worker."""
+        return await self._guard(self._submit(count_pages, file_path))
+
+    async def iter_pages(self, file_path: str) -> AsyncIterator[str]:
+        """Yield the text of each page of a PDF, in order.
+
+        Pages arrive a range at a time, as each worker finishes, so callers
+        can write them out without holding the whole document. The timeout
+        covers the whole document.
+        """
+        deadline = asyncio.get_running_loop().time() + self.timeout
+
+        def remaining():
+            return deadline - asyncio.get_running_loop().time()
+
+        if self.workers == 1:
+            tasks = [self._submit(extract_pdf_pages, file_path)]
+        else:
+            page_count = await self._guard(
+                self._submit(count_pages, file_path), remaining()
+            )
+            tasks = [
+                self._submit(extract_pdf_pages, file_path, start, stop)
+                for start, stop in self.page_ranges(page_count)
+            ]
+
+        try:
+            for task in tasks:
+                for page in await self._guard(task, remaining()):
+                    yield page
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def extract_pages(self, file_path: str) -> List[str]:
+        """Extract the text of each page of a PDF."""
+        return [page async for page in self.iter_pages(file_path)]
+
+    async def extract_text(self, file_path: str) -> str:
+        """Extract a PDF's text, as extract_text_from_pdf does."""
+        return "\n".join(await self.extract_pages(file_path)).strip()
+
+    async def _guard(self, awaitable, timeout: Optional[float] = None):
+        """Await work in the pool within the timeout."""
+        try:
+            return await asyncio.wait_for(
+                awaitable, self.timeout if timeout is None else timeout
+            )
+        except asyncio.TimeoutError:
+            await self._restart()
+            raise PdfExtractionError(
+                f"PDF extraction took longer than {self.timeout:g} seconds"
+            )
+        except MemoryError:
+            raise PdfExtractionError("PDF extraction ran out of memory")
+        except PdfExtractionError:
+            raise
+        except Exception as e:
+            raise PdfExtractionError(f"Could not read PDF: {e}") from e
+
+    async def _restart(self):
+        """Kill the workers, failing whatever else they were running."""
+        pool, self._pool = self._pool, None
+        pending, self._pending = self._pending, set()
+        for future in pending:
+            _settle(future, error=PdfExtractionError("PDF extraction was interrupted"))
+        if pool is not None:
+            await asyncio.to_thread(pool.terminate)
+
+    def close(self):
+        """Stop the worker processes."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+pdf_extractor = PdfExtractor(
+    PDF_EXTRACTION_WORKERS,
+    PDF_EXTRACTION_MIN_PAGES_PER_TASK,
+    PDF_EXTRACTION_TIMEOUT,
+    PDF_EXTRACTION_MEMORY_MB * 1024 * 1024,
+)
+
+
+async def extract_document_text(file_path: str) -> str:
+    """Extract a document's text without blocking the event loop."""
+    if file_path.lower().endswith(".pdf"):
+        return await pdf_extractor.extract_text(file_path)
+    return await asyncio.to_thread(extract_text_from_document, file_path)
@@ -1,30 +1,62 @@
 import os
 import shutil
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status, Form
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    UploadFile,
+    HTTPException,
+    status,
+    Form,
+    Query,
+    Request,
+    Response,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_async_db
 from ..auth.utils import get_current_active_user
+from .extraction import DocumentExtractionError, extract_document_text
+from .store import document_store
 from .utils import (
     is_valid_document,
-    save_upload_file,
-    extract_text_from_document,
+    UploadTooLargeError,
     chunk_text,
 )
-from ..config import UPLOAD_DIRECTORY, MAX_UPLOAD_SIZE
+from ..config import (
+    DOCUMENT_PREVIEW_CHARS,
+    DOCUMENT_TEXT_LIMIT,
+    DOCUMENT_TEXT_MAX_LIMIT,
+    MAX_UPLOAD_SIZE,
+)
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 
+def file_too_large() -> HTTPException:
+    """Build the 400 response for uploads over MAX_UPLOAD_SIZE."""
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"File too large. Maximum size: {MAX_UPLOAD_SIZE / (1024 * 1024)}MB",
+    )
+
+
 @router.post("/upload", response_model=schemas.DocumentUpload)
 async def upload_document(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    preview_chars: int = Query(
+        DOCUMENT_PREVIEW_CHARS, ge=0, le=DOCUMENT_TEXT_MAX_LIMIT
+    ),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
-    """Upload a document and extract text."""
+    """Upload a document and extract text.
+
+    text_content previews the first preview_chars characters of the text
+    (none if 0); read the rest from the text endpoint.
+    """
     # Validate file type
     if not is_valid_document(file.filename):
         raise HTTPException(
@@ -32,64 +64,162 @@ async def upload_document(
             detail="Invalid file type. Supported types: PDF, DOCX, TXT",
         )
 
-    # Check file size
-    file_size = 0
-    content = await file.read()
-    file_size = len(content)
-    await file.seek(0)
-
-    if file_size > MAX_UPLOAD_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size: {MAX_UPLOAD_SIZE / (1024 * 1024)}MB",
-        )
-
-    # Save file to disk
-    file_path = await save_upload_file(file, file.filename)
-
-    # Extract text from document
-    text_content = extract_text_from_document(file_path)
+    # Reject uploads whose size is already known to be over the limit
+    if file.size is not None and file.size > MAX_UPLOAD_SIZE:
+        raise file_too_large()
+
+    # Stream file into the store, enforcing the size limit as it arrives
+    _, extension = os.path.splitext(file.filename)
+    try:
+        stored = await document_store.save(file, extension, MAX_UPLOAD_SIZE)
+    except UploadTooLargeError:
+        raise file_too_large()
+
+    # Text is extracted once per stored file; the page count comes from
+    # its index
+    try:
+        index = await document_store.text_index(stored.storage_key)
+        text_content = None
+        if preview_chars:
+            text_content = await document_store.read_text(
+                stored.storage_key, 0, preview_chars
+            )
+    except DocumentExtractionError as e:
+        if stored.created:
+            document_store.delete(stored.storage_key)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    page_count = len(index.pages) or None
+
+    # Record the document, replacing one uploaded under the same name. A
+    # file no document refers to any more is left for stored_file_sweeper.
+    document = await db.scalar(models.Document.lookup(current_user.id, file.filename))
+    if document is None:
+        document = models.Document(user_id=current_user.id, filename=file.filename)
+        db.add(document)
+    document.content_type = file.content_type
+    document.sha256 = stored.sha256
+    document.storage_key = stored.storage_key
+    document.size = stored.size
+    document.page_count = page_count
+    await db.commit()
 
     # Return document information
     return {
         "filename": file.filename,
         "content_type": file.content_type,
-        "size": file_size,
+        "size": stored.size,
+        "sha256": stored.sha256,
+        "page_count": page_count,
+        "text_length": index.length,
         "text_content": text_content,
     }
 
 
-@router.get("/text/{filename}")
+@router.get("/text/{filename}", response_model=schemas.DocumentText)
 async def get_document_text(
     filename: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    page: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(DOCUMENT_TEXT_LIMIT, ge=1, le=DOCUMENT_TEXT_MAX_LIMIT),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
-    """Get text from an uploaded document."""
-    # Check if file exists
-    file_path = os.path.join(UPLOAD_DIRECTORY, filename)
-    if not os.path.exists(file_path):
+    """Get text from an uploaded document, a page or range at a time.
+
+    Returns up to limit characters from offset, or one PDF page. Offsets
+    count characters; next_offset is where the following range starts, or
+    null at the end. Responses carry an ETag for If-None-Match.
+    """
+    document = await db.scalar(models.Document.lookup(current_user.id, filename))
+    if document is None:
+        return await get_legacy_document_text(filename, page, offset, limit)
+
+    # The text only changes when the name is given to different content
+    etag = f'W/"{document.storage_key}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+    index = await document_store.text_index(document.storage_key)
+    if page is not None:
+        if page > len(index.pages):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Page not found"
+            )
+        offset, stop = index.page_range(page)
+        limit = stop - offset
+
+    text = await document_store.read_text(document.storage_key, offset, limit)
+    return text_range(text, offset, index.length, page, len(index.pages) or None)
+
+
+async def get_legacy_document_text(
+    filename: str, page: Optional[int], offset: int, limit: int
+):
+    """Get text from a file uploaded before the document store, in place."""
+    file_path = document_store.legacy_path(filename)
+    if file_path is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
         )
+    if page is not None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Page not found"
+        )
 
     # Extract text from document
-    text = extract_text_from_document(file_path)
+    text = await extract_document_text(file_path)
 
-    # Return text
-    return {"text": text}
+    return text_range(text[offset : offset + limit], offset, len(text))
+
+
+def text_range(
+    text: str,
+    offset: int,
+    length: int,
+    page: Optional[int] = None,
+    page_count: Optional[int] = None,
+) -> dict:
+    """Build the response for a range of a document's text."""
+    end = offset + len(text)
+    return {
+        "text": text,
+        "offset": offset,
+        "length": length,
+        "next_offset": end if end < length else None,
+        "page": page,
+        "page_count": page_count,
+    }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag, comparing weakly."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
 
 
 @router.delete("/{filename}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_document(
     filename: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Delete an uploaded document."""
+    document = await db.scalar(models.Document.lookup(current_user.id, filename))
+    if document is not None:
+        # Its stored file is left for stored_file_sweeper
+        await db.delete(document)
+        await db.commit()
+        return
+
     # Check if file exists
-    file_path = os.path.join(UPLOAD_DIRECTORY, filename)
-    if not os.path.exists(file_path):
+    file_path = document_store.legacy_path(filename)
+    if file_path is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
         )
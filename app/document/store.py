@@ -0,0 +1,311 @@
+import asyncio
+import io
+import json
+import os
+import re
+import time
+import uuid
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from fastapi import UploadFile
+
+from ..config import UPLOAD_DIRECTORY
+from .extraction import DocumentExtractionError, pdf_extractor
+from .utils import (
+    TextSegment,
+    iter_document_segments,
+    segment_text,
+    write_upload_file,
+)
+
+# Suffixes of the extracted text stored next to each document, and of its
+# index
+TEXT_SUFFIX = ".txt"
+INDEX_SUFFIX = ".index.json"
+
+# Names of stored files: a SHA-256 digest and the original extension
+STORAGE_KEY = re.compile(r"[0-9a-f]{64}\.\w+")
+
+# Characters between the text index's checkpoints, so reading from any
+# offset decodes at most this much text before it
+CHECKPOINT_CHARS = 64 * 1024
+
+
+class StoredFile(NamedTuple):
+    """A file in the document store, and whether this upload added it."""
+
+    storage_key: str
+    size: int
+    sha256: str
+    created: bool
+
+
+class TextIndex(NamedTuple):
+    """Where to find characters in a stored file's extracted text.
+
+    Positions are [character offset, byte offset] pairs: one checkpoint at
+    every CHECKPOINT_CHARS characters, and for PDFs the start of each page.
+    """
+
+    length: int
+    checkpoints: List[List[int]]
+    pages: List[List[int]]
+
+    def page_range(self, page: int) -> Tuple[int, int]:
+        """Character offsets where a 1-based page starts and ends."""
+        start = min(self.pages[page - 1][0], self.length)
+        stop = self.pages[page][0] if page < len(self.pages) else self.length
+        return start, min(stop, self.length)
+
+
+class TextWriter:
+    """Writes extracted text segment by segment under a temporary name.
+
+    The text is stripped of leading and trailing whitespace as it is
+    written, as extract_text_from_document does, so offsets index the same
+    text. Its index is written before the text is moved into place, so the
+    text only appears once its index does.
+    """
+
+    def __init__(self, text_path: str, index_path: str):
+        self.text_path = text_path
+        self.index_path = index_path
+        self.partial_path = f"{text_path}.{uuid.uuid4().hex}.part"
+        self.file = open(self.partial_path, "w", encoding="utf-8", newline="")
+        self.length = 0
+        self.size = 0
+        # Whitespace held back until more text follows it
+        self.pending = ""
+        self.checkpoints: List[List[int]] = []
+        self.pages: List[List[int]] = []
+
+    def write(self, segment: TextSegment):
+        text = segment.text
+        if not self.length:
+            text = text.lstrip()
+        if segment.page is not None:
+            self.pages.append(
+                [
+                    self.length + len(self.pending),
+                    self.size + len(self.pending.encode("utf-8")),
+                ]
+            )
+
+        body = text.rstrip()
+        if body:
+            self._write(self.pending + body)
+            self.pending = text[len(body) :]
+        else:
+            self.pending += text
+
+    def _write(self, text: str):
+        start = 0
+        while start < len(text):
+            if self.length % CHECKPOINT_CHARS == 0:
+                self.checkpoints.append([self.length, self.size])
+            stop = start + CHECKPOINT_CHARS - self.length % CHECKPOINT_CHARS
+            piece = text[start:stop]
+            self.file.write(piece)
+            self.length += len(piece)
+            self.size += len(piece.encode("utf-8"))
+            start = stop
+
+    def write_all(self, segments: Iterable[TextSegment]):
+        for segment in segments:
+            self.write(segment)
+
+    def commit(self):
+        self.file.close()
+        partial_index = f"{self.partial_path}.index"
+        with open(partial_index, "w") as f:
+            json.dump(
+                {
+                    "length": self.length,
+                    "checkpoints": self.checkpoints or [[0, 0]],
+                    "pages": self.pages,
+                },
+                f,
+            )
+        os.replace(partial_index, self.index_path)
+        os.replace(self.partial_path, self.text_path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+class DocumentStore:
+    """Content-addressed storage for uploaded documents.
+
+    Files are stored once per SHA-256 digest and extension, under
+    objects/<first two digest characters>/<digest><extension>, so identical
+    uploads share a copy and same-named uploads never overwrite each other.
+    Each file's extracted text is written next to it the first time it is
+    read, so later reads are plain file reads instead of re-parsing the
+    document. Which users and filenames refer to a file is recorded in the
+    documents table; files none refer to are removed by StoredFileSweeper.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @property
+    def objects_directory(self) -> str:
+        return os.path.join(self.directory, "objects")
+
+    def path(self, storage_key: str) -> str:
+        """Path of a stored file."""
+        return os.path.join(self.objects_directory, storage_key[:2], storage_key)
+
+    def text_path(self, storage_key: str) -> str:
+        """Path of a stored file's extracted text."""
+        return self.path(storage_key) + TEXT_SUFFIX
+
+    def index_path(self, storage_key: str) -> str:
+        """Path of the page index of a stored file's extracted text."""
+        return self.path(storage_key) + INDEX_SUFFIX
+
+    async def save(
+        self, upload_file, extension: str, max_size: Optional[int] = None
+    ) -> StoredFile:
+        """Stream an upload into the store, keeping one copy per content.
+
+        Raises UploadTooLargeError if the upload is bigger than max_size.
+        """
+        os.makedirs(self.objects_directory, exist_ok=True)
+        partial_path = os.path.join(self.objects_directory, f"{uuid.uuid4().hex}.part")
+        saved = await write_upload_file(upload_file, partial_path, max_size)
+
+        storage_key = saved.sha256 + extension.lower()
+        file_path = self.path(storage_key)
+        created = not os.path.exists(file_path)
+        if created:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(partial_path, file_path)
+        else:
+            os.remove(partial_path)
+            # Mark the file as in use, so a sweep spares it until the upload
+            # is recorded
+            os.utime(file_path)
+
+        return StoredFile(storage_key, saved.size, saved.sha256, created)
+
+    async def add_file(self, file_path: str) -> StoredFile:
+        """Copy a file already on disk into the store."""
+        extension = os.path.splitext(file_path)[1]
+        with open(file_path, "rb") as f:
+            return await self.save(UploadFile(f), extension)
+
+    async def _cached_text_path(self, storage_key: str) -> str:
+        """Path of a file's extracted text, extracting it on first use."""
+        text_path = self.text_path(storage_key)
+        index_path = self.index_path(storage_key)
+        if os.path.exists(text_path) and os.path.exists(index_path):
+            return text_path
+
+        file_path = self.path(storage_key)
+        writer = TextWriter(text_path, index_path)
+        try:
+            if file_path.lower().endswith(".pdf"):
+                # Pages are written as each range comes back from the workers
+                page = 0
+                async for text in pdf_extractor.iter_pages(file_path):
+                    page += 1
+                    writer.write(TextSegment(text + "\n", 0, page))
+            else:
+                try:
+                    await asyncio.to_thread(
+                        writer.write_all, iter_document_segments(file_path)
+                    )
+                except Exception as e:
+                    raise DocumentExtractionError(
+                        f"Could not read document: {e}"
+                    ) from e
+            writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+        return text_path
+
+    async def text_index(self, storage_key: str) -> TextIndex:
+        """Return the index of a stored file's text, extracting it if needed."""
+        await self._cached_text_path(storage_key)
+        with open(self.index_path(storage_key), "r") as f:
+            return TextIndex(**json.load(f))
+
+    async def read_text(
+        self, storage_key: str, offset: int = 0, limit: Optional[int] = None
+    ) -> str:
+        """Return up to limit characters of a stored file's text from offset.
+
+        Seeks to the nearest checkpoint, so the cost depends on limit, not
+        on how far into the document offset is.
+        """
+        index = await self.text_index(storage_key)
+        if offset >= index.length or limit == 0:
+            return ""
+
+        checkpoint, position = index.checkpoints[offset // CHECKPOINT_CHARS]
+        with open(self.text_path(storage_key), "rb") as raw:
+            raw.seek(position)
+            with io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+                f.read(offset - checkpoint)
+                return f.read(-1 if limit is None else limit)
+
+    async def extract_text(self, storage_key: str) -> str:
+        """Return a stored file's text."""
+        return await self.read_text(storage_key)
+
+    async def iter_segments(self, storage_key: str) -> Iterator[TextSegment]:
+        """Return an iterator over a stored file's pages, or lines if unpaged."""
+        index = await self.text_index(storage_key)
+        return self._read_segments(self.text_path(storage_key), index)
+
+    @staticmethod
+    def _read_segments(text_path: str, index: TextIndex) -> Iterator[TextSegment]:
+        with open(text_path, "r", encoding="utf-8", newline="") as f:
+            if not index.pages:
+                yield from segment_text(f)
+                return
+
+            for page in range(1, len(index.pages) + 1):
+                start, stop = index.page_range(page)
+                yield TextSegment(f.read(stop - start), start, page)
+
+    def delete(self, storage_key: str):
+        """Remove a stored file and its text."""
+        for path in (
+            self.path(storage_key),
+            self.text_path(storage_key),
+            self.index_path(storage_key),
+        ):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def is_idle(self, storage_key: str, seconds: float) -> bool:
+        """Whether a stored file was last saved at least seconds ago."""
+        try:
+            modified = os.path.getmtime(self.path(storage_key))
+        except FileNotFoundError:
+            return False
+        return time.time() - modified >= seconds
+
+    def idle_files(self, seconds: float) -> List[str]:
+        """Storage keys of the stored files last saved at least seconds ago."""
+        if not os.path.isdir(self.objects_directory):
+            return []
+        return [
+            name
+            for _, _, names in os.walk(self.objects_directory)
+            for name in names
+            if STORAGE_KEY.fullmatch(name) and self.is_idle(name, seconds)
+        ]
+
+    def legacy_path(self, filename: str) -> Optional[str]:
+        """Path of a file uploaded under its own name before the store existed."""
+        file_path = os.path.join(self.directory, filename)
+        return file_path if os.path.isfile(file_path) else None
+
+
+document_store = DocumentStore(UPLOAD_DIRECTORY)
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from typing import Optional
+
+from .. import models
+from ..config import DOCUMENT_SWEEP_GRACE_SECONDS, DOCUMENT_SWEEP_INTERVAL
+from ..database import AsyncSessionLocal
+from .store import document_store
+
+logger = logging.getLogger(__name__)
+
+
+class StoredFileSweeper:
+    """Deletes stored files that no document refers to, on a timer.
+
+    Replacing or deleting a document leaves its file for the sweep rather
+    than deleting it at once, since a concurrent upload of the same content
+    may be about to refer to it again. Uploads refresh the age of a file
+    they reuse, and only files idle for `grace_seconds` are swept, so an
+    upload has that long to record its document.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        interval: float = DOCUMENT_SWEEP_INTERVAL,
+        grace_seconds: float = DOCUMENT_SWEEP_GRACE_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.grace_seconds = grace_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start sweeping in the background."""
+        self._task = asyncio.create_task(self._work())
+
+    async def stop(self):
+        """Stop sweeping."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _work(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Sweeping stored files failed")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> int:
+        """Delete idle stored files no document refers to, returning how many."""
+        idle = await asyncio.to_thread(document_store.idle_files, self.grace_seconds)
+        removed = 0
+        async with self.session_factory() as db:
+            for storage_key in idle:
+                if await db.scalar(models.Document.is_stored(storage_key)) is not None:
+                    continue
+                # An upload may have reused the file since it was listed
+                if document_store.is_idle(storage_key, self.grace_seconds):
+                    document_store.delete(storage_key)
+                    removed += 1
+        if removed:
+            logger.info(f"Removed {removed} unreferenced stored files")
+        return removed
+
+
+# Shared sweeper, started with the app
+stored_file_sweeper = StoredFileSweeper()
@@ -1,11 +1,30 @@
+import hashlib
 import os
+import re
+import uuid
 import PyPDF2
 import docx
-from typing import List, Optional
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
 import shutil
 from pathlib import Path
 
-from ..config import UPLOAD_DIRECTORY, ALLOWED_EXTENSIONS
+from ..config import UPLOAD_DIRECTORY, ALLOWED_EXTENSIONS, UPLOAD_CHUNK_SIZE
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload grows past its size limit while being saved."""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"Upload exceeds {max_size} bytes")
+        self.max_size = max_size
+
+
+class SavedUpload(NamedTuple):
+    """Where an upload was written, its size and its SHA-256 digest."""
+
+    path: str
+    size: int
+    sha256: str
 
 
 def is_valid_document(filename: str) -> bool:
@@ -17,21 +36,61 @@ def is_valid_document(filename: str) -> bool:
     return file_extension.lower() in ALLOWED_EXTENSIONS
 
 
-async def save_upload_file(upload_file, filename: str) -> str:
-    """Save uploaded file to disk."""
-    # Create file path
-    file_path = os.path.join(UPLOAD_DIRECTORY, filename)
+async def write_upload_file(
+    upload_file,
+    file_path: str,
+    max_size: Optional[int] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SavedUpload:
+    """Stream an uploaded file to file_path in chunks, hashing it on the way.
+
+    Only one chunk is held in memory at a time. Raises UploadTooLargeError
+    as soon as max_size is exceeded; the partial file is removed if writing
+    fails.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(file_path, "wb") as f:
+            while chunk := await upload_file.read(chunk_size):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLargeError(max_size)
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
 
-    # Ensure upload directory exists
+    return SavedUpload(file_path, size, digest.hexdigest())
+
+
+async def stream_upload_file(
+    upload_file,
+    filename: str,
+    max_size: Optional[int] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SavedUpload:
+    """Stream an uploaded file to the upload directory under its filename.
+
+    The file is written under a temporary name and moved into place once
+    complete, so a failed upload doesn't replace an existing file.
+    """
+    file_path = os.path.join(UPLOAD_DIRECTORY, filename)
     os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
-    # Save file
-    content = await upload_file.read()
-    with open(file_path, "wb") as f:
-        f.write(content)
+    saved = await write_upload_file(
+        upload_file, f"{file_path}.{uuid.uuid4().hex}.part", max_size, chunk_size
+    )
+    os.replace(saved.path, file_path)
+    return saved._replace(path=file_path)
+
 
-    # Return file path
-    return file_path
+async def save_upload_file(upload_file, filename: str) -> str:
+    """Save uploaded file to disk."""
+    saved = await stream_upload_file(upload_file, filename)
+    return saved.path
 
 
 def extract_text_from_document(file_path: str) -> str:
@@ -51,33 +110,80 @@ def extract_text_from_document(file_path: str) -> str:
         raise ValueError(f"Unsupported file type: {file_extension}")
 
 
+class TextSegment(NamedTuple):
+    """A page, paragraph or line of a document's text."""
+
+    text: str
+    offset: int  # Characters before this segment in the document's text
+    page: Optional[int] = None  # 1-based page number, for PDFs
+
+
+def iter_document_segments(file_path: str) -> Iterator[TextSegment]:
+    """Yield a document's text segment by segment without loading all of it.
+
+    PDFs yield one page at a time, DOCX files one paragraph and TXT files
+    one line. Each segment ends with a newline, and offsets count
+    characters in the concatenated segments.
+    """
+    _, file_extension = os.path.splitext(file_path)
+    file_extension = file_extension.lower()
+
+    if file_extension == ".pdf":
+        with open(file_path, "rb") as file:
+            pieces = (
+                page.extract_text() + "\n" for page in PyPDF2.PdfReader(file).pages
+            )
+            yield from segment_text(pieces, paged=True)
+    elif file_extension == ".docx":
+        paragraphs = docx.Document(file_path).paragraphs
+        yield from segment_text(paragraph.text + "\n" for paragraph in paragraphs)
+    elif file_extension == ".txt":
+        with open(file_path, "r", encoding="utf-8") as file:
+            yield from segment_text(file)
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+
+
+def segment_text(pieces: Iterable[str], paged: bool = False) -> Iterator[TextSegment]:
+    """Number text pieces with their offsets, and as pages if paged."""
+    offset = 0
+    for page, piece in enumerate(pieces, 1):
+        yield TextSegment(piece, offset, page if paged else None)
+        offset += len(piece)
+
+
+def iter_document_text(file_path: str) -> Iterator[str]:
+    """Yield a document's text piece by piece without loading all of it."""
+    return (segment.text for segment in iter_document_segments(file_path))
+
+
+def count_pages(file_path: str) -> Optional[int]:
+    """Count a PDF's pages; other documents have no fixed pages."""
+    if os.path.splitext(file_path)[1].lower() != ".pdf":
+        return None
+    with open(file_path, "rb") as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
 def extract_text_from_pdf(file_path: str) -> str:
     """Extract text from PDF file."""
-    # Open PDF file
-    with open(file_path, "rb") as file:
-        pdf_reader = PyPDF2.PdfReader(file)
+    return "\n".join(extract_pdf_pages(file_path)).strip()
 
-        # Extract text from each page
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
 
-        # Return combined text
-        return text.strip()
+def extract_pdf_pages(
+    file_path: str, start: int = 0, stop: Optional[int] = None
+) -> List[str]:
+    """Extract the text of a range of a PDF's pages."""
+    with open(file_path, "rb") as file:
+        pages = PyPDF2.PdfReader(file).pages
+        stop = len(pages) if stop is None else min(stop, len(pages))
+        return [pages[number].extract_text() for number in range(start, stop)]
 
 
 def extract_text_from_docx(file_path: str) -> str:
     """Extract text from DOCX file."""
-    # Open DOCX file
     doc = docx.Document(file_path)
-
-    # Extract text
-    text = ""
-    for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
-
-    # Return text
-    return text.strip()
+    return "\n".join(paragraph.text for paragraph in doc.paragraphs).strip()
 
 
 def extract_text_from_txt(file_path: str) -> str:
@@ -103,3 +209,158 @@ def chunk_text(text: str, chunk_size: int = 2000) -> List[str]:
 
     # Return list of chunks
     return chunks
+
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate how many model tokens a text uses.
+
+    Counts one token per four characters of each word (at least one) and one
+    per punctuation mark, which tracks subword tokenizers closely on prose.
+    """
+    return sum(1 + (len(token) - 1) // 4 for token in TOKEN_PATTERN.findall(text))
+
+
+class TextUnit(NamedTuple):
+    """A paragraph, sentence or word run that chunks are packed from."""
+
+    text: str
+    tokens: int
+    separator: str  # Joins the unit to the one before it
+
+
+def _split_paragraph(
+    paragraph: str, max_tokens: int, separator: str = "\n\n"
+) -> Iterator[TextUnit]:
+    """Split a paragraph into units of at most max_tokens.
+
+    Oversized paragraphs split on sentences, and oversized sentences on words.
+    `separator` joins the first unit to the text before it.
+    """
+    paragraph = " ".join(paragraph.split())
+    if not paragraph:
+        return
+
+    tokens = estimate_tokens(paragraph)
+    if tokens <= max_tokens:
+        yield TextUnit(paragraph, tokens, separator)
+        return
+
+    for sentence in SENTENCE_BREAK.split(paragraph):
+        tokens = estimate_tokens(sentence)
+        if tokens <= max_tokens:
+            yield TextUnit(sentence, tokens, separator)
+        else:
+            words, size = [], 0
+            for word in sentence.split(" "):
+                word_tokens = estimate_tokens(word)
+                if words and size + word_tokens > max_tokens:
+                    yield TextUnit(" ".join(words), size, separator)
+                    words, size, separator = [], 0, " "
+                words.append(word)
+                size += word_tokens
+            if words:
+                yield TextUnit(" ".join(words), size, separator)
+        separator = " "
+
+
+def _iter_units(pieces: Iterable[str], max_tokens: int) -> Iterator[TextUnit]:
+    """Stream text units from text pieces, splitting on paragraph breaks.
+
+    Only newly arrived text is searched for breaks. Text without paragraph
+    breaks is flushed once it grows past a few chunks, at the last sentence
+    break or else the last space, so the buffer stays under flush_size.
+    """
+    flush_size = max_tokens * 16  # Characters, roughly four chunks
+    buffer = ""
+    # Text flushed mid-paragraph continues it rather than starting a new one
+    separator = "\n\n"
+
+    for piece in pieces:
+        # The buffer holds no paragraph break, so a new one can only start
+        # in its trailing whitespace
+        search_start = len(buffer.rstrip())
+        buffer += piece
+
+        start = 0
+        for match in PARAGRAPH_BREAK.finditer(buffer, search_start):
+            yield from _split_paragraph(
+                buffer[start : match.start()], max_tokens, separator
+            )
+            separator = "\n\n"
+            start = match.end()
+        buffer = buffer[start:]
+
+        if len(buffer) > flush_size:
+            end, resume = _flush_point(buffer, flush_size // 2)
+            yield from _split_paragraph(buffer[:end], max_tokens, separator)
+            buffer = buffer[resume:]
+            separator = " "
+
+    yield from _split_paragraph(buffer, max_tokens, separator)
+
+
+def _flush_point(buffer: str, keep: int) -> Tuple[int, int]:
+    """Where to cut text so at most `keep` characters of it stay buffered.
+
+    Returns the end of the text to flush and where the rest resumes. Cuts
+    at the last sentence break, else the last space or newline, else after
+    all of it.
+    """
+    last = None
+    for last in SENTENCE_BREAK.finditer(buffer):
+        pass
+    if last is not None and len(buffer) - last.end() <= keep:
+        return last.start(), last.end()
+
+    cut = max(buffer.rfind(" "), buffer.rfind("\n"))
+    if cut >= 0 and len(buffer) - cut - 1 <= keep:
+        return cut, cut + 1
+    return len(buffer), len(buffer)
+
+
+def iter_chunks(
+    pieces: Iterable[str], max_tokens: int = 2000, overlap_tokens: int = 200
+) -> Iterator[str]:
+    """Split streamed text into chunks of about max_tokens for AI processing.
+
+    Chunks break on paragraph boundaries where possible, then on sentences,
+    and only split words apart for runaway sentences. Each chunk repeats up
+    to overlap_tokens of trailing units from the previous one for context.
+    Chunks are yielded as soon as they fill up.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+
+    chunk: List[TextUnit] = []
+    size = 0
+
+    for unit in _iter_units(pieces, max_tokens):
+        if chunk and size + unit.tokens > max_tokens:
+            yield _join_units(chunk)
+
+            # Carry trailing units into the next chunk as overlap
+            overlap, overlap_size = [], 0
+            for previous in reversed(chunk):
+                if overlap_size + previous.tokens > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous.tokens
+            while overlap and overlap_size + unit.tokens > max_tokens:
+                overlap_size -= overlap.pop(0).tokens
+            chunk, size = overlap, overlap_size
+
+        chunk.append(unit)
+        size += unit.tokens
+
+    if chunk:
+        yield _join_units(chunk)
+
+
+def _join_units(units: List[TextUnit]) -> str:
+    """Join text units back into text."""
+    return "".join(unit.separator + unit.text for unit in units).lstrip()
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_async_db, get_db
 from ..auth.utils import get_current_active_user
 
 router = APIRouter(prefix="/flashcards", tags=["flashcards"])
@@ -36,21 +38,21 @@ def create_flashcard_set(
 
 
 @router.get("/sets", response_model=List[schemas.FlashcardSet])
-def get_flashcard_sets(
+async def get_flashcard_sets(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Get all flashcard sets for the current user."""
     # Get all flashcard sets for current user with pagination
-    return (
-        db.query(models.FlashcardSet)
+    result = await db.scalars(
+        select(models.FlashcardSet)
         .filter(models.FlashcardSet.user_id == current_user.id)
         .offset(skip)
         .limit(limit)
-        .all()
     )
+    return result.all()
 
 
 @router.get("/sets/{set_id}", response_model=schemas.FlashcardSetWithCards)
@@ -184,22 +186,20 @@ def create_flashcard(
 
 
 @router.get("/sets/{set_id}/cards", response_model=List[schemas.Flashcard])
-def get_flashcards(
+async def get_flashcards(
     set_id: int,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Get all flashcards in a set."""
     # Get flashcard set by ID and check if user has access
-    db_flashcard_set = (
-        db.query(models.FlashcardSet)
-        .filter(
+    db_flashcard_set = await db.scalar(
+        select(models.FlashcardSet).filter(
             models.FlashcardSet.id == set_id,
             models.FlashcardSet.user_id == current_user.id,
         )
-        .first()
     )
 
     if db_flashcard_set is None:
@@ -208,13 +208,13 @@ def get_flashcards(
         )
 
     # Get all flashcards in set with pagination
-    return (
-        db.query(models.Flashcard)
+    result = await db.scalars(
+        select(models.Flashcard)
         .filter(models.Flashcard.set_id == set_id)
         .offset(skip)
         .limit(limit)
-        .all()
     )
+    return result.all()
 
 
 @router.put("/sets/{set_id}/cards/{card_id}", response_model=schemas.Flashcard)
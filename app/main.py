@@ -1,5 +1,7 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
@@ -7,7 +9,8 @@ import os
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse
 
-from .database import engine, Base
+from .database import engine, Base, SessionLocal
+from .models import CardProgressSummary
 
 # Import routers
 from .auth.router import router as auth_router
@@ -16,14 +19,37 @@ from .ai.router import router as ai_router
 from .flashcards.router import router as flashcards_router
 from .study.router import router as study_router
 from .dashboard.router import router as dashboard_router
+from .ai.jobs import job_runner
+from .document.extraction import pdf_extractor
+from .document.sweeper import stored_file_sweeper
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# Fill the progress rollup on databases whose history predates it
+with SessionLocal() as db:
+    CardProgressSummary.backfill(db)
+
 # Create upload directory if it doesn't exist
 os.makedirs("uploads", exist_ok=True)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background generation jobs and stored file sweeps while the app
+    is up, and stop PDF extraction workers on shutdown."""
+    await job_runner.start()
+    await stored_file_sweeper.start()
+    try:
+        yield
+    finally:
+        await stored_file_sweeper.stop()
+        await job_runner.stop()
+        pdf_extractor.close()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Flashcard App API",
     description="API for the Flashcard Application with AI-powered flashcard generation",
     version="1.0.0",
@@ -40,6 +66,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compress large responses such as document text; event streams are left
+# alone
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 # Mount static files
 # app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+
 from sqlalchemy import (
     Boolean,
     Column,
@@ -5,13 +7,33 @@ from sqlalchemy import (
     Integer,
     String,
     DateTime,
+    Float,
+    Index,
     Text,
+    UniqueConstraint,
+    and_,
     case,
+    event,
+    insert,
+    select,
+    update,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import func
 
 from .database import Base
+from .study.utils import DEFAULT_EASE_FACTOR, schedule_review
+
+# Numeric score for each difficulty level, used to average difficulty
+DIFFICULTY_SCORES = {"easy": 1, "medium": 2, "hard": 3}
+DEFAULT_DIFFICULTY_SCORE = 2
+
+
+def _utc_naive(value):
+    """Normalize a datetime to naive UTC so stored and new values compare."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 
 class User(Base):
@@ -191,25 +213,11 @@ class FlashcardProgress(Base):
     @classmethod
     def get_stats_by_flashcard(cls, db, flashcard_id, user_id):
         """Get statistics for a flashcard and user."""
-        from sqlalchemy import func
+        summary = CardProgressSummary
 
         stats = (
-            db.query(
-                cls.flashcard_id,
-                func.sum(cls.is_correct.cast(Integer)).label("correct_count"),
-                func.sum((~cls.is_correct).cast(Integer)).label("incorrect_count"),
-                func.max(cls.created_at).label("last_studied"),
-                func.avg(
-                    case(
-                        (cls.difficulty == "easy", 1),
-                        (cls.difficulty == "medium", 2),
-                        (cls.difficulty == "hard", 3),
-                        else_=2,
-                    )
-                ).label("average_difficulty"),
-            )
-            .filter(cls.flashcard_id == flashcard_id, cls.user_id == user_id)
-            .group_by(cls.flashcard_id)
+            db.query(*summary.stats_columns())
+            .filter(summary.flashcard_id == flashcard_id, summary.user_id == user_id)
             .first()
         )
 
@@ -218,30 +226,491 @@ class FlashcardProgress(Base):
     @classmethod
     def get_stats_by_set(cls, db, set_id, user_id):
         """Get statistics for all flashcards in a set for a user."""
-        from sqlalchemy import func
-        from sqlalchemy.orm import aliased
-
-        flashcard_alias = aliased(Flashcard)
+        summary = CardProgressSummary
 
         stats = (
+            db.query(*summary.stats_columns())
+            .join(Flashcard, summary.flashcard_id == Flashcard.id)
+            .filter(Flashcard.set_id == set_id, summary.user_id == user_id)
+            .all()
+        )
+
+        return stats
+
+    @classmethod
+    def get_card_stats_subquery(cls, db, user_id):
+        """Get a subquery of per-flashcard statistics for a user's own cards."""
+        summary = CardProgressSummary
+
+        return (
             db.query(
-                cls.flashcard_id,
-                func.sum(cls.is_correct.cast(Integer)).label("correct_count"),
-                func.sum((~cls.is_correct).cast(Integer)).label("incorrect_count"),
-                func.max(cls.created_at).label("last_studied"),
-                func.avg(
-                    case(
-                        (cls.difficulty == "easy", 1),
-                        (cls.difficulty == "medium", 2),
-                        (cls.difficulty == "hard", 3),
-                        else_=2,
-                    )
-                ).label("average_difficulty"),
+                *summary.stats_columns(),
+                summary.is_mastered.label("is_mastered"),
+                Flashcard.set_id.label("set_id"),
+            )
+            .join(Flashcard, summary.flashcard_id == Flashcard.id)
+            .join(FlashcardSet, Flashcard.set_id == FlashcardSet.id)
+            .filter(summary.user_id == user_id, FlashcardSet.user_id == user_id)
+            .subquery()
+        )
+
+    @classmethod
+    def _mastery_counts_query(cls, db, user_id):
+        """Build a query counting mastered and struggling cards for a user.
+
+        A card is struggling when it is not mastered and has more incorrect
+        than correct answers.
+        """
+        from sqlalchemy import func
+
+        stats = cls.get_card_stats_subquery(db, user_id)
+        mastered = stats.c.is_mastered
+        struggling = and_(~mastered, stats.c.incorrect_count > stats.c.correct_count)
+
+        query = db.query(
+            func.coalesce(func.sum(case((mastered, 1), else_=0)), 0).label(
+                "mastered_cards"
+            ),
+            func.coalesce(func.sum(case((struggling, 1), else_=0)), 0).label(
+                "struggling_cards"
+            ),
+        ).select_from(stats)
+
+        return query, stats
+
+    @classmethod
+    def get_mastery_counts(cls, db, user_id):
+        """Get mastered and struggling card counts for a user in a single query."""
+        query, _ = cls._mastery_counts_query(db, user_id)
+        return query.one()
+
+    @classmethod
+    def get_mastery_counts_by_set(cls, db, user_id):
+        """Get mastered and struggling card counts for each of a user's sets."""
+        query, stats = cls._mastery_counts_query(db, user_id)
+        rows = query.add_columns(stats.c.set_id).group_by(stats.c.set_id).all()
+        return {row.set_id: row for row in rows}
+
+
+class CardProgressSummary(Base):
+    """Per-card rollup of a user's review history, maintained on every review.
+
+    Also holds the card's spaced-repetition schedule, indexed by due time.
+    """
+
+    __tablename__ = "card_progress_summary"
+    __table_args__ = (Index("ix_card_progress_summary_user_due", "user_id", "due_at"),)
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+    correct_count = Column(Integer, nullable=False, default=0)
+    incorrect_count = Column(Integer, nullable=False, default=0)
+    difficulty_sum = Column(Integer, nullable=False, default=0)
+    last_studied = Column(DateTime(timezone=True), nullable=True)
+    is_mastered = Column(Boolean, nullable=False, default=False)
+
+    # Spaced-repetition (SM-2) schedule
+    repetitions = Column(Integer, nullable=False, default=0)
+    ease_factor = Column(Float, nullable=False, default=DEFAULT_EASE_FACTOR)
+    interval_days = Column(Float, nullable=False, default=0.0)
+    due_at = Column(DateTime(timezone=True), nullable=True)
+
+    @classmethod
+    def get_due(cls, db, user_id, now, limit=20):
+        """Get the user's next `limit` due cards, soonest first.
+
+        Walks the (user_id, due_at) index, so the cost depends on `limit`
+        rather than on how many cards the user has scheduled.
+        """
+        return (
+            db.query(cls, Flashcard)
+            .join(Flashcard, cls.flashcard_id == Flashcard.id)
+            .join(FlashcardSet, Flashcard.set_id == FlashcardSet.id)
+            .filter(
+                cls.user_id == user_id,
+                cls.due_at <= now,
+                FlashcardSet.user_id == user_id,
             )
-            .join(flashcard_alias, cls.flashcard_id == flashcard_alias.id)
-            .filter(flashcard_alias.set_id == set_id, cls.user_id == user_id)
-            .group_by(cls.flashcard_id)
+            .order_by(cls.due_at)
+            .limit(limit)
             .all()
         )
 
-        return stats
+    @classmethod
+    def stats_columns(cls):
+        """Columns matching the shape of the per-flashcard progress statistics."""
+        return (
+            cls.flashcard_id,
+            cls.correct_count,
+            cls.incorrect_count,
+            cls.last_studied,
+            (cls.difficulty_sum.cast(Float) / cls.review_count).label(
+                "average_difficulty"
+            ),
+        )
+
+    @staticmethod
+    def mastered(correct_count, difficulty_sum, review_count):
+        """A card is mastered when answered correctly more than twice with an
+        average difficulty below medium."""
+        return correct_count > 2 and difficulty_sum < 2 * review_count
+
+    def record_review(self, is_correct, difficulty, reviewed_at):
+        """Fold a single review into the rollup."""
+        difficulty = getattr(difficulty, "value", difficulty)
+
+        self.review_count = (self.review_count or 0) + 1
+        self.correct_count = (self.correct_count or 0) + (1 if is_correct else 0)
+        self.incorrect_count = (self.incorrect_count or 0) + (
+            1 if is_correct is False else 0
+        )
+        self.difficulty_sum = (self.difficulty_sum or 0) + DIFFICULTY_SCORES.get(
+            difficulty, DEFAULT_DIFFICULTY_SCORE
+        )
+        reviewed_at = _utc_naive(reviewed_at)
+        if self.last_studied is None or reviewed_at > _utc_naive(self.last_studied):
+            self.last_studied = reviewed_at
+        self.is_mastered = self.mastered(
+            self.correct_count, self.difficulty_sum, self.review_count
+        )
+        self.schedule(is_correct, difficulty, reviewed_at)
+
+    def schedule(self, is_correct, difficulty, reviewed_at):
+        """Advance the card's spaced-repetition schedule by one review."""
+        (
+            self.repetitions,
+            self.ease_factor,
+            self.interval_days,
+            self.due_at,
+        ) = schedule_review(
+            self.repetitions,
+            self.ease_factor,
+            self.interval_days,
+            is_correct,
+            difficulty,
+            _utc_naive(reviewed_at),
+        )
+
+    @classmethod
+    def lock_for_update(cls, db, user_id, flashcard_ids):
+        """Load a user's summaries for the given cards, creating missing rows.
+
+        Missing rows are created with a conflict-ignoring insert before the
+        rows are read back for update. The insert takes the database write
+        lock (row locks on PostgreSQL), so concurrent workers updating the
+        same card are serialized instead of racing on insert or losing updates.
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        flashcard_ids = sorted(set(flashcard_ids))
+        db.connection().execute(
+            dialect_insert(cls.__table__).on_conflict_do_nothing(),
+            [
+                {"user_id": user_id, "flashcard_id": flashcard_id}
+                for flashcard_id in flashcard_ids
+            ],
+        )
+
+        summaries = (
+            db.query(cls)
+            .filter(cls.user_id == user_id, cls.flashcard_id.in_(flashcard_ids))
+            .with_for_update()
+            .populate_existing()
+        )
+        return {summary.flashcard_id: summary for summary in summaries}
+
+    @classmethod
+    def record_reviews(cls, db, user_id, reviews):
+        """Fold a batch of reviews into the rollup, loading summaries in one query.
+
+        `reviews` are dicts with flashcard_id, is_correct, difficulty and
+        created_at keys, not yet stored. They are applied oldest first. A
+        review older than a card's last one, such as from an offline batch,
+        has the card's schedule replayed from its history, so schedules
+        always follow timestamp order, as rebuild does.
+        """
+        summaries = cls.lock_for_update(
+            db, user_id, [review["flashcard_id"] for review in reviews]
+        )
+
+        late = set()
+        for review in sorted(reviews, key=lambda review: review["created_at"]):
+            summary = summaries[review["flashcard_id"]]
+            last_studied = _utc_naive(summary.last_studied)
+            if last_studied is not None and review["created_at"] < last_studied:
+                late.add(review["flashcard_id"])
+            summary.record_review(
+                review["is_correct"], review["difficulty"], review["created_at"]
+            )
+
+        if late:
+            cls._replay_schedules(db, user_id, summaries, late, reviews)
+
+    @classmethod
+    def _replay_schedules(cls, db, user_id, summaries, flashcard_ids, reviews):
+        """Recompute the given cards' schedules from history plus new reviews."""
+        progress = FlashcardProgress
+        history = {flashcard_id: [] for flashcard_id in flashcard_ids}
+        stored = (
+            db.query(
+                progress.flashcard_id,
+                progress.is_correct,
+                progress.difficulty,
+                progress.created_at,
+            )
+            .filter(
+                progress.user_id == user_id,
+                progress.flashcard_id.in_(flashcard_ids),
+            )
+            .order_by(progress.flashcard_id, progress.created_at, progress.id)
+        )
+        for record in stored:
+            history[record.flashcard_id].append(
+                (_utc_naive(record.created_at), record.is_correct, record.difficulty)
+            )
+        # New reviews come after stored ones with the same timestamp, as
+        # their ids will
+        for review in reviews:
+            if review["flashcard_id"] in history:
+                history[review["flashcard_id"]].append(
+                    (review["created_at"], review["is_correct"], review["difficulty"])
+                )
+
+        for flashcard_id, card_reviews in history.items():
+            summary = summaries[flashcard_id]
+            summary.repetitions = 0
+            summary.ease_factor = DEFAULT_EASE_FACTOR
+            summary.interval_days = 0.0
+            summary.due_at = None
+            for reviewed_at, is_correct, difficulty in sorted(
+                card_reviews, key=lambda review: review[0]
+            ):
+                summary.schedule(
+                    is_correct, getattr(difficulty, "value", difficulty), reviewed_at
+                )
+
+    @classmethod
+    def rebuild(cls, db, user_id=None):
+        """Rebuild the rollup from the raw progress history.
+
+        Rebuilds every user's rows, or only those of `user_id` if given.
+        Returns the number of summary rows written.
+        """
+        progress = FlashcardProgress
+        correct_count = func.coalesce(
+            func.sum(case((progress.is_correct.is_(True), 1), else_=0)), 0
+        )
+        difficulty_sum = func.sum(
+            case(
+                *[
+                    (progress.difficulty == level, score)
+                    for level, score in DIFFICULTY_SCORES.items()
+                ],
+                else_=DEFAULT_DIFFICULTY_SCORE,
+            )
+        )
+        review_count = func.count(progress.id)
+
+        history = db.query(
+            progress.user_id,
+            progress.flashcard_id,
+            review_count,
+            correct_count,
+            func.coalesce(
+                func.sum(case((progress.is_correct.is_(False), 1), else_=0)), 0
+            ),
+            difficulty_sum,
+            func.max(progress.created_at),
+            case(
+                (and_(correct_count > 2, difficulty_sum < 2 * review_count), True),
+                else_=False,
+            ),
+        ).group_by(progress.user_id, progress.flashcard_id)
+
+        delete_query = db.query(cls)
+        if user_id is not None:
+            history = history.filter(progress.user_id == user_id)
+            delete_query = delete_query.filter(cls.user_id == user_id)
+
+        delete_query.delete(synchronize_session=False)
+        db.execute(
+            insert(cls).from_select(
+                [
+                    cls.user_id,
+                    cls.flashcard_id,
+                    cls.review_count,
+                    cls.correct_count,
+                    cls.incorrect_count,
+                    cls.difficulty_sum,
+                    cls.last_studied,
+                    cls.is_mastered,
+                ],
+                history,
+            )
+        )
+        db.flush()
+        cls._rebuild_schedules(db, user_id)
+        db.commit()
+
+        # Not every driver reports a row count for INSERT ... SELECT
+        rebuilt = delete_query.with_entities(func.count()).scalar()
+        return rebuilt
+
+    @classmethod
+    def backfill(cls, db):
+        """Rebuild the rollup if it is empty but review history exists.
+
+        Databases from before the rollup start with an empty table. Returns
+        the number of summary rows written.
+        """
+        if db.query(cls.user_id).first() is not None:
+            return 0
+        if db.query(FlashcardProgress.id).first() is None:
+            return 0
+        return cls.rebuild(db)
+
+    @classmethod
+    def _rebuild_schedules(cls, db, user_id=None, batch_size=1000):
+        """Replay the review history in order to recompute every schedule."""
+        progress = FlashcardProgress
+        history = db.query(
+            progress.user_id,
+            progress.flashcard_id,
+            progress.is_correct,
+            progress.difficulty,
+            progress.created_at,
+        ).order_by(
+            progress.user_id, progress.flashcard_id, progress.created_at, progress.id
+        )
+        if user_id is not None:
+            history = history.filter(progress.user_id == user_id)
+
+        def flush(state):
+            db.execute(update(cls), list(state.values()))
+            state.clear()
+
+        state = {}
+        for record in history.yield_per(batch_size):
+            key = (record.user_id, record.flashcard_id)
+            if key not in state:
+                if len(state) >= batch_size:
+                    flush(state)
+                state[key] = {
+                    "user_id": record.user_id,
+                    "flashcard_id": record.flashcard_id,
+                    "repetitions": 0,
+                    "ease_factor": DEFAULT_EASE_FACTOR,
+                    "interval_days": 0.0,
+                    "due_at": None,
+                }
+
+            card = state[key]
+            (
+                card["repetitions"],
+                card["ease_factor"],
+                card["interval_days"],
+                card["due_at"],
+            ) = schedule_review(
+                card["repetitions"],
+                card["ease_factor"],
+                card["interval_days"],
+                record.is_correct,
+                record.difficulty,
+                _utc_naive(record.created_at),
+            )
+
+        if state:
+            flush(state)
+
+
+class GenerationJob(Base):
+    """A background request to generate a flashcard set from a document.
+
+    Status moves from queued to running to succeeded or failed. Progress is
+    the fraction of document chunks generated so far.
+    """
+
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        Index("ix_generation_jobs_status_created", "status", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")
+    document_id = Column(String, nullable=False)
+    num_cards = Column(Integer, nullable=False)
+    title = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    error = Column(Text, nullable=True)
+    flashcard_set_id = Column(Integer, ForeignKey("flashcard_sets.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    # Renewed while a runner is working on the job
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class Document(Base):
+    """An uploaded document, stored by content hash.
+
+    The original filename is the document's id for its owner, and uploading
+    the same name again replaces it. Identical files share one stored copy,
+    named by storage_key.
+    """
+
+    __tablename__ = "documents"
+    __table_args__ = (UniqueConstraint("user_id", "filename"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    sha256 = Column(String(64), nullable=False)
+    storage_key = Column(String, nullable=False, index=True)
+    size = Column(Integer, nullable=False)
+    page_count = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    @classmethod
+    def lookup(cls, user_id, filename):
+        """Select a user's document by filename, for sync or async sessions."""
+        return select(cls).filter(cls.user_id == user_id, cls.filename == filename)
+
+    @classmethod
+    def is_stored(cls, storage_key):
+        """Select whether any document still uses a stored file."""
+        return select(cls.id).filter(cls.storage_key == storage_key).limit(1)
+
+
+@event.listens_for(Session, "before_flush")
+def _update_card_progress_summary(session, flush_context, instances):
+    """Fold newly added progress records into the per-card rollup.
+
+    Runs for every write path, so the rollup stays in step with the history
+    no matter how progress records are created.
+    """
+    reviews_by_user = {}
+    for record in session.new:
+        if not isinstance(record, FlashcardProgress):
+            continue
+
+        if record.created_at is None:
+            record.created_at = datetime.now(timezone.utc)
+
+        reviews_by_user.setdefault(record.user_id, []).append(
+            {
+                "flashcard_id": record.flashcard_id,
+                "is_correct": record.is_correct,
+                "difficulty": record.difficulty,
+                "created_at": _utc_naive(record.created_at),
+            }
+        )
+
+    for user_id, reviews in reviews_by_user.items():
+        CardProgressSummary.record_reviews(session, user_id, reviews)
@@ -0,0 +1,34 @@
+"""
+Script to rebuild the card_progress_summary rollup from flashcard_progress history
+
+Usage: python -m app.rebuild_progress_summary [--user-id USER_ID]
+"""
+
+import argparse
+
+from app.database import SessionLocal, init_db
+from app.models import CardProgressSummary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--user-id", type=int, default=None, help="Only rebuild this user's rows"
+    )
+    args = parser.parse_args()
+
+    # Make sure the summary table exists
+    init_db()
+
+    db = SessionLocal()
+    try:
+        target = f"user {args.user_id}" if args.user_id else "all users"
+        print(f"Rebuilding card progress summary for {target}...")
+        rows = CardProgressSummary.rebuild(db, user_id=args.user_id)
+        print(f"Rebuilt {rows} summary rows.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,14 +9,20 @@ from .flashcard_set import (
     FlashcardSetWithCards,
 )
 from .study_session import StudySession, StudySessionCreate, StudySessionUpdate
-from .document import DocumentUpload, TextInput, DocumentInput
+from .document import DocumentUpload, DocumentText, TextInput, DocumentInput, GenerationCacheStats
+from .generation_job import GenerationJob
 from .flashcard_progress import (
     FlashcardProgress,
     FlashcardProgressCreate,
     FlashcardProgressBase,
+    FlashcardProgressBatch,
+    FlashcardProgressBatchItem,
+    FlashcardProgressBatchItemResult,
+    FlashcardProgressBatchResult,
     FlashcardProgressStats,
     DifficultyLevel,
     StudySetStats,
+    DueFlashcard,
 )
 from .dashboard import (
     DashboardSummary,
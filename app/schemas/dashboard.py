@@ -18,6 +18,7 @@ class ActivityItem(BaseModel):
     type: str  # "study_session", "flashcard_set_created", "flashcard_progress"
     timestamp: datetime
     details: Dict[str, str]
+    cursor: Optional[str] = None  # Pass as `before` to fetch the next page
 
     class Config:
         from_attributes = True
@@ -5,7 +5,18 @@ class DocumentUpload(BaseModel):
     filename: str
     content_type: str
     size: int
-    text_content: Optional[str] = None
+    sha256: Optional[str] = None
+    page_count: Optional[int] = None
+    text_length: Optional[int] = None
+    text_content: Optional[str] = None  # Preview of the start of the text
+
+class DocumentText(BaseModel):
+    text: str
+    offset: int
+    length: int  # Characters in the whole text
+    next_offset: Optional[int] = None
+    page: Optional[int] = None
+    page_count: Optional[int] = None
 
 class TextInput(BaseModel):
     text: str
@@ -18,3 +29,11 @@ class DocumentInput(BaseModel):
     num_cards: Optional[int] = 10
     title: Optional[str] = None
     description: Optional[str] = None
+
+class GenerationCacheStats(BaseModel):
+    entries: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+    coalesced: int = 0  # Requests that shared another request's generation
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -20,6 +20,29 @@ class FlashcardProgressCreate(FlashcardProgressBase):
     session_id: int
 
 
+class FlashcardProgressBatchItem(FlashcardProgressBase):
+    # When the review happened on the client, for reviews buffered offline
+    reviewed_at: Optional[datetime] = None
+
+
+class FlashcardProgressBatch(BaseModel):
+    reviews: List[FlashcardProgressBatchItem] = Field(..., min_length=1, max_length=500)
+
+
+class FlashcardProgressBatchItemResult(BaseModel):
+    index: int
+    flashcard_id: int
+    success: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class FlashcardProgressBatchResult(BaseModel):
+    created: int
+    failed: int
+    results: List[FlashcardProgressBatchItemResult]
+
+
 class FlashcardProgress(FlashcardProgressBase):
     id: int
     user_id: int
@@ -52,3 +75,17 @@ class StudySetStats(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class DueFlashcard(BaseModel):
+    flashcard_id: int
+    set_id: int
+    question: str
+    answer: str
+    due_at: datetime
+    repetitions: int
+    interval_days: float
+    ease_factor: float
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+class GenerationJob(BaseModel):
+    id: int
+    status: str  # queued, running, succeeded or failed
+    document_id: str
+    num_cards: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    progress: float
+    error: Optional[str] = None
+    flashcard_set_id: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,15 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime
-from sqlalchemy import func
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, insert, select
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_async_db, get_db
 from ..auth.utils import get_current_active_user
+from ..db_functions import duration_seconds
 
 router = APIRouter(prefix="/study", tags=["study"])
 
+# Upper bound on cards returned by a single due-queue request
+MAX_DUE_CARDS = 200
+
+# Allowed client clock skew for offline review timestamps
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
 
 @router.post(
     "/sessions/start",
@@ -174,12 +182,10 @@ def get_study_stats_for_set(
     avg_duration = (
         db.query(
             func.avg(
-                func.julianday(models.StudySession.end_time)
-                - func.julianday(models.StudySession.start_time)
+                duration_seconds(
+                    models.StudySession.start_time, models.StudySession.end_time
+                )
             )
-            * 24
-            * 60
-            * 60  # Convert to seconds
         )
         .filter(
             models.StudySession.set_id == set_id,
@@ -292,7 +298,7 @@ def update_flashcard_progress(
         difficulty=progress.difficulty,
     )
 
-    # Add to database
+    # Add to database (the per-card progress summary is updated on flush)
     db.add(progress_record)
     db.commit()
     db.refresh(progress_record)
@@ -301,19 +307,120 @@ def update_flashcard_progress(
     return progress_record
 
 
+@router.post(
+    "/sessions/{session_id}/progress/batch",
+    response_model=schemas.FlashcardProgressBatchResult,
+)
+def record_flashcard_progress_batch(
+    session_id: int,
+    batch: schemas.FlashcardProgressBatch,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Record many reviews for a study session in one transaction.
+
+    Each review is validated on its own and the response reports the outcome
+    of every item, so clients can retry only the failures.
+    """
+    # Check if the study session exists and belongs to the user
+    study_session = (
+        db.query(models.StudySession)
+        .filter(
+            models.StudySession.id == session_id,
+            models.StudySession.user_id == current_user.id,
+        )
+        .first()
+    )
+
+    if not study_session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Study session not found or you don't have access to it",
+        )
+
+    # Check which flashcards belong to the set being studied in one query
+    flashcard_ids = {review.flashcard_id for review in batch.reviews}
+    valid_ids = {
+        flashcard_id
+        for (flashcard_id,) in db.query(models.Flashcard.id).filter(
+            models.Flashcard.id.in_(flashcard_ids),
+            models.Flashcard.set_id == study_session.set_id,
+        )
+    }
+
+    # Timestamps are stored in UTC
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    results = []
+    rows = []
+    for index, review in enumerate(batch.reviews):
+        reviewed_at = review.reviewed_at or now
+        if reviewed_at.tzinfo is not None:
+            reviewed_at = reviewed_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+        error = None
+        if review.flashcard_id not in valid_ids:
+            error = "Flashcard not found or doesn't belong to the set being studied"
+        elif reviewed_at > now + MAX_CLOCK_SKEW:
+            error = "Review timestamp is in the future"
+
+        results.append(
+            schemas.FlashcardProgressBatchItemResult(
+                index=index,
+                flashcard_id=review.flashcard_id,
+                success=error is None,
+                error=error,
+            )
+        )
+        if error is None:
+            rows.append(
+                {
+                    "user_id": current_user.id,
+                    "flashcard_id": review.flashcard_id,
+                    "session_id": session_id,
+                    "is_correct": review.is_correct,
+                    "difficulty": review.difficulty.value,
+                    "created_at": reviewed_at,
+                }
+            )
+
+    if rows:
+        # Fold the reviews into the rollup before storing them, as the flush
+        # hook does, then insert them with a single executemany
+        models.CardProgressSummary.record_reviews(db, current_user.id, rows)
+        new_ids = (
+            db.execute(
+                insert(models.FlashcardProgress).returning(
+                    models.FlashcardProgress.id, sort_by_parameter_order=True
+                ),
+                rows,
+            )
+            .scalars()
+            .all()
+        )
+        db.commit()
+
+        successful = (result for result in results if result.success)
+        for result, new_id in zip(successful, new_ids):
+            result.id = new_id
+
+    return schemas.FlashcardProgressBatchResult(
+        created=len(rows),
+        failed=len(results) - len(rows),
+        results=results,
+    )
+
+
 @router.get(
     "/progress/flashcard/{flashcard_id}", response_model=List[schemas.FlashcardProgress]
 )
-def get_flashcard_progress(
+async def get_flashcard_progress(
     flashcard_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Get progress history for a specific flashcard."""
     # Check if the flashcard exists
-    flashcard = (
-        db.query(models.Flashcard).filter(models.Flashcard.id == flashcard_id).first()
-    )
+    flashcard = await db.get(models.Flashcard, flashcard_id)
 
     if not flashcard:
         raise HTTPException(
@@ -321,13 +428,11 @@ def get_flashcard_progress(
         )
 
     # Check if the user has access to the flashcard
-    flashcard_set = (
-        db.query(models.FlashcardSet)
-        .filter(
+    flashcard_set = await db.scalar(
+        select(models.FlashcardSet).filter(
             models.FlashcardSet.id == flashcard.set_id,
             models.FlashcardSet.user_id == current_user.id,
         )
-        .first()
     )
 
     if not flashcard_set:
@@ -337,8 +442,8 @@ def get_flashcard_progress(
         )
 
     # Get progress records
-    progress_records = models.FlashcardProgress.get_by_flashcard(
-        db, flashcard_id, current_user.id
+    progress_records = await db.run_sync(
+        models.FlashcardProgress.get_by_flashcard, flashcard_id, current_user.id
     )
 
     # Return progress records
@@ -348,20 +453,18 @@ def get_flashcard_progress(
 @router.get(
     "/progress/set/{set_id}", response_model=List[schemas.FlashcardProgressStats]
 )
-def get_set_progress(
+async def get_set_progress(
     set_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user),
 ):
     """Get progress statistics for all flashcards in a set."""
     # Check if the flashcard set exists and belongs to the user
-    flashcard_set = (
-        db.query(models.FlashcardSet)
-        .filter(
+    flashcard_set = await db.scalar(
+        select(models.FlashcardSet).filter(
             models.FlashcardSet.id == set_id,
             models.FlashcardSet.user_id == current_user.id,
         )
-        .first()
     )
 
     if not flashcard_set:
@@ -371,8 +474,8 @@ def get_set_progress(
         )
 
     # Get progress stats for all cards in the set
-    progress_stats = models.FlashcardProgress.get_stats_by_set(
-        db, set_id, current_user.id
+    progress_stats = await db.run_sync(
+        models.FlashcardProgress.get_stats_by_set, set_id, current_user.id
     )
 
     # Convert to schema objects
@@ -390,3 +493,35 @@ def get_set_progress(
 
     # Return progress stats
     return result
+
+
+@router.get("/due", response_model=List[schemas.DueFlashcard])
+def get_due_flashcards(
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    """Get the next flashcards due for review across all of the user's sets."""
+    if limit < 1 or limit > MAX_DUE_CARDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {MAX_DUE_CARDS}",
+        )
+
+    # Schedules are stored in UTC
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    due_cards = models.CardProgressSummary.get_due(db, current_user.id, now, limit)
+
+    return [
+        schemas.DueFlashcard(
+            flashcard_id=flashcard.id,
+            set_id=flashcard.set_id,
+            question=flashcard.question,
+            answer=flashcard.answer,
+            due_at=summary.due_at,
+            repetitions=summary.repetitions,
+            interval_days=summary.interval_days,
+            ease_factor=summary.ease_factor,
+        )
+        for summary, flashcard in due_cards
+    ]
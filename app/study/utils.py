@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+# SM-2 scheduling parameters
+DEFAULT_EASE_FACTOR = 2.5
+MIN_EASE_FACTOR = 1.3
+FIRST_INTERVAL_DAYS = 1.0
+SECOND_INTERVAL_DAYS = 6.0
+# Failed cards come back within the same study day instead of tomorrow
+RELEARN_INTERVAL_DAYS = 10 / (24 * 60)
+
+# SM-2 quality grade (0-5) for each review outcome
+REVIEW_QUALITY = {"easy": 5, "medium": 4, "hard": 3}
+FAILED_QUALITY = 1
+
+
+def review_quality(is_correct: Optional[bool], difficulty: str) -> int:
+    """Map a review's correctness and difficulty to an SM-2 quality grade."""
+    if not is_correct:
+        return FAILED_QUALITY
+    return REVIEW_QUALITY.get(getattr(difficulty, "value", difficulty), 4)
+
+
+def schedule_review(
+    repetitions: int,
+    ease_factor: float,
+    interval_days: float,
+    is_correct: Optional[bool],
+    difficulty: str,
+    reviewed_at: datetime,
+) -> Tuple[int, float, float, datetime]:
+    """Apply one review to a card's SM-2 state.
+
+    Returns the new (repetitions, ease_factor, interval_days, due_at).
+    """
+    quality = review_quality(is_correct, difficulty)
+    ease_factor = ease_factor or DEFAULT_EASE_FACTOR
+    repetitions = repetitions or 0
+
+    if quality < 3:
+        repetitions = 0
+        interval_days = RELEARN_INTERVAL_DAYS
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval_days = FIRST_INTERVAL_DAYS
+        elif repetitions == 2:
+            interval_days = SECOND_INTERVAL_DAYS
+        else:
+            interval_days = (interval_days or SECOND_INTERVAL_DAYS) * ease_factor
+
+    ease_factor = max(
+        MIN_EASE_FACTOR,
+        ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02),
+    )
+    due_at = reviewed_at + timedelta(days=interval_days)
+
+    return repetitions, ease_factor, interval_days, due_at
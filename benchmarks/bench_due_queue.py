@@ -0,0 +1,89 @@
+"""
+Benchmark for the spaced-repetition due queue (GET /api/study/due).
+
+Schedules a large number of cards for one user and reports the time to fetch
+the next batch of due cards, along with the SQLite query plan.
+
+Usage: python -m benchmarks.bench_due_queue [NUM_CARDS]
+"""
+
+import random
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from app.models import FlashcardSet, Flashcard, CardProgressSummary
+
+from .common import create_session, create_user, timed
+
+CARDS_PER_SET = 1000
+
+
+def seed(db, user, num_cards):
+    """Create sets and cards with schedules spread over the past and next year."""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    for start in range(0, num_cards, CARDS_PER_SET):
+        flashcard_set = FlashcardSet(title=f"Set {start}", user_id=user.id)
+        db.add(flashcard_set)
+        db.flush()
+
+        count = min(CARDS_PER_SET, num_cards - start)
+        card_ids = (
+            db.execute(
+                insert(Flashcard).returning(Flashcard.id),
+                [
+                    {"question": f"Q{i}", "answer": f"A{i}", "set_id": flashcard_set.id}
+                    for i in range(count)
+                ],
+            )
+            .scalars()
+            .all()
+        )
+        db.execute(
+            insert(CardProgressSummary),
+            [
+                {
+                    "user_id": user.id,
+                    "flashcard_id": card_id,
+                    "review_count": 1,
+                    "correct_count": 1,
+                    "incorrect_count": 0,
+                    "difficulty_sum": 2,
+                    "last_studied": now,
+                    "is_mastered": False,
+                    "due_at": now + timedelta(minutes=rng.randint(-525600, 525600)),
+                }
+                for card_id in card_ids
+            ],
+        )
+    db.commit()
+
+
+def main():
+    num_cards = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    db = create_session()
+    user, _ = create_user(db)
+    seed(db, user, num_cards)
+    now = datetime.utcnow()
+
+    plan = db.execute(
+        text(
+            "EXPLAIN QUERY PLAN SELECT * FROM card_progress_summary "
+            "WHERE user_id = :user_id AND due_at <= :now ORDER BY due_at LIMIT 20"
+        ),
+        {"user_id": user.id, "now": now},
+    ).all()
+    print("Query plan:", "; ".join(row[-1] for row in plan))
+
+    for limit in (20, 100):
+        elapsed = timed(
+            lambda: CardProgressSummary.get_due(db, user.id, now, limit), repeat=20
+        )
+        print(f"{num_cards} scheduled cards, next {limit}: {elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
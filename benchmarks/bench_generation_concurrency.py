@@ -0,0 +1,146 @@
+"""
+Load test for flashcard generation against a mock Gemini API.
+
+Starts the mock LLM server and the app under uvicorn, fires a burst of
+concurrent /api/ai/generate-flashcards requests and, while they are in
+flight, repeatedly probes a cheap endpoint. Reports how long the burst took
+and the probe latency, which stays low as long as generation does not block
+the event loop.
+
+Usage: python -m benchmarks.bench_generation_concurrency [REQUESTS] [DELAY_SECONDS] [MAX_CONCURRENCY]
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.mock_llm_server import start_server
+
+PROBE_INTERVAL = 0.05  # Seconds between responsiveness probes
+
+
+def free_port():
+    """Find a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port, env):
+    """Run the app under uvicorn and wait until it answers health checks."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("App did not start")
+
+
+def get_token(base_url):
+    """Register a load test user and return a bearer token."""
+    user = {"username": "loaduser", "email": "load@example.com", "password": "password"}
+    httpx.post(f"{base_url}/api/auth/register", json=user)
+    response = httpx.post(
+        f"{base_url}/api/auth/token",
+        data={"username": user["username"], "password": user["password"]},
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_load(base_url, token, num_requests):
+    """Fire the generation burst and probe responsiveness until it finishes."""
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=num_requests + 10)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=headers, limits=limits, timeout=300
+    ) as client:
+
+        async def generate(i):
+            # Distinct texts, so requests aren't served by the cache or
+            # coalesced into one generation
+            response = await client.post(
+                "/api/ai/generate-flashcards",
+                json={"text": f"France and Jupiter, request {i}.", "num_cards": 2},
+            )
+            return response.status_code
+
+        start = time.perf_counter()
+        burst = asyncio.gather(*(generate(i) for i in range(num_requests)))
+
+        latencies = []
+        while not burst.done():
+            probe_start = time.perf_counter()
+            await client.get("/api/flashcards/sets")
+            latencies.append((time.perf_counter() - probe_start) * 1000)
+            await asyncio.sleep(PROBE_INTERVAL)
+
+        statuses = await burst
+        return time.perf_counter() - start, statuses, latencies
+
+
+def main():
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    max_concurrency = sys.argv[3] if len(sys.argv) > 3 else "8"
+
+    mock = start_server(delay=delay)
+    app_port = free_port()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(
+            os.environ,
+            GEMINI_API_KEY="mock-key",
+            GEMINI_API_ENDPOINT=f"http://127.0.0.1:{mock.server_port}",
+            GEMINI_MAX_CONCURRENCY=max_concurrency,
+            # Measure the concurrency cap alone, not the rate limiter
+            GEMINI_RATE_LIMIT="1000",
+            GEMINI_RATE_BURST="1000",
+            DATABASE_URL=f"sqlite:///{temp_dir}/load.db",
+            AI_CACHE_PATH=f"{temp_dir}/ai_cache.db",
+        )
+        app = start_app(app_port, env)
+        try:
+            base_url = f"http://127.0.0.1:{app_port}"
+            token = get_token(base_url)
+            elapsed, statuses, latencies = asyncio.run(
+                run_load(base_url, token, num_requests)
+            )
+        finally:
+            app.terminate()
+            app.wait()
+            mock.shutdown()
+
+    latencies.sort()
+    ok = sum(1 for status in statuses if status == 200)
+    print(
+        f"{num_requests} generations ({delay}s each, concurrency cap "
+        f"{max_concurrency}): {ok} succeeded in {elapsed:.1f}s"
+    )
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(
+            f"Probe latency over {len(latencies)} requests while in flight: "
+            f"p50 {p50:.1f} ms, p95 {p95:.1f} ms, max {latencies[-1]:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+PDF text extraction benchmark: inline on the event loop vs worker processes.
+
+Writes PDFs of 10, 100 and 1000 pages of text, then extracts each one the
+old way (PyPDF2 page by page on the event loop, appending to a string) and
+with PdfExtractor at a range of worker counts. While each extraction runs, a
+ticker on the event loop records its longest stall, which is how long every
+other request in the process would have waited.
+
+Worker pools are started before timing, as they are in the app after the
+first upload.
+
+Usage: python -m benchmarks.bench_pdf_extraction [WORKER_COUNTS] [PAGE_COUNTS]
+e.g. python -m benchmarks.bench_pdf_extraction 1,2,4 10,100,1000
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import PyPDF2
+
+from app.document.extraction import PdfExtractor
+
+LINES_PER_PAGE = 40
+
+
+def write_pdf(path, num_pages):
+    """Write a PDF with LINES_PER_PAGE lines of text on each page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(num_pages):
+        lines = "".join(
+            f"(Page {page} line {line}: the quick brown fox jumps over the lazy dog.) Tj T* "
+            for line in range(LINES_PER_PAGE)
+        )
+        stream = f"BT /F1 10 Tf 12 TL 40 780 Td {lines}ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {num_pages} >>"
+
+    content = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    content += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    content += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def legacy_extract(file_path):
+    """The previous extract_text_from_pdf."""
+    with open(file_path, "rb") as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        text = ""
+        for page in pdf_reader.pages:
+            text += page.extract_text() + "\n"
+        return text.strip()
+
+
+async def run_inline(file_path):
+    return legacy_extract(file_path)
+
+
+async def measure(extract):
+    """Run extract() and return its duration and the longest loop stall."""
+    stalls = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    text = await extract()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await task
+    return elapsed, max(stalls, default=elapsed), text
+
+
+async def main():
+    worker_counts = [
+        int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1,2,4").split(",")
+    ]
+    page_counts = [
+        int(n) for n in (sys.argv[2] if len(sys.argv) > 2 else "10,100,1000").split(",")
+    ]
+    print(f"CPUs: {os.cpu_count()}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {}
+        for num_pages in page_counts:
+            paths[num_pages] = os.path.join(directory, f"{num_pages}.pdf")
+            write_pdf(paths[num_pages], num_pages)
+
+        extractors = {}
+        for workers in worker_counts:
+            extractors[workers] = PdfExtractor(workers, 20, timeout=600)
+            await extractors[workers].extract_pages(paths[page_counts[0]])
+
+        print(f"{'pages':>6} {'mode':<12} {'seconds':>8} {'loop stall':>11}")
+        for num_pages in page_counts:
+            path = paths[num_pages]
+            elapsed, stall, expected = await measure(lambda: run_inline(path))
+            print(
+                f"{num_pages:>6} {'inline':<12} {elapsed:>8.3f} {stall * 1000:>9.1f}ms"
+            )
+            for workers, extractor in extractors.items():
+                elapsed, stall, text = await measure(
+                    lambda: extractor.extract_text(path)
+                )
+                assert text == expected
+                label = f"{workers} worker{'s' if workers > 1 else ''}"
+                print(
+                    f"{num_pages:>6} {label:<12} {elapsed:>8.3f} {stall * 1000:>9.1f}ms"
+                )
+
+        for extractor in extractors.values():
+            extractor.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""
+Request coalescing benchmark: many users generating from the same text.
+
+Starts the mock LLM server and the app under uvicorn, then fires a burst of
+concurrent /api/ai/generate-flashcards requests where each of a few distinct
+texts is requested by many users at once, as when a class opens a shared
+document. Reports how many model calls the burst made and how long it took.
+
+Usage: python -m benchmarks.bench_request_coalescing [REQUESTS] [UNIQUE_TEXTS] [DELAY_SECONDS]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_generation_concurrency import free_port, get_token, start_app
+from benchmarks.mock_llm_server import start_server
+
+
+async def run_burst(base_url, token, num_requests, unique_texts):
+    """Fire the burst and return its duration and response statuses."""
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=num_requests + 10)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=headers, limits=limits, timeout=300
+    ) as client:
+
+        async def generate(i):
+            response = await client.post(
+                "/api/ai/generate-flashcards",
+                json={"text": f"Shared reading {i % unique_texts}.", "num_cards": 5},
+            )
+            return response.status_code
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(generate(i) for i in range(num_requests)))
+        return time.perf_counter() - start, statuses
+
+
+def main():
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    unique_texts = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+    mock = start_server(delay=delay)
+    app_port = free_port()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(
+            os.environ,
+            GEMINI_API_KEY="mock-key",
+            GEMINI_API_ENDPOINT=f"http://127.0.0.1:{mock.server_port}",
+            GEMINI_RATE_LIMIT="1000",
+            GEMINI_RATE_BURST="1000",
+            DATABASE_URL=f"sqlite:///{temp_dir}/bench.db",
+            AI_CACHE_PATH=f"{temp_dir}/ai_cache.db",
+        )
+        app = start_app(app_port, env)
+        try:
+            base_url = f"http://127.0.0.1:{app_port}"
+            token = get_token(base_url)
+            elapsed, statuses = asyncio.run(
+                run_burst(base_url, token, num_requests, unique_texts)
+            )
+        finally:
+            app.terminate()
+            app.wait()
+            mock.shutdown()
+
+    ok = sum(1 for status in statuses if status == 200)
+    print(
+        f"{num_requests} requests for {unique_texts} distinct texts ({delay}s per "
+        f"model call): {ok} succeeded in {elapsed:.1f}s with "
+        f"{mock.request_count} model calls"
+    )
+
+
+if __name__ == "__main__":
+    main()
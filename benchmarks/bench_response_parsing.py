@@ -0,0 +1,128 @@
+"""
+Benchmark for parsing flashcards out of model responses.
+
+Builds a corpus of responses shaped like real Gemini output (plain and
+fenced JSON, prose around the array) and common failures (trailing commas,
+output cut off at max_output_tokens, wrapped arrays, Q/A text). Compares the
+previous parsing, which split on code fences, ran json.loads and fell back to
+a DOTALL regex, with parse_flashcards_from_response. Reports the cards each
+recovers and the time per response.
+
+Usage: python -m benchmarks.bench_response_parsing [ITERATIONS]
+"""
+
+import json
+import re
+import sys
+import time
+
+from app.ai.utils import parse_flashcards_from_response
+
+CARDS = [
+    {
+        "question": f"What does concept {i} in the reading describe?",
+        "answer": f"Concept {i} describes how the {i}th process works, "
+        'including its "inputs", outputs and the {braces} used in notation.',
+    }
+    for i in range(10)
+]
+ARRAY = json.dumps(CARDS, indent=2)
+
+
+def build_corpus():
+    """Name, response text and number of recoverable cards."""
+    truncated = ARRAY[: int(len(ARRAY) * 0.75)]
+    return [
+        ("plain", ARRAY, 10),
+        ("fenced", f"```json\n{ARRAY}\n```", 10),
+        (
+            "prose",
+            f"Here are your flashcards:\n\n```json\n{ARRAY}\n```\nGood luck!",
+            10,
+        ),
+        (
+            "trailing commas",
+            ARRAY.replace('"\n  }', '",\n  }').replace("}\n]", "},\n]"),
+            10,
+        ),
+        ("truncated", f"```json\n{truncated}", truncated.count("\n  }")),
+        ("wrapped", json.dumps({"flashcards": CARDS}), 10),
+        (
+            "q/a text",
+            "\n\n".join(f"Q: {c['question']}\nA: {c['answer']}" for c in CARDS),
+            10,
+        ),
+    ]
+
+
+def legacy_parse(response_text):
+    """The previous parsing in generate_flashcards_from_text."""
+    try:
+        cleaned_text = response_text
+        if "```json" in cleaned_text:
+            cleaned_text = cleaned_text.split("```json")[1]
+            if "```" in cleaned_text:
+                cleaned_text = cleaned_text.split("```")[0]
+        elif "```" in cleaned_text:
+            cleaned_text = cleaned_text.split("```")[1]
+            if "```" in cleaned_text:
+                cleaned_text = cleaned_text.split("```")[0]
+        flashcards_json = json.loads(cleaned_text.strip())
+        return [
+            {"question": card["question"], "answer": card["answer"]}
+            for card in flashcards_json
+        ]
+    except (json.JSONDecodeError, IndexError, KeyError, TypeError):
+        pass
+
+    # The previous parse_flashcards_from_response
+    flashcards = []
+    try:
+        json_text = response_text.strip()
+        if json_text.startswith("```json"):
+            json_text = json_text[7:]
+        if json_text.endswith("```"):
+            json_text = json_text[:-3]
+        data = json.loads(json_text)
+        if isinstance(data, list):
+            for item in data:
+                if isinstance(item, dict) and "question" in item and "answer" in item:
+                    flashcards.append(
+                        {"question": item["question"], "answer": item["answer"]}
+                    )
+            if flashcards:
+                return flashcards
+    except (json.JSONDecodeError, ValueError):
+        pass
+
+    qa_pattern = r"Q:\s*(.+?)\s*\n\s*A:\s*(.+?)(?:\n\s*\n|$)"
+    for question, answer in re.findall(qa_pattern, response_text, re.DOTALL):
+        flashcards.append({"question": question.strip(), "answer": answer.strip()})
+    return flashcards
+
+
+def time_parser(parse, text, iterations):
+    """Return microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(text)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print(f"{'response':<16} {'cards':>5} {'old':>10} {'new':>10}")
+    for name, text, expected in build_corpus():
+        old_cards = len(legacy_parse(text))
+        new_cards = len(parse_flashcards_from_response(text))
+        old_time = time_parser(legacy_parse, text, iterations)
+        new_time = time_parser(parse_flashcards_from_response, text, iterations)
+        print(
+            f"{name:<16} {expected:>5} "
+            f"{old_cards:>3} {old_time:>5.1f}us {new_cards:>3} {new_time:>5.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark for GET /api/dashboard/sets/stats.
+
+Seeds users with a growing number of sets, cards and reviews and reports the
+number of SQL statements and the response time for each size. The statement
+count should stay constant as the number of sets grows.
+
+Usage: python -m benchmarks.bench_set_statistics
+"""
+
+import random
+
+from app.models import FlashcardSet, Flashcard, StudySession, FlashcardProgress
+
+from .common import create_session, create_user, api_client, count_queries, timed
+
+SIZES = [(10, 10), (50, 50), (200, 100)]  # (sets, cards per set)
+
+
+def seed(db, user, num_sets, cards_per_set):
+    """Create sets with cards, one study session and one review per card."""
+    rng = random.Random(42)
+    for i in range(num_sets):
+        flashcard_set = FlashcardSet(title=f"Set {i}", user_id=user.id)
+        db.add(flashcard_set)
+        db.flush()
+
+        session = StudySession(user_id=user.id, set_id=flashcard_set.id)
+        db.add(session)
+        db.flush()
+
+        cards = [
+            Flashcard(question=f"Q{j}", answer=f"A{j}", set_id=flashcard_set.id)
+            for j in range(cards_per_set)
+        ]
+        db.add_all(cards)
+        db.flush()
+
+        db.add_all(
+            FlashcardProgress(
+                user_id=user.id,
+                flashcard_id=card.id,
+                session_id=session.id,
+                is_correct=rng.random() < 0.7,
+                difficulty=rng.choice(["easy", "medium", "hard"]),
+            )
+            for card in cards
+        )
+    db.commit()
+
+
+def main():
+    print(f"{'sets':>6} {'cards':>8} {'queries':>8} {'ms':>10}")
+    for num_sets, cards_per_set in SIZES:
+        db = create_session()
+        user, token = create_user(db)
+        seed(db, user, num_sets, cards_per_set)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        with api_client(db) as client:
+
+            def request():
+                response = client.get("/api/dashboard/sets/stats", headers=headers)
+                response.raise_for_status()
+
+            with count_queries(db) as statements:
+                request()
+            elapsed = timed(request)
+
+        print(
+            f"{num_sets:>6} {num_sets * cards_per_set:>8} "
+            f"{len(statements):>8} {elapsed:>10.1f}"
+        )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Load test for the SQLite tuning profiles in app.database.
+
+Runs several worker processes (like uvicorn workers) against a database file
+laid out like the Fly.io volume (<root>/data/flashcard_app.db). Half of the
+workers record reviews, the other half read set statistics. Reports read and
+write throughput for each profile.
+
+Usage: python -m benchmarks.bench_sqlite_profiles [ROOT_DIR] [SECONDS] [WORKERS]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, SQLITE_PROFILES, create_db_engine
+from app.models import User, FlashcardSet, Flashcard, FlashcardProgress
+
+NUM_CARDS = 200
+
+
+def setup(url):
+    """Create a fresh database with one user, set and a batch of cards."""
+    engine = create_db_engine(url, "default")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = User(username="loaduser", email="load@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    flashcard_set = FlashcardSet(title="Load Set", user_id=user.id)
+    db.add(flashcard_set)
+    db.flush()
+    db.add_all(
+        Flashcard(question=f"Q{i}", answer=f"A{i}", set_id=flashcard_set.id)
+        for i in range(NUM_CARDS)
+    )
+    db.commit()
+    ids = (user.id, flashcard_set.id)
+    db.close()
+    engine.dispose()
+    return ids
+
+
+def worker(url, profile, role, user_id, set_id, seconds, results):
+    """Run reads or writes in a loop and report the operation count."""
+    engine = create_db_engine(url, profile)
+    db = sessionmaker(bind=engine)()
+    operations = errors = 0
+    deadline = time.perf_counter() + seconds
+
+    while time.perf_counter() < deadline:
+        try:
+            if role == "write":
+                db.add(
+                    FlashcardProgress(
+                        user_id=user_id,
+                        flashcard_id=operations % NUM_CARDS + 1,
+                        is_correct=operations % 3 != 0,
+                        difficulty="medium",
+                    )
+                )
+                db.commit()
+            else:
+                FlashcardProgress.get_stats_by_set(db, set_id, user_id)
+                db.rollback()
+            operations += 1
+        except OperationalError:
+            db.rollback()
+            errors += 1
+
+    db.close()
+    engine.dispose()
+    results.put((role, operations, errors))
+
+
+def run(url, profile, seconds, workers):
+    """Run one load test and return reads/s, writes/s and lock errors."""
+    user_id, set_id = setup(url)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=worker,
+            args=(
+                url,
+                profile,
+                "write" if i % 2 else "read",
+                user_id,
+                set_id,
+                seconds,
+                results,
+            ),
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {"read": 0, "write": 0, "errors": 0}
+    for _ in processes:
+        role, operations, errors = results.get()
+        totals[role] += operations
+        totals["errors"] += errors
+    for process in processes:
+        process.join()
+    return totals["read"] / seconds, totals["write"] / seconds, totals["errors"]
+
+
+def main():
+    root = sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp()
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    data_dir = os.path.join(root, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    db_path = os.path.join(data_dir, "flashcard_app.db")
+    url = f"sqlite:///{db_path}"
+
+    print(f"Database: {db_path}, {workers} workers, {seconds:.0f}s per profile")
+    print(f"{'profile':>12} {'reads/s':>10} {'writes/s':>10} {'errors':>8}")
+    for profile in SQLITE_PROFILES:
+        # Start each profile from a rollback-journal database
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        reads, writes, errors = run(url, profile, seconds, workers)
+        print(f"{profile:>12} {reads:>10.0f} {writes:>10.0f} {errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Time-to-first-card benchmark for streamed flashcard generation.
+
+Starts the mock LLM server and the app under uvicorn, then compares how long
+/api/ai/generate-flashcards takes to return with how soon
+/api/ai/generate-flashcards/stream delivers its first flashcard event.
+
+Usage: python -m benchmarks.bench_streaming_generation [DELAY_SECONDS] [RUNS]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_generation_concurrency import free_port, get_token, start_app
+from benchmarks.mock_llm_server import start_server
+
+
+def time_blocking(client, text):
+    """Return seconds until the non-streaming endpoint responds."""
+    start = time.perf_counter()
+    response = client.post(
+        "/api/ai/generate-flashcards", json={"text": text, "num_cards": 10}
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def time_streaming(client, text):
+    """Return seconds until the first and the last streamed flashcard."""
+    start = time.perf_counter()
+    first = last = None
+    with client.stream(
+        "POST",
+        "/api/ai/generate-flashcards/stream",
+        json={"text": text, "num_cards": 10},
+    ) as response:
+        for line in response.iter_lines():
+            if line == "event: flashcard":
+                last = time.perf_counter() - start
+                first = first or last
+    return first, last
+
+
+def main():
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    mock = start_server(delay=delay)
+    app_port = free_port()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(
+            os.environ,
+            GEMINI_API_KEY="mock-key",
+            GEMINI_API_ENDPOINT=f"http://127.0.0.1:{mock.server_port}",
+            DATABASE_URL=f"sqlite:///{temp_dir}/bench.db",
+            AI_CACHE_PATH=f"{temp_dir}/ai_cache.db",
+        )
+        app = start_app(app_port, env)
+        try:
+            base_url = f"http://127.0.0.1:{app_port}"
+            headers = {"Authorization": f"Bearer {get_token(base_url)}"}
+            with httpx.Client(base_url=base_url, headers=headers, timeout=60) as client:
+                # Unique texts so every run misses the generation cache
+                blocking = [time_blocking(client, f"Text {i}") for i in range(runs)]
+                streaming = [
+                    time_streaming(client, f"Streamed text {i}") for i in range(runs)
+                ]
+        finally:
+            app.terminate()
+            app.wait()
+            mock.shutdown()
+
+    print(f"Model latency {delay}s, best of {runs} runs:")
+    print(f"  full response:          {min(blocking) * 1000:.0f} ms")
+    print(f"  streamed first card:    {min(t[0] for t in streaming) * 1000:.0f} ms")
+    print(f"  streamed last card:     {min(t[1] for t in streaming) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
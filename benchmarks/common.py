@@ -0,0 +1,75 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+import time
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.database import Base, get_db
+from app.models import User
+from app.auth.utils import get_password_hash, create_access_token
+
+
+def create_session(url="sqlite:///:memory:"):
+    """Create a fresh database session with all tables."""
+    engine = create_engine(
+        url, connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def create_user(db, username="benchuser"):
+    """Create a user and return it with a bearer token."""
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        hashed_password=get_password_hash("password"),
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user, create_access_token(data={"sub": user.username})
+
+
+@contextmanager
+def api_client(db):
+    """Yield a test client bound to the given database session."""
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
+
+
+@contextmanager
+def count_queries(db):
+    """Count the SQL statements executed on the session's engine."""
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", on_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", on_execute)
+
+
+def timed(func, repeat=5):
+    """Return the best wall-clock time in milliseconds over several runs."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
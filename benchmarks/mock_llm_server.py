@@ -0,0 +1,116 @@
+"""
+Mock Gemini API server for load tests.
+
+Answers every generateContent request with a fixed set of ten flashcards after
+a delay, like a slow model. streamGenerateContent requests get the same
+flashcards as a stream of small pieces spread over the delay. Point the app
+at it with any GEMINI_API_KEY and GEMINI_API_ENDPOINT=http://127.0.0.1:<port>.
+
+Usage: python -m benchmarks.mock_llm_server [PORT] [DELAY_SECONDS]
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FLASHCARDS = [
+    {"question": "What is the capital of France?", "answer": "Paris"},
+    {
+        "question": "What is the largest planet in our solar system?",
+        "answer": "Jupiter",
+    },
+] + [
+    {"question": f"What is fact number {i}?", "answer": f"Fact {i}"}
+    for i in range(3, 11)
+]
+
+# Pieces a streamed response is split into
+STREAM_PIECES = 20
+
+
+def candidate_response(text):
+    """Build a GenerateContentResponse holding `text`."""
+    return {
+        "candidates": [
+            {
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ]
+    }
+
+
+def make_handler(delay):
+    """Build a request handler that responds after `delay` seconds."""
+
+    class MockGeminiHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            # Drain the request body before replying
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with self.server.lock:
+                self.server.request_count += 1
+
+            if "streamGenerateContent" in self.path:
+                self.stream_response()
+                return
+
+            time.sleep(delay)
+            body = json.dumps(candidate_response(json.dumps(FLASHCARDS))).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def stream_response(self):
+            """Stream the flashcards as a JSON array of partial responses."""
+            text = json.dumps(FLASHCARDS)
+            size = -(-len(text) // STREAM_PIECES)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            for i in range(0, len(text), size):
+                time.sleep(delay / STREAM_PIECES)
+                prefix = "[" if i == 0 else ","
+                message = json.dumps(candidate_response(text[i : i + size]))
+                self.wfile.write((prefix + message).encode())
+                self.wfile.flush()
+            self.wfile.write(b"]")
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockGeminiHandler
+
+
+def create_server(port, delay):
+    """Create the mock server, counting requests in server.request_count."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay))
+    server.request_count = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def start_server(port=0, delay=1.0):
+    """Start the mock server on a background thread and return it.
+
+    Pass port 0 to pick a free port; the chosen one is server.server_port.
+    server.request_count counts the generation requests received.
+    """
+    server = create_server(port, delay)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8090
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+    server = create_server(port, delay)
+    print(f"Mock Gemini API on http://127.0.0.1:{port} ({delay}s per request)")
+    server.serve_forever()
@@ -1,23 +1,124 @@
+import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 from app.main import app
-from app.database import Base, get_db
+from app.ai import utils as ai_utils
+from app.ai.cache import FlashcardCache
+from app.ai.jobs import job_runner
+from app.document.sweeper import stored_file_sweeper
+from app.ai.providers import GeminiProvider, ProviderRouter
+from app.ai.resilience import CircuitBreaker, RetryScheduler, TokenBucket
+from app.ai.singleflight import SingleFlight
+from app.document.store import document_store
+from app.database import Base, get_async_db, get_db, to_async_url
+
+# Create a test database in a temporary SQLite file, or use TEST_DATABASE_URL
+# (e.g. postgresql://postgres@localhost:5432/flashcards_test) to run the
+# suite against another database
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+@pytest.fixture(autouse=True)
+def flashcard_cache(tmp_path, monkeypatch):
+    """Give each test an empty generated flashcard cache, with nothing in flight."""
+    cache = FlashcardCache(str(tmp_path / "ai_cache.db"), ttl=3600, max_entries=100)
+    monkeypatch.setattr(ai_utils, "flashcard_cache", cache)
+    monkeypatch.setattr(ai_utils, "generation_flight", SingleFlight())
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def upload_directory(tmp_path, monkeypatch):
+    """Give each test an empty document store."""
+    directory = tmp_path / "uploads"
+    monkeypatch.setattr(document_store, "directory", str(directory))
+    return directory
+
+
+def write_pdf(path, pages):
+    """Write a PDF with one line of text per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    content = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    content += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    content += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    path.write_bytes(bytes(content))
+    return path
 
-# Create a test database in memory
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
 @pytest.fixture
-def test_db():
-    """Create a fresh database for each test."""
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
+def make_pdf(tmp_path):
+    """Write a PDF with the given page texts to the test directory."""
+    return lambda pages, name="document.pdf": write_pdf(tmp_path / name, pages)
+
+
+@pytest.fixture(autouse=True)
+def ai_provider(monkeypatch):
+    """Route generation to a fresh Gemini provider, without retry delays."""
+
+    async def no_sleep(seconds):
+        pass
+
+    scheduler = RetryScheduler(
+        TokenBucket(1000, 1000, sleep=no_sleep),
+        CircuitBreaker(failure_threshold=5, reset_timeout=30),
+        max_retries=3,
+        base_delay=0.5,
+        max_delay=8,
+        sleep=no_sleep,
     )
+    provider = GeminiProvider(
+        "gemini-2.0-flash", cost=0.4, latency=3.0, max_concurrency=8, scheduler=scheduler
+    )
+    router = ProviderRouter([provider], {"interactive": "fastest", "bulk": "cheapest"})
+    monkeypatch.setattr(ai_utils, "provider_router", router)
+    yield provider
+    router.close()
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    """URL of the test database, shared by the sync and async sessions."""
+    return TEST_DATABASE_URL or f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def test_db(database_url):
+    """Create a fresh database for each test."""
+    if database_url.startswith("sqlite"):
+        engine = create_engine(
+            database_url, connect_args={"check_same_thread": False}
+        )
+    else:
+        engine = create_engine(database_url)
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
     # Create the tables
@@ -32,18 +133,34 @@ def test_db():
         db.close()
         # Drop the tables
         Base.metadata.drop_all(bind=engine)
+        engine.dispose()
 
 @pytest.fixture
-def client(test_db):
+def client(test_db, database_url):
     """Create a test client with a test database."""
     def override_get_db():
         try:
             yield test_db
         finally:
             pass
-    
-    # Override the get_db dependency
+
+    # Async sessions connect to the same database. NullPool closes each
+    # connection with its session, on the event loop that opened it.
+    async_engine = create_async_engine(to_async_url(database_url), poolclass=NullPool)
+    TestingAsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    # Override the database dependencies, and run generation jobs and
+    # stored file sweeps against the test database
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    job_runner.session_factory = TestingAsyncSessionLocal
+    stored_file_sweeper.session_factory = TestingAsyncSessionLocal
     
     # Create a test client
     with TestClient(app) as client:
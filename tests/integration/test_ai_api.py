@@ -1,8 +1,10 @@
+import json
+import time
 import pytest
 import tempfile
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from app.models import User, FlashcardSet
 from app.auth.utils import get_password_hash, create_access_token
@@ -141,3 +143,138 @@ def test_generate_from_document(
     assert flashcard_set.user_id == test_user.id
     assert flashcard_set.description == "Generated from test document"
     assert len(flashcard_set.flashcards) == 2
+
+
+def test_get_generation_cache_stats(client: TestClient, user_token: str):
+    """Test that cache metrics are reported."""
+    response = client.get(
+        "/api/ai/cache/stats",
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["entries"] == 0
+    assert data["hits"] == 0
+    assert data["hit_rate"] == 0.0
+
+
+@patch("app.ai.utils.genai.GenerativeModel")
+def test_stream_generated_flashcards(mock_model, client: TestClient, user_token: str):
+    """Test that generated flashcards are streamed as server-sent events."""
+    text = '[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A2"}]'
+    mock_model.return_value.generate_content.return_value = iter(
+        [MagicMock(text=text[:40]), MagicMock(text=text[40:])]
+    )
+
+    response = client.post(
+        "/api/ai/generate-flashcards/stream",
+        json={"text": "Some text", "num_cards": 2},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0], json.loads(block.split("\n")[1][len("data: ") :]))
+        for block in response.text.strip().split("\n\n")
+    ]
+    assert events == [
+        ("event: flashcard", {"question": "Q1", "answer": "A1"}),
+        ("event: flashcard", {"question": "Q2", "answer": "A2"}),
+        ("event: done", {"count": 2}),
+    ]
+
+
+@patch("app.ai.utils.genai.GenerativeModel")
+def test_stream_generated_flashcards_error(
+    mock_model, client: TestClient, user_token: str
+):
+    """Test that generation failures are sent as an error event."""
+    mock_model.return_value.generate_content.side_effect = RuntimeError("quota exceeded")
+
+    response = client.post(
+        "/api/ai/generate-flashcards/stream",
+        json={"text": "Some text", "num_cards": 2},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.text.startswith("event: error\n")
+    assert "quota exceeded" in response.text
+
+
+@patch("app.ai.jobs.generate_flashcards_from_chunks")
+def test_generation_job(
+    mock_generate, client: TestClient, user_token: str, test_document
+):
+    """Test that a queued generation job creates a flashcard set."""
+    mock_generate.return_value = [
+        {"question": "What type of document is this?", "answer": "A test document."}
+    ]
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    response = client.post(
+        "/api/ai/generate-from-document/jobs",
+        json={"document_id": "test_ai.txt", "num_cards": 1, "title": "Job Set"},
+        headers=headers,
+    )
+
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] in ("queued", "running")
+
+    # Poll until the worker finishes
+    deadline = time.time() + 10
+    while job["status"] in ("queued", "running") and time.time() < deadline:
+        time.sleep(0.05)
+        job = client.get(f"/api/ai/jobs/{job['id']}", headers=headers).json()
+
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+    flashcard_set = client.get(
+        f"/api/flashcards/sets/{job['flashcard_set_id']}", headers=headers
+    ).json()
+    assert flashcard_set["title"] == "Job Set"
+    assert len(flashcard_set["flashcards"]) == 1
+
+    jobs = client.get("/api/ai/jobs", headers=headers).json()
+    assert [j["id"] for j in jobs] == [job["id"]]
+
+
+def test_generation_job_missing_document(client: TestClient, user_token: str):
+    """Test that jobs can't be queued for documents that don't exist."""
+    response = client.post(
+        "/api/ai/generate-from-document/jobs",
+        json={"document_id": "missing.txt", "num_cards": 1},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 404
+
+
+def test_get_missing_generation_job(client: TestClient, user_token: str):
+    """Test that unknown jobs return 404."""
+    response = client.get(
+        "/api/ai/jobs/999", headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == 404
+
+
+def test_generate_flashcards_circuit_open(
+    client: TestClient, user_token: str, ai_provider
+):
+    """Test that generation fails fast with 503 while the model is down."""
+    breaker = ai_provider.scheduler.breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    response = client.post(
+        "/api/ai/generate-flashcards",
+        json={"text": "Some text", "num_cards": 2},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) > 0
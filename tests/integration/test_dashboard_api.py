@@ -2,6 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from sqlalchemy import event
 
 from app.models import User, FlashcardSet, Flashcard, StudySession, FlashcardProgress
 from app.auth.utils import get_password_hash, create_access_token
@@ -242,6 +243,35 @@ def test_get_dashboard_summary(client: TestClient, user_token: str, test_flashca
     assert data["total_study_time_minutes"] > 0
 
 
+def test_get_dashboard_summary_mastery_counts(client: TestClient, user_token: str, test_db: Session, test_user: User, test_flashcards, test_flashcard_progress):
+    """Test that mastered and struggling counts are aggregated per card."""
+    # Answer the first math card correctly and easily two more times
+    for _ in range(2):
+        test_db.add(
+            FlashcardProgress(
+                user_id=test_user.id,
+                flashcard_id=test_flashcards[0].id,
+                is_correct=True,
+                difficulty="easy"
+            )
+        )
+    test_db.commit()
+
+    response = client.get(
+        "/api/dashboard/summary",
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+
+    # One mastered math card, three cards with only incorrect answers
+    assert data["total_cards"] == len(test_flashcards)
+    assert data["mastered_cards"] == 1
+    assert data["struggling_cards"] == 3
+    assert data["completion_percentage"] == pytest.approx(100 / len(test_flashcards))
+
+
 def test_get_recent_activity(client: TestClient, user_token: str, test_study_sessions):
     """Test getting recent activity."""
     response = client.get(
@@ -264,6 +294,41 @@ def test_get_recent_activity(client: TestClient, user_token: str, test_study_ses
         assert "details" in activity
 
 
+def test_get_recent_activity_pagination(client: TestClient, user_token: str, test_study_sessions, test_flashcard_progress):
+    """Test paging through the activity feed with cursors."""
+    headers = {"Authorization": f"Bearer {user_token}"}
+
+    full = client.get("/api/dashboard/activity?limit=100", headers=headers).json()
+    # 4 sessions, 3 sets and 6 progress records
+    assert len(full) == 13
+
+    # Activities are ordered newest first
+    timestamps = [activity["timestamp"] for activity in full]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    # Walk the feed two items at a time
+    paged = []
+    cursor = None
+    while True:
+        url = "/api/dashboard/activity?limit=2"
+        if cursor:
+            url += f"&before={cursor}"
+        page = client.get(url, headers=headers).json()
+        if not page:
+            break
+        paged.extend(page)
+        cursor = page[-1]["cursor"]
+
+    assert [(a["type"], a["id"]) for a in paged] == [(a["type"], a["id"]) for a in full]
+
+    response = client.get("/api/dashboard/activity?before=not-a-cursor", headers=headers)
+    assert response.status_code == 400
+
+    for limit in (0, -1, 101):
+        response = client.get(f"/api/dashboard/activity?limit={limit}", headers=headers)
+        assert response.status_code == 422
+
+
 def test_get_set_statistics(client: TestClient, user_token: str, test_flashcard_sets):
     """Test getting statistics for all sets."""
     response = client.get(
@@ -287,6 +352,69 @@ def test_get_set_statistics(client: TestClient, user_token: str, test_flashcard_
         assert "last_studied" in set_stat
 
 
+def test_get_set_statistics_values(client: TestClient, user_token: str, test_flashcard_sets, test_flashcards, test_study_sessions, test_flashcard_progress):
+    """Test the aggregated values returned for each set."""
+    response = client.get(
+        "/api/dashboard/sets/stats",
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == 200
+    stats = {item["set_id"]: item for item in response.json()}
+
+    math_stats = stats[test_flashcard_sets[0].id]
+    assert math_stats["title"] == "Math Flashcards"
+    assert math_stats["total_cards"] == 2
+    assert math_stats["study_count"] == 2
+    assert math_stats["last_studied"] is not None
+    assert math_stats["average_session_minutes"] > 0
+
+    history_stats = stats[test_flashcard_sets[2].id]
+    assert history_stats["study_count"] == 1
+    assert history_stats["average_session_minutes"] == pytest.approx(10, abs=0.1)
+    assert history_stats["mastery_percentage"] == 0
+
+
+def test_get_set_statistics_constant_queries(client: TestClient, user_token: str, test_db: Session, test_user: User, test_flashcard_sets, test_flashcards, test_flashcard_progress):
+    """Test that the number of queries does not grow with the number of sets."""
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def count_queries():
+        statements.clear()
+        event.listen(test_db.get_bind(), "before_cursor_execute", count_statement)
+        try:
+            response = client.get(
+                "/api/dashboard/sets/stats",
+                headers={"Authorization": f"Bearer {user_token}"}
+            )
+        finally:
+            event.remove(test_db.get_bind(), "before_cursor_execute", count_statement)
+        assert response.status_code == 200
+        return len(statements), len(response.json())
+
+    baseline_queries, baseline_sets = count_queries()
+
+    # Add many more sets, each with cards and a study session
+    for i in range(20):
+        flashcard_set = FlashcardSet(title=f"Extra Set {i}", user_id=test_user.id)
+        test_db.add(flashcard_set)
+        test_db.flush()
+        test_db.add_all([
+            Flashcard(question=f"Q{i}-{j}", answer=f"A{i}-{j}", set_id=flashcard_set.id)
+            for j in range(5)
+        ])
+        test_db.add(StudySession(user_id=test_user.id, set_id=flashcard_set.id))
+    test_db.commit()
+
+    queries, sets = count_queries()
+
+    assert sets == baseline_sets + 20
+    assert queries == baseline_queries
+
+
 def test_get_study_time_distribution(client: TestClient, user_token: str):
     """Test getting study time distribution."""
     response = client.get(
@@ -306,3 +434,43 @@ def test_get_study_time_distribution(client: TestClient, user_token: str):
     assert isinstance(data["daily"], list)
     assert isinstance(data["weekly"], list)
     assert isinstance(data["monthly"], list)
+
+
+def test_get_study_time_distribution_values(client: TestClient, user_token: str, test_study_sessions):
+    """Test that study time is distributed into the expected buckets."""
+    response = client.get(
+        "/api/dashboard/study-time",
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+
+    assert len(data["daily"]) == 7
+    assert len(data["weekly"]) == 4
+    assert len(data["monthly"]) == 6
+
+    # 45 completed minutes plus the active session, all within the last week
+    daily_total = sum(point["minutes"] for point in data["daily"])
+    monthly_total = sum(point["minutes"] for point in data["monthly"])
+    assert daily_total == pytest.approx(50, abs=1)
+    assert monthly_total == pytest.approx(daily_total)
+
+
+def test_get_study_time_series(client: TestClient, user_token: str, test_study_sessions):
+    """Test requesting a custom study time series."""
+    response = client.get(
+        "/api/dashboard/study-time/series?granularity=hour&periods=24",
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 24
+    assert sum(point["minutes"] for point in data) > 0
+
+    response = client.get(
+        "/api/dashboard/study-time/series?granularity=year",
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+    assert response.status_code == 400
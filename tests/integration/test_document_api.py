@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import os
 import pytest
 import tempfile
@@ -6,6 +8,7 @@ from sqlalchemy.orm import Session
 
 from app.models import User
 from app.auth.utils import get_password_hash, create_access_token
+from app.document.sweeper import StoredFileSweeper, stored_file_sweeper
 
 
 @pytest.fixture
@@ -50,7 +53,8 @@ def test_upload_document(client: TestClient, user_token: str):
         data = response.json()
         assert data["filename"] == "test.txt"
         assert data["content_type"] == "text/plain"
-        assert data["size"] > 0
+        assert data["size"] == len(b"This is a test document.")
+        assert data["sha256"] == hashlib.sha256(b"This is a test document.").hexdigest()
         assert "text_content" in data
         assert data["text_content"] == "This is a test document."
     finally:
@@ -58,6 +62,222 @@ def test_upload_document(client: TestClient, user_token: str):
         os.remove(temp_file_path)
 
 
+def stored_files(upload_directory):
+    """Names of the files in the document store."""
+    return sorted(
+        name
+        for _, _, names in os.walk(upload_directory / "objects")
+        for name in names
+    )
+
+
+def test_documents_are_stored_by_content(
+    client: TestClient, user_token: str, test_db: Session, upload_directory
+):
+    """Test that same-named uploads don't collide and identical ones share a file."""
+    other_user = User(
+        username="otherdocuser",
+        email="otherdoc@example.com",
+        hashed_password=get_password_hash("password")
+    )
+    test_db.add(other_user)
+    test_db.commit()
+    headers = {"Authorization": f"Bearer {user_token}"}
+    other_headers = {
+        "Authorization": f"Bearer {create_access_token(data={'sub': other_user.username})}"
+    }
+
+    def upload(content, headers):
+        response = client.post(
+            "/api/documents/upload",
+            files={"file": ("notes.txt", content, "text/plain")},
+            headers=headers
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    # Each user's notes.txt is their own
+    first = upload(b"My first notes.", headers)
+    upload(b"Shared notes.", other_headers)
+    assert client.get("/api/documents/text/notes.txt", headers=headers).json()["text"] == "My first notes."
+    assert client.get("/api/documents/text/notes.txt", headers=other_headers).json()["text"] == "Shared notes."
+    assert len(stored_files(upload_directory)) == 6
+
+    def sweep(grace_seconds=0):
+        sweeper = StoredFileSweeper(
+            stored_file_sweeper.session_factory, grace_seconds=grace_seconds
+        )
+        return asyncio.run(sweeper.sweep())
+
+    # Replacing a document with identical content shares the stored copy.
+    # The one no longer used is swept once it has been idle long enough.
+    upload(b"Shared notes.", headers)
+    assert client.get("/api/documents/text/notes.txt", headers=headers).json()["text"] == "Shared notes."
+    assert sweep(grace_seconds=3600) == 0
+    assert len(stored_files(upload_directory)) == 6
+    assert sweep() == 1
+    assert first["sha256"] + ".txt" not in stored_files(upload_directory)
+    assert len(stored_files(upload_directory)) == 3
+
+    # The stored copy is kept until its last document is deleted
+    assert client.delete("/api/documents/notes.txt", headers=other_headers).status_code == 204
+    assert sweep() == 0
+    assert len(stored_files(upload_directory)) == 3
+    assert client.delete("/api/documents/notes.txt", headers=headers).status_code == 204
+    assert sweep() == 1
+    assert stored_files(upload_directory) == []
+
+
+def test_get_document_text_ranges(client: TestClient, user_token: str):
+    """Test that document text is read in ranges, with ETags and compression."""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    text = "".join(f"Sentence {i} about the reading. " for i in range(200)).strip()
+    upload_response = client.post(
+        "/api/documents/upload",
+        files={"file": ("long.txt", text.encode(), "text/plain")},
+        headers=headers
+    )
+
+    # The upload response only previews the text
+    data = upload_response.json()
+    assert data["text_length"] == len(text)
+    assert data["text_content"] == text[:1000]
+
+    response = client.get(
+        "/api/documents/text/long.txt?offset=100&limit=50", headers=headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["text"] == text[100:150]
+    assert data["length"] == len(text)
+    assert data["next_offset"] == 150
+
+    data = client.get(
+        f"/api/documents/text/long.txt?offset={len(text) - 10}", headers=headers
+    ).json()
+    assert data["text"] == text[-10:]
+    assert data["next_offset"] is None
+
+    # Unchanged text isn't sent again
+    response = client.get("/api/documents/text/long.txt", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    etag = response.headers["etag"]
+    response = client.get(
+        "/api/documents/text/long.txt", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Replacing the document changes its ETag
+    client.post(
+        "/api/documents/upload",
+        files={"file": ("long.txt", b"Replaced text.", "text/plain")},
+        headers=headers
+    )
+    response = client.get(
+        "/api/documents/text/long.txt", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["text"] == "Replaced text."
+
+
+def test_get_document_text_pages(client: TestClient, user_token: str, make_pdf):
+    """Test that PDF text can be read page by page."""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    pdf = make_pdf(["First page", "Second page", "Third page"])
+    with open(pdf, "rb") as f:
+        upload_response = client.post(
+            "/api/documents/upload?preview_chars=0",
+            files={"file": ("pages.pdf", f, "application/pdf")},
+            headers=headers
+        )
+    assert upload_response.json()["text_content"] is None
+
+    # Previews are capped like text reads
+    with open(pdf, "rb") as f:
+        response = client.post(
+            "/api/documents/upload?preview_chars=100000000",
+            files={"file": ("pages.pdf", f, "application/pdf")},
+            headers=headers
+        )
+    assert response.status_code == 422
+
+    data = client.get("/api/documents/text/pages.pdf?page=2", headers=headers).json()
+    assert data["text"].strip() == "Second page"
+    assert data["page"] == 2
+    assert data["page_count"] == 3
+    assert data["next_offset"] == data["offset"] + len(data["text"])
+
+    response = client.get("/api/documents/text/pages.pdf?page=4", headers=headers)
+    assert response.status_code == 404
+
+
+def test_upload_too_large_document(
+    client: TestClient, user_token: str, monkeypatch, upload_directory
+):
+    """Test that uploads over the size limit are rejected and not saved."""
+    monkeypatch.setattr("app.document.router.MAX_UPLOAD_SIZE", 16)
+
+    response = client.post(
+        "/api/documents/upload",
+        files={"file": ("test_large.txt", b"x" * 64, "text/plain")},
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == 400
+    assert "File too large" in response.json()["detail"]
+    assert stored_files(upload_directory) == []
+
+
+def test_upload_pdf_document(client: TestClient, user_token: str, make_pdf):
+    """Test that PDF text and page count are extracted on upload."""
+    pdf = make_pdf(["First page", "Second page"])
+
+    with open(pdf, "rb") as f:
+        response = client.post(
+            "/api/documents/upload",
+            files={"file": ("notes.pdf", f, "application/pdf")},
+            headers={"Authorization": f"Bearer {user_token}"}
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["page_count"] == 2
+    assert data["text_content"] == "First page\nSecond page"
+
+
+def test_upload_unreadable_pdf(client: TestClient, user_token: str, upload_directory):
+    """Test that a PDF whose text can't be extracted is rejected and not kept."""
+    response = client.post(
+        "/api/documents/upload",
+        files={"file": ("broken.pdf", b"not a pdf", "application/pdf")},
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == 400
+    assert "Could not read PDF" in response.json()["detail"]
+    assert stored_files(upload_directory) == []
+
+
+@pytest.mark.parametrize(
+    "filename, content",
+    [("latin1.txt", "Café".encode("latin-1")), ("broken.docx", b"not a docx")],
+)
+def test_upload_unreadable_document(
+    client: TestClient, user_token: str, upload_directory, filename, content
+):
+    """Test that a document whose text can't be extracted is rejected and not kept."""
+    response = client.post(
+        "/api/documents/upload",
+        files={"file": (filename, content, "application/octet-stream")},
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == 400
+    assert "Could not read document" in response.json()["detail"]
+    assert stored_files(upload_directory) == []
+
+
 def test_upload_invalid_document(client: TestClient, user_token: str):
     """Test that uploading an invalid document fails."""
     # Create a temporary image file
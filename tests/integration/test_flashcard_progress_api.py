@@ -1,8 +1,16 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
 
-from app.models import User, FlashcardSet, Flashcard, StudySession, FlashcardProgress
+from app.models import (
+    User,
+    FlashcardSet,
+    Flashcard,
+    StudySession,
+    FlashcardProgress,
+    CardProgressSummary,
+)
 from app.auth.utils import get_password_hash, create_access_token
 
 
@@ -104,6 +112,99 @@ def test_update_flashcard_progress(
     assert data["difficulty"] == "easy"
 
 
+def test_record_flashcard_progress_batch(
+    client: TestClient,
+    user_token: str,
+    test_study_session: StudySession,
+    test_flashcards,
+    test_user: User,
+    test_db: Session,
+):
+    """Test recording a batch of reviews with per-item results."""
+    offline_time = datetime.now(timezone.utc) - timedelta(hours=1)
+    future_time = datetime.now(timezone.utc) + timedelta(days=1)
+
+    response = client.post(
+        f"/api/study/sessions/{test_study_session.id}/progress/batch",
+        json={
+            "reviews": [
+                {
+                    "flashcard_id": test_flashcards[0].id,
+                    "is_correct": True,
+                    "difficulty": "easy",
+                },
+                {
+                    "flashcard_id": test_flashcards[1].id,
+                    "is_correct": False,
+                    "difficulty": "hard",
+                    "reviewed_at": offline_time.isoformat(),
+                },
+                {
+                    "flashcard_id": 99999,
+                    "is_correct": True,
+                    "difficulty": "easy",
+                },
+                {
+                    "flashcard_id": test_flashcards[0].id,
+                    "is_correct": True,
+                    "difficulty": "medium",
+                    "reviewed_at": future_time.isoformat(),
+                },
+                {
+                    "flashcard_id": test_flashcards[0].id,
+                    "is_correct": True,
+                    "difficulty": "medium",
+                },
+            ]
+        },
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 3
+    assert data["failed"] == 2
+
+    results = data["results"]
+    assert [result["success"] for result in results] == [True, True, False, False, True]
+    assert all(result["id"] for result in results if result["success"])
+    assert "doesn't belong" in results[2]["error"]
+    assert "future" in results[3]["error"]
+
+    # The reviews and the per-card rollup were written
+    records = FlashcardProgress.get_by_flashcard(test_db, test_flashcards[1].id, test_user.id)
+    assert len(records) == 1
+    assert records[0].session_id == test_study_session.id
+    assert abs(
+        records[0].created_at.replace(tzinfo=None) - offline_time.replace(tzinfo=None)
+    ) < timedelta(seconds=1)
+
+    summary = test_db.get(CardProgressSummary, (test_user.id, test_flashcards[0].id))
+    assert summary.review_count == 2
+    assert summary.correct_count == 2
+
+
+def test_record_flashcard_progress_batch_unknown_session(
+    client: TestClient, user_token: str, test_flashcards
+):
+    """Test that a batch for an unknown session is rejected."""
+    response = client.post(
+        "/api/study/sessions/99999/progress/batch",
+        json={
+            "reviews": [
+                {
+                    "flashcard_id": test_flashcards[0].id,
+                    "is_correct": True,
+                    "difficulty": "easy",
+                }
+            ]
+        },
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 404
+
+
 def test_get_flashcard_progress(
     client: TestClient,
     user_token: str,
@@ -176,3 +277,53 @@ def test_get_set_progress(
         assert "correct_count" in progress
         assert "incorrect_count" in progress
         assert "last_studied" in progress
+
+
+def test_get_due_flashcards(
+    client: TestClient,
+    user_token: str,
+    test_flashcards,
+    test_user: User,
+    test_db: Session,
+):
+    """Test getting the flashcards due for review."""
+    two_days_ago = datetime.now(timezone.utc) - timedelta(days=2)
+
+    # A card failed two days ago is due again
+    test_db.add(
+        FlashcardProgress(
+            user_id=test_user.id,
+            flashcard_id=test_flashcards[0].id,
+            is_correct=False,
+            difficulty="hard",
+            created_at=two_days_ago,
+        )
+    )
+    # A card answered easily just now is not due yet
+    test_db.add(
+        FlashcardProgress(
+            user_id=test_user.id,
+            flashcard_id=test_flashcards[1].id,
+            is_correct=True,
+            difficulty="easy",
+        )
+    )
+    test_db.commit()
+
+    response = client.get(
+        "/api/study/due",
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["flashcard_id"] == test_flashcards[0].id
+    assert data[0]["question"] == test_flashcards[0].question
+    assert data[0]["repetitions"] == 0
+
+    response = client.get(
+        "/api/study/due?limit=0",
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert response.status_code == 400
@@ -0,0 +1,80 @@
+import os
+import tempfile
+
+from app.ai.cache import FlashcardCache
+
+CARDS = [{"question": "What is the capital of France?", "answer": "Paris"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(temp_dir, clock, ttl=60, max_entries=10):
+    return FlashcardCache(
+        os.path.join(temp_dir, "cache.db"), ttl=ttl, max_entries=max_entries, clock=clock
+    )
+
+
+def test_cache_hit_and_miss():
+    """Test that stored flashcards are returned and lookups are counted."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = make_cache(temp_dir, FakeClock())
+
+        assert cache.get("key") is None
+        cache.set("key", CARDS)
+        assert cache.get("key") == CARDS
+
+        stats = cache.stats()
+        assert stats["entries"] == 1
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+
+def test_cache_ttl():
+    """Test that entries expire after the TTL."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        clock = FakeClock()
+        cache = make_cache(temp_dir, clock, ttl=60)
+        cache.set("key", CARDS)
+
+        clock.now += 59
+        assert cache.get("key") == CARDS
+
+        clock.now += 2
+        assert cache.get("key") is None
+        assert cache.stats()["entries"] == 0
+
+
+def test_cache_lru_eviction():
+    """Test that the least recently read entries are evicted first."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        clock = FakeClock()
+        cache = make_cache(temp_dir, clock, max_entries=2)
+
+        cache.set("a", CARDS)
+        clock.now += 1
+        cache.set("b", CARDS)
+        clock.now += 1
+        cache.get("a")  # "b" is now the least recently used
+        clock.now += 1
+        cache.set("c", CARDS)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == CARDS
+        assert cache.get("c") == CARDS
+        assert cache.stats()["evictions"] == 1
+
+
+def test_cache_persists_across_instances():
+    """Test that entries survive a restart."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        clock = FakeClock()
+        make_cache(temp_dir, clock).set("key", CARDS)
+
+        assert make_cache(temp_dir, clock).get("key") == CARDS
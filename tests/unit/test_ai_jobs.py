@@ -0,0 +1,248 @@
+import asyncio
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.models import FlashcardSet, GenerationJob, User
+from app.ai.jobs import GenerationJobRunner
+from app.database import to_async_url
+
+
+@pytest.fixture
+def users(test_db):
+    """Create two users to own jobs."""
+    users = [
+        User(username=name, email=f"{name}@example.com", hashed_password="hash")
+        for name in ("alice", "bob")
+    ]
+    test_db.add_all(users)
+    test_db.commit()
+    return [user.id for user in users]
+
+
+@pytest.fixture
+def runner(test_db, database_url):
+    """Create a job runner without workers on the test database."""
+    # NullPool closes each connection with its session, so there's nothing
+    # left to dispose of
+    engine = create_async_engine(to_async_url(database_url), poolclass=NullPool)
+    return GenerationJobRunner(
+        async_sessionmaker(engine, expire_on_commit=False),
+        workers=0,
+        max_jobs_per_user=1,
+    )
+
+
+def add_job(test_db, user_id, status="queued", document_id="notes.txt"):
+    """Add a generation job and return its id."""
+    job = GenerationJob(
+        user_id=user_id, status=status, document_id=document_id, num_cards=5
+    )
+    test_db.add(job)
+    test_db.commit()
+    return job.id
+
+
+def get_job(test_db, job_id):
+    """Read a job's current row."""
+    test_db.expire_all()
+    return test_db.get(GenerationJob, job_id)
+
+
+@pytest.mark.asyncio
+async def test_claim_respects_per_user_limit(test_db, users, runner):
+    """Test that a user's second job waits while other users' jobs run."""
+    alice, bob = users
+    first = add_job(test_db, alice)
+    second = add_job(test_db, alice)
+    other = add_job(test_db, bob)
+    await runner.start()
+
+    assert await runner._claim() == first
+    assert await runner._claim() == other
+    assert await runner._claim() is None
+    assert get_job(test_db, second).status == "queued"
+
+    # Alice's next job is runnable once her first one finishes
+    await runner._update(first, status="succeeded")
+    assert await runner._claim() == second
+
+
+@pytest.mark.asyncio
+async def test_claim_skips_jobs_claimed_elsewhere(test_db, users, runner):
+    """Test that a job is only claimed by one of several runners."""
+    job_id = add_job(test_db, users[0])
+    other = GenerationJobRunner(runner.session_factory, workers=0)
+    await runner.start()
+    await other.start()
+
+    claimed = await asyncio.gather(runner._claim(), other._claim())
+
+    assert sorted(claimed, key=str) == [job_id, None]
+
+
+@pytest.mark.asyncio
+async def test_claim_limit_holds_across_runners(test_db, users, runner):
+    """Test that runners claiming at once keep a user within their limit."""
+    first = add_job(test_db, users[0])
+    add_job(test_db, users[0])
+    other = GenerationJobRunner(runner.session_factory, workers=0, max_jobs_per_user=1)
+    await runner.start()
+    await other.start()
+
+    claimed = await asyncio.gather(runner._claim(), other._claim())
+
+    assert sorted(claimed, key=str) == [first, None]
+
+
+@pytest.mark.asyncio
+async def test_start_requeues_jobs_with_lapsed_leases(test_db, users, runner):
+    """Test that jobs whose runner stopped renewing their lease are queued again."""
+    interrupted = add_job(test_db, users[0], status="running")
+    live = add_job(test_db, users[1], status="running")
+    job = get_job(test_db, live)
+    job.heartbeat_at = datetime.now(timezone.utc)
+    test_db.commit()
+
+    await runner.start()
+
+    job = get_job(test_db, interrupted)
+    assert job.status == "queued"
+    assert job.started_at is None
+    assert get_job(test_db, live).status == "running"
+
+
+@pytest.mark.asyncio
+async def test_stop_requeues_running_jobs(test_db, users, runner):
+    """Test that jobs interrupted by stopping are queued again at once."""
+    job_id = add_job(test_db, users[0])
+    await runner.start()
+    await runner._claim()
+
+    await runner.stop()
+
+    assert get_job(test_db, job_id).status == "queued"
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_errors(test_db, users, runner, monkeypatch):
+    """Test that a worker keeps running jobs after a failed claim."""
+    monkeypatch.setattr("app.ai.jobs.POLL_INTERVAL", 0.01)
+    job_id = add_job(test_db, users[0], document_id="missing.txt")
+    claim = runner._claim
+    calls = 0
+
+    async def flaky_claim():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("database is locked")
+        return await claim()
+
+    runner._claim = flaky_claim
+    runner.workers = 1
+    await runner.start()
+    try:
+        for _ in range(200):
+            if get_job(test_db, job_id).status == "failed":
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await runner.stop()
+
+    assert calls > 1
+    assert get_job(test_db, job_id).status == "failed"
+
+
+@pytest.mark.asyncio
+async def test_run_records_success(test_db, users, runner, upload_directory):
+    """Test that a successful job links the new flashcard set."""
+    upload_directory.mkdir()
+    (upload_directory / "notes.txt").write_text("Paris is the capital of France.")
+    job_id = add_job(test_db, users[0])
+    await runner.start()
+    await runner._claim()
+
+    flashcards = [{"question": "Capital of France?", "answer": "Paris"}]
+    with patch(
+        "app.ai.jobs.generate_flashcards_from_chunks",
+        AsyncMock(return_value=flashcards),
+    ):
+        await runner._run(job_id)
+
+    job = get_job(test_db, job_id)
+    assert job.status == "succeeded"
+    assert job.progress == 1.0
+    assert job.flashcard_set_id is not None
+    assert job.finished_at is not None
+
+
+@pytest.mark.asyncio
+async def test_run_adds_legacy_files_to_store(
+    test_db, users, runner, upload_directory, make_pdf
+):
+    """Test that a file from before the document store is read through it."""
+    upload_directory.mkdir()
+    make_pdf(["Paris is in France.", "Rome is in Italy."], "uploads/notes.pdf")
+    job_id = add_job(test_db, users[0], document_id="notes.pdf")
+    await runner.start()
+    await runner._claim()
+
+    read = []
+
+    async def generate(chunks, num_cards, on_progress, num_chunks):
+        read.extend(chunks)
+        return [{"question": "Capital of France?", "answer": "Paris"}]
+
+    with patch("app.ai.jobs.generate_flashcards_from_chunks", generate):
+        await runner._run(job_id)
+
+    assert get_job(test_db, job_id).status == "succeeded"
+    assert "Paris is in France." in read[0] and "Rome is in Italy." in read[0]
+    assert list((upload_directory / "objects").rglob("*.pdf.txt"))
+
+
+@pytest.mark.asyncio
+async def test_run_discards_sets_of_jobs_taken_over(
+    test_db, users, runner, upload_directory
+):
+    """Test that a run whose job was claimed again doesn't record its set."""
+    upload_directory.mkdir()
+    (upload_directory / "notes.txt").write_text("Paris is the capital of France.")
+    job_id = add_job(test_db, users[0])
+    await runner.start()
+    await runner._claim()
+
+    # The lease lapsed, and another process re-queued and claimed the job
+    job = get_job(test_db, job_id)
+    job.started_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    test_db.commit()
+
+    flashcards = [{"question": "Capital of France?", "answer": "Paris"}]
+    with patch(
+        "app.ai.jobs.generate_flashcards_from_chunks",
+        AsyncMock(return_value=flashcards),
+    ):
+        await runner._run(job_id)
+
+    job = get_job(test_db, job_id)
+    assert job.status == "running"
+    assert job.flashcard_set_id is None
+    assert test_db.query(FlashcardSet).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_run_records_failure(test_db, users, runner):
+    """Test that a failing job records its error."""
+    job_id = add_job(test_db, users[0], document_id="missing.txt")
+    await runner.start()
+    await runner._claim()
+
+    await runner._run(job_id)
+
+    job = get_job(test_db, job_id)
+    assert job.status == "failed"
+    assert "missing.txt" in job.error
+    assert job.flashcard_set_id is None
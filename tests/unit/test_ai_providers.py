@@ -0,0 +1,150 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.ai import utils as ai_utils
+from app.ai.providers import (
+    GeminiProvider,
+    MockProvider,
+    OpenAIProvider,
+    ProviderRouter,
+    create_scheduler,
+    parse_models,
+)
+from app.ai.utils import generate_flashcards_from_text
+
+
+def make_provider(provider_class, model, cost, latency, **kwargs):
+    return provider_class(
+        model, cost, latency, 2, create_scheduler(1000, 1000), **kwargs
+    )
+
+
+@pytest.fixture
+def providers():
+    """A cheap slow model and an expensive fast one."""
+    cheap = make_provider(MockProvider, "cheap", cost=0.1, latency=5.0)
+    fast = make_provider(MockProvider, "fast", cost=1.0, latency=1.0)
+    yield cheap, fast
+    cheap.close()
+    fast.close()
+
+
+def test_parse_models():
+    """Test that model entries get built-in or overridden cost and latency."""
+    providers = parse_models(
+        "gemini:gemini-2.0-flash, openai:gpt-4o-mini:0.5:2,mock:mock"
+    )
+
+    assert [p.name for p in providers] == [
+        "gemini:gemini-2.0-flash",
+        "openai:gpt-4o-mini",
+        "mock:mock",
+    ]
+    assert isinstance(providers[0], GeminiProvider)
+    assert (providers[0].cost, providers[0].latency) == (0.40, 3.0)
+    assert (providers[1].cost, providers[1].latency) == (0.5, 2.0)
+    assert providers[2].cost == 0.0
+
+    with pytest.raises(ValueError):
+        parse_models("anthropic:some-model")
+    with pytest.raises(ValueError):
+        parse_models("gemini")
+
+
+def test_router_selects_by_policy(providers):
+    """Test that routes pick the cheapest, fastest or a named model."""
+    cheap, fast = providers
+    router = ProviderRouter(
+        [cheap, fast],
+        {"interactive": "fastest", "bulk": "cheapest", "review": "mock:cheap"},
+    )
+
+    assert router.select("interactive") is fast
+    assert router.select("bulk") is cheap
+    assert router.select("review") is cheap
+    assert router.select("unknown") is fast
+
+
+def test_router_skips_open_circuits(providers):
+    """Test that a model whose circuit is open is routed around."""
+    cheap, fast = providers
+    router = ProviderRouter([cheap, fast], {"interactive": "fastest"})
+
+    for _ in range(fast.scheduler.breaker.failure_threshold):
+        fast.scheduler.breaker.record_failure()
+
+    assert router.select("interactive") is cheap
+
+
+def test_router_follows_measured_latency(providers):
+    """Test that the fastest route adapts to observed response times."""
+    cheap, fast = providers
+    router = ProviderRouter([cheap, fast], {"interactive": "fastest"})
+
+    for _ in range(10):
+        fast.record_latency(10.0)
+
+    assert router.select("interactive") is cheap
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.genai.GenerativeModel")
+async def test_gemini_model_is_reused(mock_model):
+    """Test that the Gemini model is created once, not per request."""
+    mock_model.return_value.generate_content.return_value = MagicMock(
+        text='[{"question": "Q", "answer": "A"}]'
+    )
+
+    await generate_flashcards_from_text("First text", 1)
+    await generate_flashcards_from_text("Second text", 1)
+
+    mock_model.assert_called_once_with("gemini-2.0-flash")
+    assert mock_model.return_value.generate_content.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_generation_uses_routed_model(providers, monkeypatch):
+    """Test that bulk generation goes to the bulk model."""
+    cheap, fast = providers
+    router = ProviderRouter(
+        [cheap, fast], {"interactive": "fastest", "bulk": "cheapest"}
+    )
+    monkeypatch.setattr(ai_utils, "provider_router", router)
+
+    with patch.object(cheap, "generate", wraps=cheap.generate) as cheap_generate:
+        flashcards = await generate_flashcards_from_text("Some text", 2, "bulk")
+
+    assert cheap_generate.call_count == 1
+    assert flashcards[0]["answer"] == "Paris"
+
+
+def test_openai_provider():
+    """Test that OpenAI chat completions are returned and streamed as text."""
+    client = MagicMock()
+    provider = make_provider(OpenAIProvider, "gpt-4o-mini", 0.6, 4.0, client=client)
+    text = json.dumps([{"question": "Q", "answer": "A"}])
+
+    client.chat.completions.create.return_value = MagicMock(
+        choices=[MagicMock(message=MagicMock(content=text))]
+    )
+    assert provider.generate("prompt") == text
+    _, kwargs = client.chat.completions.create.call_args
+    assert kwargs["model"] == "gpt-4o-mini"
+    assert kwargs["messages"] == [{"role": "user", "content": "prompt"}]
+
+    client.chat.completions.create.return_value = [
+        MagicMock(choices=[MagicMock(delta=MagicMock(content=text[:5]))]),
+        MagicMock(choices=[MagicMock(delta=MagicMock(content=None))]),
+        MagicMock(choices=[MagicMock(delta=MagicMock(content=text[5:]))]),
+    ]
+    assert "".join(provider.stream("prompt")) == text
+    provider.close()
+
+
+def test_mock_provider_streams_its_response(providers):
+    """Test that the offline model streams the same flashcards it returns."""
+    cheap, _ = providers
+
+    assert "".join(cheap.stream("prompt")) == cheap.generate("prompt")
+    assert json.loads(cheap.generate("prompt"))[0]["answer"] == "Paris"
@@ -0,0 +1,241 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from google.api_core import exceptions as google_exceptions
+
+from app.ai.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryScheduler,
+    TokenBucket,
+    backoff_delay,
+    is_retryable,
+)
+from app.ai.utils import generate_flashcards_from_text
+
+
+class FakeClock:
+    """Clock whose time only moves when something sleeps on it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_scheduler(clock, rate=10, capacity=2, threshold=3, max_retries=3):
+    """Create a scheduler on the fake clock, with jitter at its maximum."""
+    return RetryScheduler(
+        TokenBucket(rate, capacity, clock=clock, sleep=clock.sleep),
+        CircuitBreaker(threshold, reset_timeout=30, clock=clock),
+        max_retries=max_retries,
+        base_delay=1,
+        max_delay=8,
+        sleep=clock.sleep,
+        rng=lambda low, high: high,
+    )
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_calls_after_burst():
+    """Test that calls beyond the burst wait for tokens to refill."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=clock.sleep)
+
+    for _ in range(4):
+        await bucket.acquire()
+
+    assert clock.sleeps == pytest.approx([0.1, 0.1])
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_debt_is_capped_at_capacity():
+    """Test that concurrent callers cannot drive the bucket past its capacity in debt."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=clock.sleep)
+
+    await asyncio.gather(*(bucket.acquire() for _ in range(20)))
+
+    assert bucket._tokens >= -bucket.capacity
+    assert clock.now == pytest.approx(1.8)
+
+
+def test_token_bucket_adapts_rate():
+    """Test that rate limits halve the rate and successes recover it."""
+    bucket = TokenBucket(rate=10, capacity=2, min_rate=2)
+
+    bucket.slow_down()
+    assert bucket.rate == 5
+    bucket.slow_down()
+    bucket.slow_down()
+    assert bucket.rate == 2
+
+    for _ in range(20):
+        bucket.speed_up()
+    assert bucket.rate == 10
+
+
+def test_backoff_delay_grows_and_caps():
+    """Test that the backoff bound doubles per attempt up to the cap."""
+    bounds = [backoff_delay(n, 0.5, 4, lambda low, high: high) for n in range(5)]
+
+    assert bounds == [0.5, 1, 2, 4, 4]
+    assert 0 <= backoff_delay(3, 0.5, 4) <= 4
+
+
+def test_is_retryable():
+    """Test that only transient provider errors are retried."""
+    assert is_retryable(google_exceptions.ResourceExhausted("quota"))
+    assert is_retryable(google_exceptions.ServiceUnavailable("down"))
+    assert is_retryable(ConnectionError("reset"))
+    assert not is_retryable(google_exceptions.InvalidArgument("bad prompt"))
+    assert not is_retryable(ValueError("bug"))
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Test that the circuit opens on failures and closes after a good trial."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after == 30
+
+    # One trial call is let through once the timeout passes
+    clock.now = 30
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_circuit_breaker_reopens_on_failed_trial():
+    """Test that a failed trial call opens the circuit again."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    clock.now = 30
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_releases_cancelled_trial():
+    """Test that a cancelled trial call lets the next call try."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, threshold=1)
+    scheduler.breaker.record_failure()
+    clock.now = 30
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        await scheduler.call(cancelled)
+
+    scheduler.breaker.before_call()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_retries_with_backoff():
+    """Test that rate limited calls are retried with backoff and slow the limiter."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    calls = []
+
+    async def call():
+        calls.append(clock.now)
+        if len(calls) < 3:
+            raise google_exceptions.ResourceExhausted("quota")
+        return "ok"
+
+    assert await scheduler.call(call) == "ok"
+    assert len(calls) == 3
+    assert clock.sleeps[:2] == [1, 2]
+    assert scheduler.breaker.failures == 0
+    assert scheduler.limiter.rate < 10
+
+
+@pytest.mark.asyncio
+async def test_scheduler_gives_up_after_max_retries():
+    """Test that the last error is raised once retries run out."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, threshold=10, max_retries=2)
+
+    async def call():
+        raise google_exceptions.ServiceUnavailable("down")
+
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        await scheduler.call(call)
+    assert scheduler.breaker.failures == 3
+
+
+@pytest.mark.asyncio
+async def test_scheduler_does_not_retry_client_errors():
+    """Test that non-retryable errors are raised at once."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise google_exceptions.InvalidArgument("bad prompt")
+
+    with pytest.raises(google_exceptions.InvalidArgument):
+        await scheduler.call(call)
+    assert len(calls) == 1
+    assert scheduler.breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_sheds_load_when_circuit_open():
+    """Test that calls fail fast without reaching the provider once the circuit opens."""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, threshold=3, max_retries=5)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise google_exceptions.ServiceUnavailable("down")
+
+    with pytest.raises(CircuitOpenError):
+        await scheduler.call(call)
+    assert len(calls) == 3
+
+    with pytest.raises(CircuitOpenError):
+        await scheduler.call(call)
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.genai.GenerativeModel")
+async def test_generate_flashcards_retries_rate_limits(mock_model):
+    """Test that generation retries a rate limited Gemini call."""
+    mock_model.return_value.generate_content.side_effect = [
+        google_exceptions.ResourceExhausted("quota"),
+        MagicMock(text='[{"question": "Q1", "answer": "A1"}]'),
+    ]
+
+    flashcards = await generate_flashcards_from_text("Some text", 1)
+
+    assert flashcards == [{"question": "Q1", "answer": "A1"}]
+    assert mock_model.return_value.generate_content.call_count == 2
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.ai import utils as ai_utils
+from app.ai.singleflight import SingleFlight
+from app.ai.utils import generate_flashcards_from_text
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_result():
+    """Test that calls with the same key run once and share the result."""
+    flight = SingleFlight()
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    results = await asyncio.gather(
+        *(flight.do(key, lambda key=key: work(key)) for key in ["a", "a", "a", "b"])
+    )
+
+    assert results == ["A", "A", "A", "B"]
+    assert sorted(calls) == ["a", "b"]
+    assert flight.coalesced == 2
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_cached():
+    """Test that a failure reaches every waiter and the next call runs again."""
+    flight = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota exceeded")
+
+    results = await asyncio.gather(
+        flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 1
+
+    with pytest.raises(RuntimeError):
+        await flight.do("key", fail)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    """Test that other waiters still get the result when one gives up."""
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    first = asyncio.ensure_future(flight.do("key", work))
+    second = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.genai.GenerativeModel")
+async def test_identical_generations_call_model_once(mock_model):
+    """Test that concurrent identical generations make one model call."""
+    calls = []
+
+    def generate_content(prompt, **kwargs):
+        calls.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return MagicMock(text='[{"question": "Q", "answer": "A"}]')
+
+    mock_model.return_value.generate_content.side_effect = generate_content
+
+    results = await asyncio.gather(
+        *(generate_flashcards_from_text("Shared document", 1) for _ in range(10)),
+        generate_flashcards_from_text("Other document", 1),
+    )
+
+    assert all(result == [{"question": "Q", "answer": "A"}] for result in results)
+    assert len(calls) == 2
+    assert ai_utils.flashcard_cache_stats()["coalesced"] == 9
@@ -1,9 +1,17 @@
+import threading
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock
 from app.ai.utils import (
+    allocate_cards,
+    FlashcardStreamParser,
     create_flashcard_prompt,
+    flashcard_cache_key,
+    merge_flashcards,
     parse_flashcards_from_response,
+    generate_flashcards_from_chunks,
     generate_flashcards_from_text,
+    stream_flashcards_from_text,
 )
 
 
@@ -106,3 +114,305 @@ async def test_generate_flashcards_from_text(mock_model):
     # Check that the Gemini API was called with the correct parameters
     mock_model.assert_called_once_with("gemini-2.0-flash")
     mock_instance.generate_content.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.genai.GenerativeModel")
+async def test_generate_flashcards_runs_off_event_loop(mock_model):
+    """Test that the blocking Gemini call runs on the generation thread pool."""
+    threads = []
+
+    def generate_content(prompt, **kwargs):
+        threads.append(threading.current_thread().name)
+        response = MagicMock()
+        response.text = '[{"question": "Q", "answer": "A"}]'
+        return response
+
+    mock_model.return_value.generate_content.side_effect = generate_content
+
+    flashcards = await generate_flashcards_from_text("Some text", 1)
+
+    assert flashcards == [{"question": "Q", "answer": "A"}]
+    assert threads[0] != threading.current_thread().name
+    assert threads[0].startswith("gemini")
+
+
+def test_allocate_cards():
+    """Test that cards are split evenly across chunks."""
+    assert allocate_cards(10, 3) == [3, 3, 4]
+    assert sum(allocate_cards(7, 7)) == 7
+    # More chunks than cards spreads single cards across the document
+    assert allocate_cards(2, 4) == [0, 1, 0, 1]
+
+
+def test_merge_flashcards():
+    """Test that merged flashcards drop duplicate questions and respect the limit."""
+    batches = [
+        [{"question": "What is the capital of France?", "answer": "Paris"}],
+        [
+            {"question": "what is the capital of  France", "answer": "Paris."},
+            {"question": "What is the largest planet?", "answer": "Jupiter"},
+            {"question": "What is the largest ocean?", "answer": "Pacific"},
+        ],
+    ]
+
+    merged = merge_flashcards(batches, 2)
+
+    assert [card["answer"] for card in merged] == ["Paris", "Jupiter"]
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.generate_flashcards_from_text")
+async def test_generate_flashcards_from_chunks(mock_generate):
+    """Test that chunks are generated concurrently and merged."""
+    in_flight = 0
+    peak = 0
+
+    async def generate(chunk, count, purpose):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [
+            {"question": f"{chunk} question {i}", "answer": "A"} for i in range(count)
+        ]
+
+    mock_generate.side_effect = generate
+
+    flashcards = await generate_flashcards_from_chunks(["one", "two", "three"], 6)
+
+    assert len(flashcards) == 6
+    assert flashcards[0]["question"] == "one question 0"
+    assert mock_generate.call_count == 3
+    assert peak == 3
+    # Chunks are bulk work, routed to the bulk model
+    assert mock_generate.call_args.args[2] == "bulk"
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.generate_flashcards_from_text")
+async def test_generate_flashcards_from_chunks_failures(mock_generate):
+    """Test that failed chunks are skipped unless every chunk fails."""
+    mock_generate.side_effect = [
+        RuntimeError("quota exceeded"),
+        [{"question": "Q", "answer": "A"}],
+    ]
+    flashcards = await generate_flashcards_from_chunks(["one", "two"], 2)
+    assert flashcards == [{"question": "Q", "answer": "A"}]
+
+    mock_generate.side_effect = RuntimeError("quota exceeded")
+    with pytest.raises(RuntimeError):
+        await generate_flashcards_from_chunks(["one", "two"], 2)
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.generate_flashcards_from_text")
+async def test_generate_flashcards_from_chunks_skips_cancelled(mock_generate):
+    """Test that a cancelled chunk is skipped like a failed one."""
+    mock_generate.side_effect = [
+        asyncio.CancelledError(),
+        [{"question": "Q", "answer": "A"}],
+    ]
+
+    flashcards = await generate_flashcards_from_chunks(["one", "two"], 2)
+
+    assert flashcards == [{"question": "Q", "answer": "A"}]
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.generate_flashcards_from_text")
+async def test_generate_flashcards_from_chunks_short_count(mock_generate):
+    """Test that progress completes when there are fewer chunks than counted."""
+    mock_generate.return_value = [{"question": "Q", "answer": "A"}]
+    progress = []
+
+    async def on_progress(done, total):
+        progress.append(done / total)
+
+    await generate_flashcards_from_chunks(
+        iter(["one", "two"]), 4, on_progress, num_chunks=4
+    )
+
+    assert progress[-1] == 1.0
+    assert max(progress) <= 1.0
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.generate_flashcards_from_text")
+async def test_generate_flashcards_from_chunks_reads_lazily(mock_generate, monkeypatch):
+    """Test that a counted chunk stream is read only as generation has room."""
+    monkeypatch.setattr("app.ai.utils.MAX_CHUNKS_IN_FLIGHT", 2)
+    read = []
+    in_flight = 0
+    peak = 0
+
+    def chunks():
+        for i in range(6):
+            read.append(i)
+            # Never more than the window ahead of generation
+            assert in_flight <= 2
+            yield f"chunk {i}"
+
+    async def generate(chunk, count, purpose):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [{"question": f"{chunk} question", "answer": "A"}]
+
+    mock_generate.side_effect = generate
+
+    flashcards = await generate_flashcards_from_chunks(chunks(), 3, num_chunks=6)
+
+    assert len(flashcards) == 3
+    assert read == list(range(6))
+    assert peak == 2
+    assert mock_generate.call_count == 3
+
+
+def test_flashcard_cache_key():
+    """Test that cache keys ignore whitespace but not content or card count."""
+    key = flashcard_cache_key("Paris is  the capital.\n", 5, "gemini-2.0-flash")
+
+    assert key == flashcard_cache_key("Paris is the capital.", 5, "gemini-2.0-flash")
+    assert key != flashcard_cache_key("Rome is the capital.", 5, "gemini-2.0-flash")
+    assert key != flashcard_cache_key("Paris is the capital.", 6, "gemini-2.0-flash")
+    assert key != flashcard_cache_key("Paris is the capital.", 5, "gemini-pro")
+
+    # Changing the prompt template invalidates old keys
+    with patch(
+        "app.ai.utils.create_flashcard_prompt", lambda text, num_cards: "New prompt"
+    ):
+        assert key != flashcard_cache_key(
+            "Paris is the capital.", 5, "gemini-2.0-flash"
+        )
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.genai.GenerativeModel")
+async def test_generate_flashcards_from_text_cached(mock_model, flashcard_cache):
+    """Test that repeated generations are served from the cache."""
+    mock_response = MagicMock()
+    mock_response.text = '[{"question": "Q", "answer": "A"}]'
+    mock_model.return_value.generate_content.return_value = mock_response
+
+    first = await generate_flashcards_from_text("Some text", 1)
+    second = await generate_flashcards_from_text("Some  text\n", 1)
+
+    assert first == second == [{"question": "Q", "answer": "A"}]
+    mock_model.return_value.generate_content.assert_called_once()
+    assert flashcard_cache.stats()["hits"] == 1
+
+
+def test_flashcard_stream_parser():
+    """Test that flashcards are emitted as soon as each object completes."""
+    parser = FlashcardStreamParser()
+    text = (
+        '```json\n[{"question": "What does {x} mean? \\"Braces\\"", "answer": "A set}"},'
+        ' {"question": "Q2", "answer": "B", "notes": {"page": 1}}]\n```'
+    )
+
+    emitted = []
+    for i in range(0, len(text), 5):
+        emitted.append(parser.feed(text[i : i + 5]))
+
+    cards = [card for batch in emitted for card in batch]
+    assert cards == [
+        {"question": 'What does {x} mean? "Braces"', "answer": "A set}"},
+        {"question": "Q2", "answer": "B"},
+    ]
+    # The first card arrives before the second one is complete
+    first_batch = next(i for i, batch in enumerate(emitted) if batch)
+    assert len(emitted[first_batch]) == 1
+    assert first_batch < len(emitted) - 2
+
+
+def test_flashcard_stream_parser_skips_invalid_objects():
+    """Test that objects without a question and answer are ignored."""
+    parser = FlashcardStreamParser()
+
+    assert parser.feed('[{"title": "Cards"}, {"question": "Q", "answer": "A"}]') == [
+        {"question": "Q", "answer": "A"}
+    ]
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.genai.GenerativeModel")
+async def test_stream_flashcards_from_text(mock_model, flashcard_cache):
+    """Test that streamed flashcards are yielded and then cached."""
+    text = '[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A2"}]'
+    pieces = [MagicMock(text=text[i : i + 7]) for i in range(0, len(text), 7)]
+    mock_model.return_value.generate_content.return_value = iter(pieces)
+
+    cards = [card async for card in stream_flashcards_from_text("Some text", 2)]
+
+    assert [card["question"] for card in cards] == ["Q1", "Q2"]
+    _, kwargs = mock_model.return_value.generate_content.call_args
+    assert kwargs["stream"] is True
+
+    # A repeat request is served from the cache
+    cached = [card async for card in stream_flashcards_from_text("Some text", 2)]
+    assert cached == cards
+    assert mock_model.return_value.generate_content.call_count == 1
+
+
+@pytest.mark.asyncio
+@patch("app.ai.utils.genai.GenerativeModel")
+async def test_stream_flashcards_releases_trial_when_closed(
+    mock_model, flashcard_cache, ai_provider
+):
+    """Test that a stream closed early lets the next call try the provider."""
+    text = '[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "A2"}]'
+    mock_model.return_value.generate_content.return_value = iter(
+        [MagicMock(text=text)]
+    )
+    breaker = ai_provider.scheduler.breaker
+    now = 0.0
+    breaker.clock = lambda: now
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    now = 30
+
+    # The client disconnects after the first card of the trial call
+    stream = stream_flashcards_from_text("Some text", 2)
+    assert (await stream.__anext__())["question"] == "Q1"
+    await stream.aclose()
+
+    breaker.before_call()
+
+
+def test_parse_flashcards_from_malformed_json():
+    """Test that flashcards are salvaged from fenced, sloppy or truncated JSON."""
+    fenced = 'Here you go:\n```json\n[{"question": "Q1", "answer": "A1"}]\n```'
+    assert parse_flashcards_from_response(fenced) == [
+        {"question": "Q1", "answer": "A1"}
+    ]
+
+    trailing_commas = '[{"question": "Q1", "answer": "A1",}, {"question": "Q2, really?", "answer": "A2"},]'
+    assert parse_flashcards_from_response(trailing_commas) == [
+        {"question": "Q1", "answer": "A1"},
+        {"question": "Q2, really?", "answer": "A2"},
+    ]
+
+    # Output cut off at the token limit keeps its complete cards
+    truncated = '```json\n[{"question": "Q1", "answer": "A1"}, {"question": "Q2", "answer": "The ans'
+    assert parse_flashcards_from_response(truncated) == [
+        {"question": "Q1", "answer": "A1"}
+    ]
+
+    wrapped = '{"flashcards": [{"question": "Q1", "answer": "A1", "difficulty": 2}]}'
+    assert parse_flashcards_from_response(wrapped) == [
+        {"question": "Q1", "answer": "A1"}
+    ]
+
+
+def test_flashcard_stream_parser_escapes_across_pieces():
+    """Test that an escaped quote split across pieces doesn't end the string."""
+    parser = FlashcardStreamParser()
+
+    assert parser.feed('[{"question": "Say \\') == []
+    assert parser.feed('"hi\\" {", "answer": "A"}]') == [
+        {"question": 'Say "hi" {', "answer": "A"}
+    ]
@@ -0,0 +1,73 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from app.dashboard.utils import (
+    build_buckets,
+    decode_activity_cursor,
+    distribute_minutes,
+    encode_activity_cursor,
+)
+
+
+def test_build_buckets():
+    """Test that calendar buckets are built oldest first and contiguous."""
+    now = datetime(2024, 3, 13, 15, 30)  # A Wednesday
+
+    days = build_buckets("day", 7, now)
+    assert len(days) == 7
+    assert days[0][0] == "2024-03-07"
+    assert days[-1][0] == "2024-03-13"
+    assert days[-1][2] == datetime(2024, 3, 14)
+
+    weeks = build_buckets("week", 4, now)
+    assert weeks[-1][0] == "2024-03-11 to 2024-03-17"
+    assert weeks[0][1] == datetime(2024, 2, 19)
+
+    # Months step by calendar month, crossing the year boundary
+    months = build_buckets("month", 6, now)
+    assert [label for label, _, _ in months] == [
+        "2023-10",
+        "2023-11",
+        "2023-12",
+        "2024-01",
+        "2024-02",
+        "2024-03",
+    ]
+    assert months[1][2] == datetime(2023, 12, 1)
+
+    for buckets in (days, weeks, months):
+        for previous, current in zip(buckets, buckets[1:]):
+            assert previous[2] == current[1]
+
+    with pytest.raises(ValueError):
+        build_buckets("year", 2, now)
+
+
+def test_distribute_minutes():
+    """Test that sessions are clipped to the buckets they overlap."""
+    now = datetime(2024, 3, 13, 15, 30)
+    buckets = build_buckets("day", 3, now)
+
+    intervals = [
+        # 30 minutes on the first day
+        (datetime(2024, 3, 11, 9, 0), datetime(2024, 3, 11, 9, 30)),
+        # Spans midnight: 20 minutes on the 12th and 40 minutes on the 13th
+        (datetime(2024, 3, 12, 23, 40), datetime(2024, 3, 13, 0, 40)),
+        # Starts before the window: only 15 minutes fall inside it
+        (datetime(2024, 3, 10, 23, 0), datetime(2024, 3, 11, 0, 15)),
+        # Entirely outside the window
+        (datetime(2024, 3, 1, 10, 0), datetime(2024, 3, 1, 11, 0)),
+    ]
+
+    minutes = distribute_minutes(intervals, buckets)
+
+    assert minutes == pytest.approx([45, 20, 40])
+
+
+def test_activity_cursor_converts_offsets_to_utc():
+    """Test that a cursor with a UTC offset decodes to the same instant in UTC."""
+    local = datetime(2024, 3, 13, 17, 30, tzinfo=timezone(timedelta(hours=2)))
+
+    key = decode_activity_cursor(encode_activity_cursor((local, 1, 7)))
+
+    assert key == (datetime(2024, 3, 13, 15, 30), 1, 7)
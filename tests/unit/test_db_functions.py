@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.db_functions import duration_seconds
+
+
+def test_duration_seconds_compiles_per_dialect():
+    """Test that durations compile to each dialect's date arithmetic."""
+    expression = duration_seconds(literal(datetime(2024, 1, 1)), literal(datetime(2024, 1, 2)))
+
+    sqlite_sql = str(expression.compile(dialect=sqlite.dialect()))
+    postgresql_sql = str(expression.compile(dialect=postgresql.dialect()))
+
+    assert "julianday" in sqlite_sql
+    assert "EXTRACT(EPOCH FROM" in postgresql_sql
+
+
+def test_duration_seconds_value(test_db):
+    """Test that durations evaluate to seconds on the test database."""
+    start = datetime(2024, 1, 1, 10, 0, 0)
+    end = datetime(2024, 1, 1, 10, 30, 15)
+
+    seconds = test_db.execute(select(duration_seconds(literal(start), literal(end)))).scalar()
+
+    assert abs(seconds - 1815) < 0.01
@@ -0,0 +1,64 @@
+import pytest
+
+from app.document.extraction import PdfExtractionError, PdfExtractor
+from app.document.utils import extract_text_from_pdf
+
+PAGES = [f"Page {number} of the reading" for number in range(7)]
+
+
+@pytest.fixture
+def extractor():
+    extractor = PdfExtractor(
+        workers=3, min_pages_per_task=2, timeout=60, memory_limit=1024 * 1024 * 1024
+    )
+    yield extractor
+    extractor.close()
+
+
+def test_page_ranges(extractor):
+    """Test that pages are split into even ranges of a minimum size."""
+    assert extractor.page_ranges(7) == [(0, 3), (3, 5), (5, 7)]
+    assert extractor.page_ranges(3) == [(0, 2), (2, 3)]
+    assert extractor.page_ranges(1) == [(0, 1)]
+    assert extractor.page_ranges(0) == [(0, 0)]
+
+
+def test_extract_text_from_pdf(make_pdf):
+    """Test that PDF pages are joined in order."""
+    pdf = make_pdf(PAGES)
+
+    assert extract_text_from_pdf(str(pdf)) == "\n".join(PAGES)
+
+
+@pytest.mark.asyncio
+async def test_extract_pages_in_workers(extractor, make_pdf):
+    """Test that pages extracted across workers come back in order."""
+    pdf = make_pdf(PAGES)
+
+    assert [page.strip() for page in await extractor.extract_pages(str(pdf))] == PAGES
+    assert await extractor.extract_text(str(pdf)) == extract_text_from_pdf(str(pdf))
+    assert await extractor.count_pages(str(pdf)) == len(PAGES)
+
+
+@pytest.mark.asyncio
+async def test_unreadable_pdf(extractor, tmp_path):
+    """Test that a file PyPDF2 can't read raises PdfExtractionError."""
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+
+    with pytest.raises(PdfExtractionError):
+        await extractor.extract_pages(str(broken))
+
+
+@pytest.mark.asyncio
+async def test_timeout_replaces_workers(extractor, make_pdf):
+    """Test that a document over the timeout fails and the pool is replaced."""
+    pdf = make_pdf(PAGES)
+    extractor.timeout = 0.001
+
+    with pytest.raises(PdfExtractionError, match="longer than"):
+        await extractor.extract_pages(str(pdf))
+    assert extractor._pool is None
+
+    extractor.timeout = 60
+    assert len(await extractor.extract_pages(str(pdf))) == len(PAGES)
@@ -0,0 +1,169 @@
+import os
+import pytest
+from unittest.mock import patch
+
+from app.document import store as store_module
+from app.document.store import DocumentStore, TextIndex, TextWriter
+from app.document.utils import TextSegment, UploadTooLargeError
+
+
+class UploadFile:
+    """Upload read in chunks from bytes."""
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    async def read(self, size=-1):
+        chunk = self.content[:size]
+        self.content = self.content[len(chunk) :]
+        return chunk
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DocumentStore(str(tmp_path))
+
+
+@pytest.mark.asyncio
+async def test_save_stores_one_copy_per_content(store):
+    """Test that identical uploads share a file and different ones don't."""
+    first = await store.save(UploadFile(b"Same notes"), ".TXT")
+    second = await store.save(UploadFile(b"Same notes"), ".txt")
+    other = await store.save(UploadFile(b"Other notes"), ".txt")
+
+    assert first.created and not second.created and other.created
+    assert first.storage_key == second.storage_key == first.sha256 + ".txt"
+    assert other.storage_key != first.storage_key
+    with open(store.path(first.storage_key), "rb") as f:
+        assert f.read() == b"Same notes"
+    assert not [
+        name
+        for _, _, names in os.walk(store.objects_directory)
+        for name in names
+        if name.endswith(".part")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_save_refreshes_reused_files(store):
+    """Test that reusing a stored file marks it as no longer idle."""
+    stored = await store.save(UploadFile(b"Notes"), ".txt")
+    await store.extract_text(stored.storage_key)
+    os.utime(store.path(stored.storage_key), (0, 0))
+
+    assert store.idle_files(60) == [stored.storage_key]
+
+    await store.save(UploadFile(b"Notes"), ".txt")
+
+    assert not store.is_idle(stored.storage_key, 60)
+    assert store.idle_files(60) == []
+
+
+@pytest.mark.asyncio
+async def test_save_too_large_leaves_nothing(store):
+    """Test that an oversize upload is not stored."""
+    with pytest.raises(UploadTooLargeError):
+        await store.save(UploadFile(b"x" * 100), ".txt", max_size=10)
+
+    assert os.listdir(store.objects_directory) == []
+
+
+@pytest.mark.asyncio
+async def test_text_is_extracted_once(store):
+    """Test that extracted text is kept next to the file and reused."""
+    stored = await store.save(UploadFile(b"First line\nSecond line\n"), ".txt")
+
+    with patch.object(
+        store_module,
+        "iter_document_segments",
+        wraps=store_module.iter_document_segments,
+    ) as extract:
+        assert await store.extract_text(stored.storage_key) == "First line\nSecond line"
+        assert await store.extract_text(stored.storage_key) == "First line\nSecond line"
+        assert list(await store.iter_segments(stored.storage_key)) == [
+            TextSegment("First line\n", 0),
+            TextSegment("Second line", 11),
+        ]
+
+    # Extracted from the upload once, then read back from the stored text
+    assert extract.call_count == 1
+
+    store.delete(stored.storage_key)
+    assert not os.path.exists(store.path(stored.storage_key))
+    assert not os.path.exists(store.text_path(stored.storage_key))
+
+
+@pytest.mark.asyncio
+async def test_pdf_text_keeps_pages(store, make_pdf):
+    """Test that stored PDF text is read back page by page with offsets."""
+    pdf = make_pdf(["First page", "Second page"])
+    stored = await store.save(UploadFile(pdf.read_bytes()), ".pdf")
+
+    segments = list(await store.iter_segments(stored.storage_key))
+
+    assert [(segment.offset, segment.page) for segment in segments] == [
+        (0, 1),
+        (len(segments[0].text), 2),
+    ]
+    assert "".join(segment.text for segment in segments).split() == [
+        "First",
+        "page",
+        "Second",
+        "page",
+    ]
+
+    store.delete(stored.storage_key)
+    assert not os.path.exists(store.index_path(stored.storage_key))
+
+
+@pytest.mark.asyncio
+async def test_read_text_ranges(store, monkeypatch):
+    """Test that any range of the text can be read, across checkpoints."""
+    monkeypatch.setattr(store_module, "CHECKPOINT_CHARS", 8)
+    text = "Ünïcödé text, with multi-byte characters: ελληνικά and 日本語."
+    stored = await store.save(UploadFile(f"  \n{text}\n\n".encode()), ".txt")
+
+    index = await store.text_index(stored.storage_key)
+    assert index.length == len(text)
+    assert len(index.checkpoints) == -(-len(text) // 8)
+
+    for offset in range(len(text) + 1):
+        for limit in (1, 7, 8, 20):
+            assert (
+                await store.read_text(stored.storage_key, offset, limit)
+                == text[offset : offset + limit]
+            )
+    assert await store.read_text(stored.storage_key) == text
+
+
+def test_text_writer_strips_and_indexes_pages(tmp_path):
+    """Test that written text is stripped and pages point into it."""
+    writer = TextWriter(str(tmp_path / "text.txt"), str(tmp_path / "index.json"))
+    writer.write_all(
+        [
+            TextSegment("\n  One\n", 0, 1),
+            TextSegment("\n", 7, 2),
+            TextSegment("Three\n", 8, 3),
+            TextSegment(" \n", 14, 4),
+        ]
+    )
+    writer.commit()
+
+    text = (tmp_path / "text.txt").read_text()
+    assert text == "One\n\nThree"
+    # Whitespace-only trailing pages start at, and are clamped to, the end
+    index = TextIndex(len(text), writer.checkpoints, writer.pages)
+    assert [index.page_range(page) for page in range(1, 5)] == [
+        (0, 4),
+        (4, 5),
+        (5, 10),
+        (10, 10),
+    ]
+
+
+def test_legacy_path(store, tmp_path):
+    """Test that files saved under their own name are still found."""
+    (tmp_path / "old.txt").write_text("Old upload")
+
+    assert store.legacy_path("old.txt") == str(tmp_path / "old.txt")
+    assert store.legacy_path("missing.txt") is None
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import pytest
 import tempfile
@@ -7,11 +8,19 @@ from pathlib import Path
 from app.document.utils import (
     is_valid_document,
     save_upload_file,
+    stream_upload_file,
+    SavedUpload,
+    UploadTooLargeError,
     extract_text_from_document,
     extract_text_from_pdf,
     extract_text_from_docx,
     extract_text_from_txt,
     chunk_text,
+    estimate_tokens,
+    iter_chunks,
+    iter_document_segments,
+    iter_document_text,
+    TextSegment,
 )
 
 
@@ -40,9 +49,11 @@ async def test_save_upload_file():
     try:
         # Create a mock upload file
         class MockUploadFile:
-            async def read(self):
-                with open(temp_file_path, "rb") as f:
-                    return f.read()
+            def __init__(self):
+                self.file = open(temp_file_path, "rb")
+
+            async def read(self, size=-1):
+                return self.file.read(size)
 
         upload_file = MockUploadFile()
 
@@ -57,12 +68,61 @@ async def test_save_upload_file():
             assert content == "Test content"
 
         # Clean up
+        upload_file.file.close()
         os.remove(file_path)
     finally:
         # Clean up the temporary file
         os.remove(temp_file_path)
 
 
+class ChunkedUploadFile:
+    """Upload that records the size of every read."""
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.reads = []
+
+    async def read(self, size=-1):
+        self.reads.append(size)
+        chunk = self.content[:size]
+        self.content = self.content[len(chunk) :]
+        return chunk
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_file():
+    """Test that uploads are written and hashed in fixed-size chunks."""
+    content = b"0123456789" * 10
+    upload_file = ChunkedUploadFile(content)
+
+    saved = await stream_upload_file(upload_file, "streamed.txt", chunk_size=16)
+
+    try:
+        assert saved == SavedUpload(
+            saved.path, len(content), hashlib.sha256(content).hexdigest()
+        )
+        assert set(upload_file.reads) == {16}
+        with open(saved.path, "rb") as f:
+            assert f.read() == content
+    finally:
+        os.remove(saved.path)
+
+
+@pytest.mark.asyncio
+async def test_stream_upload_file_aborts_when_too_large():
+    """Test that an oversize upload stops reading and leaves no file behind."""
+    upload_file = ChunkedUploadFile(b"x" * 100)
+
+    with pytest.raises(UploadTooLargeError):
+        await stream_upload_file(
+            upload_file, "too_large.txt", max_size=40, chunk_size=16
+        )
+
+    assert len(upload_file.reads) == 3
+    assert not os.path.exists(os.path.join("uploads", "too_large.txt"))
+    assert not [name for name in os.listdir("uploads") if name.endswith(".part")]
+
+
 def test_extract_text_from_txt():
     """Test that text extraction from TXT files works correctly."""
     # Create a temporary TXT file
@@ -97,3 +157,123 @@ def test_chunk_text():
     # Reconstruct the text
     reconstructed_text = "".join(chunks)
     assert reconstructed_text == text
+
+
+def test_estimate_tokens():
+    """Test that token estimates count words and punctuation."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("The cat sat.") == 4
+    # Long words count as several tokens
+    assert estimate_tokens("internationalization") == 5
+
+
+def test_iter_chunks_respects_boundaries():
+    """Test that chunks stay within budget and break between sentences."""
+    paragraphs = [
+        " ".join(f"Sentence {p}-{i} talks about topic {i}." for i in range(10))
+        for p in range(20)
+    ]
+    text = "\n\n".join(paragraphs)
+
+    chunks = list(iter_chunks(text.splitlines(keepends=True), 120, 0))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert estimate_tokens(chunk) <= 120
+        assert chunk.startswith("Sentence")
+        assert chunk.endswith(".")
+
+    # Without overlap every sentence appears exactly once
+    assert " ".join(" ".join(chunks).split()) == " ".join(text.split())
+
+
+def test_iter_chunks_overlap():
+    """Test that each chunk repeats the end of the previous one."""
+    text = " ".join(f"Sentence number {i} is here." for i in range(100))
+
+    chunks = list(iter_chunks([text], 100, 20))
+
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_sentence = previous.rsplit(". ", 1)[-1]
+        assert last_sentence in chunk[: len(last_sentence) * 3]
+
+
+def test_iter_chunks_streams():
+    """Test that chunks are yielded before the input is exhausted."""
+    consumed = []
+
+    def pieces():
+        for i in range(1000):
+            consumed.append(i)
+            yield f"Paragraph {i} has a few words in it.\n\n"
+
+    first = next(iter_chunks(pieces(), 50, 0))
+
+    assert first.startswith("Paragraph 0")
+    assert len(consumed) < 20
+
+
+def test_iter_chunks_streams_unpunctuated_lines():
+    """Test that text without sentence breaks is still flushed early."""
+    consumed = []
+
+    def pieces():
+        for i in range(5000):
+            consumed.append(i)
+            yield f"line {i} of a table without punctuation\n"
+
+    chunks = iter_chunks(pieces(), 50, 0)
+    first = next(chunks)
+
+    assert first.startswith("line 0 ")
+    assert len(consumed) < 100
+    assert all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+
+
+def test_iter_chunks_splits_long_sentences():
+    """Test that a sentence over budget is split between words."""
+    chunks = list(iter_chunks(["word " * 500], 100, 0))
+
+    assert len(chunks) == 5
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+
+
+def test_iter_chunks_invalid_overlap():
+    """Test that overlap must be smaller than the chunk budget."""
+    with pytest.raises(ValueError):
+        list(iter_chunks(["text"], 100, 100))
+
+
+def test_iter_document_text():
+    """Test that text files are streamed line by line."""
+    with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as temp_file:
+        temp_file.write(b"First line\nSecond line\n")
+        temp_file_path = temp_file.name
+
+    try:
+        assert list(iter_document_text(temp_file_path)) == [
+            "First line\n",
+            "Second line\n",
+        ]
+    finally:
+        os.remove(temp_file_path)
+
+
+def test_iter_document_segments(make_pdf):
+    """Test that segments carry their offsets, and pages for PDFs."""
+    with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as temp_file:
+        temp_file.write(b"First line\nSecond line\n")
+        temp_file_path = temp_file.name
+
+    try:
+        assert list(iter_document_segments(temp_file_path)) == [
+            TextSegment("First line\n", 0),
+            TextSegment("Second line\n", 11),
+        ]
+    finally:
+        os.remove(temp_file_path)
+
+    segments = list(iter_document_segments(str(make_pdf(["One", "Two"]))))
+    assert [segment.page for segment in segments] == [1, 2]
+    assert segments[1].offset == len(segments[0].text)
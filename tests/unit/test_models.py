@@ -2,7 +2,14 @@ import pytest
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from app.models import User, FlashcardSet, Flashcard, StudySession
+from app.models import (
+    User,
+    FlashcardSet,
+    Flashcard,
+    StudySession,
+    FlashcardProgress,
+    CardProgressSummary,
+)
 
 def test_user_model(test_db: Session):
     """Test that the User model can be created and has the expected attributes."""
@@ -158,3 +165,108 @@ def test_study_session_model(test_db: Session):
     # Check relationship with user and flashcard set
     assert study_session.user.id == user.id
     assert study_session.flashcard_set.id == flashcard_set.id
+
+def test_card_progress_summary(test_db: Session):
+    """Test that the progress summary is maintained on write and can be rebuilt."""
+    # Create a user, set and flashcard
+    user = User(
+        username="testuser",
+        email="test@example.com",
+        hashed_password="hashedpassword"
+    )
+    test_db.add(user)
+    test_db.commit()
+    flashcard_set = FlashcardSet(title="Test Set", user_id=user.id)
+    test_db.add(flashcard_set)
+    test_db.commit()
+    flashcard = Flashcard(question="Q", answer="A", set_id=flashcard_set.id)
+    test_db.add(flashcard)
+    test_db.commit()
+
+    # Record reviews across two flushes
+    reviews = [(True, "easy"), (True, "medium"), (False, "hard")]
+    test_db.add_all([
+        FlashcardProgress(user_id=user.id, flashcard_id=flashcard.id, is_correct=c, difficulty=d)
+        for c, d in reviews
+    ])
+    test_db.commit()
+    test_db.add(
+        FlashcardProgress(user_id=user.id, flashcard_id=flashcard.id, is_correct=True, difficulty="easy")
+    )
+    test_db.commit()
+
+    summary = test_db.get(CardProgressSummary, (user.id, flashcard.id))
+    assert summary.review_count == 4
+    assert summary.correct_count == 3
+    assert summary.incorrect_count == 1
+    assert summary.difficulty_sum == 1 + 2 + 3 + 1
+    assert summary.last_studied is not None
+    assert summary.is_mastered is True
+    assert summary.repetitions == 1
+    assert summary.due_at > summary.last_studied
+    schedule = (summary.repetitions, summary.ease_factor, summary.interval_days, summary.due_at)
+
+    stats = FlashcardProgress.get_stats_by_flashcard(test_db, flashcard.id, user.id)
+    assert stats.correct_count == 3
+    assert stats.average_difficulty == 1.75
+
+    # Corrupt the rollup, then repair it from the raw history
+    summary.correct_count = 0
+    summary.is_mastered = False
+    summary.due_at = None
+    test_db.commit()
+
+    assert CardProgressSummary.rebuild(test_db, user_id=user.id) == 1
+    test_db.expire_all()
+
+    summary = test_db.get(CardProgressSummary, (user.id, flashcard.id))
+    assert summary.review_count == 4
+    assert summary.correct_count == 3
+    assert summary.incorrect_count == 1
+    assert summary.difficulty_sum == 7
+    assert summary.is_mastered is True
+    assert (summary.repetitions, summary.ease_factor, summary.interval_days, summary.due_at) == schedule
+
+    # An empty rollup, as on a database from before it, is filled from history
+    test_db.query(CardProgressSummary).delete()
+    test_db.commit()
+    assert CardProgressSummary.backfill(test_db) == 1
+    assert CardProgressSummary.backfill(test_db) == 0
+    test_db.expire_all()
+    assert test_db.get(CardProgressSummary, (user.id, flashcard.id)).review_count == 4
+
+
+def test_late_reviews_schedule_in_timestamp_order(test_db: Session):
+    """Test that a review older than a card's last one is scheduled as rebuild would."""
+    user = User(username="testuser", email="test@example.com", hashed_password="hashedpassword")
+    test_db.add(user)
+    test_db.commit()
+    flashcard_set = FlashcardSet(title="Test Set", user_id=user.id)
+    test_db.add(flashcard_set)
+    test_db.commit()
+    flashcard = Flashcard(question="Q", answer="A", set_id=flashcard_set.id)
+    test_db.add(flashcard)
+    test_db.commit()
+
+    # An offline review from before the latest one arrives last
+    reviews = [
+        (datetime(2024, 3, 2), True, "easy"),
+        (datetime(2024, 3, 3), True, "medium"),
+        (datetime(2024, 3, 1), False, "hard"),
+    ]
+    for created_at, is_correct, difficulty in reviews:
+        test_db.add(FlashcardProgress(
+            user_id=user.id, flashcard_id=flashcard.id, is_correct=is_correct,
+            difficulty=difficulty, created_at=created_at
+        ))
+        test_db.commit()
+
+    summary = test_db.get(CardProgressSummary, (user.id, flashcard.id))
+    schedule = (summary.repetitions, summary.ease_factor, summary.interval_days, summary.due_at)
+    assert summary.repetitions == 2
+    assert summary.last_studied.replace(tzinfo=None) == datetime(2024, 3, 3)
+
+    CardProgressSummary.rebuild(test_db, user_id=user.id)
+    test_db.expire_all()
+    summary = test_db.get(CardProgressSummary, (user.id, flashcard.id))
+    assert (summary.repetitions, summary.ease_factor, summary.interval_days, summary.due_at) == schedule
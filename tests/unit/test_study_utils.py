@@ -0,0 +1,50 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app.study.utils import (
+    DEFAULT_EASE_FACTOR,
+    MIN_EASE_FACTOR,
+    RELEARN_INTERVAL_DAYS,
+    review_quality,
+    schedule_review,
+)
+
+
+def test_review_quality():
+    """Test that review outcomes map to SM-2 quality grades."""
+    assert review_quality(True, "easy") == 5
+    assert review_quality(True, "medium") == 4
+    assert review_quality(True, "hard") == 3
+    assert review_quality(False, "easy") < 3
+
+
+def test_schedule_review():
+    """Test that intervals grow with successful reviews and reset on failure."""
+    reviewed_at = datetime(2024, 1, 1, 12, 0)
+    state = (0, DEFAULT_EASE_FACTOR, 0.0)
+
+    # First two successful reviews use the fixed SM-2 intervals
+    repetitions, ease, interval, due_at = schedule_review(*state, True, "medium", reviewed_at)
+    assert (repetitions, interval) == (1, 1.0)
+    assert due_at == reviewed_at + timedelta(days=1)
+
+    repetitions, ease, interval, due_at = schedule_review(repetitions, ease, interval, True, "medium", due_at)
+    assert (repetitions, interval) == (2, 6.0)
+
+    # Later reviews multiply the interval by the ease factor
+    repetitions, ease, interval, due_at = schedule_review(repetitions, ease, interval, True, "easy", due_at)
+    assert repetitions == 3
+    assert interval == pytest.approx(6.0 * DEFAULT_EASE_FACTOR)
+    assert ease > DEFAULT_EASE_FACTOR
+
+    # A failure resets the card and brings it back soon
+    failed_at = due_at
+    repetitions, ease, interval, due_at = schedule_review(repetitions, ease, interval, False, "hard", failed_at)
+    assert repetitions == 0
+    assert interval == RELEARN_INTERVAL_DAYS
+    assert due_at == failed_at + timedelta(days=RELEARN_INTERVAL_DAYS)
+
+    # The ease factor never drops below the minimum
+    for _ in range(20):
+        repetitions, ease, interval, due_at = schedule_review(repetitions, ease, interval, False, "hard", due_at)
+    assert ease == MIN_EASE_FACTOR